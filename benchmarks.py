@@ -0,0 +1,530 @@
+# Benchmarks comparing index and tokenizer implementations on synthetic corpora.
+#
+# python benchmarks.py --scales small medium --output results.json [--baseline old_results.json]
+# runs every index and tokenizer on a seeded TREC-COVID shaped corpus at every scale, writes the
+# measurements as JSON, and reports the measurements that got worse than in the baseline.
+import argparse
+import bisect
+import concurrent.futures
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from bm25_index import BM25InvertedIndex
+from document_source import DocumentSource
+from document_transformer import NaiveSearchDocumentTransformer
+from documents import DictDocumentCollection, DocumentCollection, InputDocument, TransformedDocument
+from index import Index, CompressedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies, \
+    EmptyIndexIndexer, LazyDictBasedInvertedIndexWithFrequencies, LazyListBasedInvertedIndexWithFrequencies, \
+    ListBasedInvertedIndexWithFrequencies, NaiveIndex, PackedListBasedInvertedIndexWithFrequencies, \
+    SingleIndexIndexer, TermIdInvertedIndexWithFrequencies, TextProcessIndex
+from indexing_process import DefaultIndexingProcess, ParallelIndexingProcess
+from positional_index import PositionalInvertedIndexWithFrequencies
+from search_api import PositionalClause, Query
+from segmented_index import SegmentedIndex
+from sharded_index import ShardedIndex
+from tokenizer import CompiledGroupOneTokenizer, GroupOneTokenizer, NaiveTokenizer, Tokenizer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, peak RSS is not measured there.
+    resource = None
+
+
+# Number of documents of every benchmark scale.
+SCALES = {'small': 1000, 'medium': 10000, 'large': 100000}
+
+_SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'ha', 'ke', 'li', 'mo', 'nu', 'pa', 're', 'si', 'to', 'vu',
+              'xa', 'ze', 'cov', 'vir', 'ral', 'tion', 'ment', 'ic', 'in', 'on', 'er', 'al', 'os']
+
+
+def synthetic_word(rank: int) -> str:
+    """
+    :return: The distinct pronounceable word of the given frequency rank, e.g. 'ba', 'ce', 'baba'.
+    """
+    syllables = []
+    rank += 1
+    while rank > 0:
+        rank -= 1
+        syllables.append(_SYLLABLES[rank % len(_SYLLABLES)])
+        rank //= len(_SYLLABLES)
+    return ''.join(syllables)
+
+
+class ZipfVocabulary:
+    """
+    Vocabulary of synthetic words whose frequencies follow Zipf's law with the given exponent.
+    """
+    def __init__(self, vocabulary_size: int = 50000, exponent: float = 1.0):
+        self.words = [synthetic_word(rank) for rank in range(vocabulary_size)]
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) ** exponent
+                                                     for rank in range(vocabulary_size)))
+
+    def sample(self, rng: random.Random, k: int, min_rank: int = 0) -> List[str]:
+        """
+        Draws k words, only among the words of rank >= min_rank.
+        """
+        low = self.cum_weights[min_rank - 1] if min_rank > 0 else 0.0
+        total = self.cum_weights[-1]
+        return [self.words[bisect.bisect(self.cum_weights, low + rng.random() * (total - low))]
+                for _ in range(k)]
+
+
+def generate_corpus(num_docs: int, vocabulary: ZipfVocabulary, seed: int = 0) -> List[InputDocument]:
+    """
+    Generates documents shaped like TREC-COVID abstracts: a title of 5-20 words, and a text of
+    log-normally distributed length (about 200 words on average) made of capitalized sentences
+    with commas and periods.
+    """
+    rng = random.Random(seed)
+    docs = []
+    for i in range(num_docs):
+        length = min(1000, max(20, int(rng.lognormvariate(5.1, 0.6))))
+        words = vocabulary.sample(rng, length)
+        sentences = []
+        for start in range(0, length, 20):
+            sentence = words[start:start + 20]
+            if len(sentence) > 5:
+                sentence[len(sentence) // 2] += ','
+            sentences.append(' '.join(sentence).capitalize() + '.')
+        title = ' '.join(vocabulary.sample(rng, rng.randint(5, 20))).capitalize()
+        docs.append(InputDocument(doc_id=f'{i:08x}', text=' '.join(sentences), title=title))
+    return docs
+
+
+def generate_query_strings(num_queries: int, vocabulary: ZipfVocabulary, seed: int = 0) -> List[str]:
+    """
+    Generates queries of 1-4 words skipping the 50 most frequent words, which would be stop words.
+    """
+    rng = random.Random(seed)
+    return [' '.join(vocabulary.sample(rng, rng.randint(1, 4), min_rank=50)) for _ in range(num_queries)]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    :return: Peak resident set size of this process in MB, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return max_rss / (1 << 20) if sys.platform == 'darwin' else max_rss / (1 << 10)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of the values.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+# Index implementations by name. The first factory builds the index, the optional second one
+# creates the index that read()s the written file, the built index type by default.
+INDEX_FACTORIES: Dict[str, tuple] = {
+    'NaiveIndex': (NaiveIndex,),
+    'TextProcessIndex': (TextProcessIndex,),
+    'ListBasedInvertedIndexWithFrequencies': (ListBasedInvertedIndexWithFrequencies,),
+    'DictBasedInvertedIndexWithFrequencies': (DictBasedInvertedIndexWithFrequencies,),
+    'ListBasedInvertedIndexWithFrequencies(top_k_pruning)': (
+        lambda filename: ListBasedInvertedIndexWithFrequencies(filename, top_k_pruning=True),),
+    'LazyListBasedInvertedIndexWithFrequencies': (ListBasedInvertedIndexWithFrequencies,
+                                                  LazyListBasedInvertedIndexWithFrequencies),
+    'LazyDictBasedInvertedIndexWithFrequencies': (DictBasedInvertedIndexWithFrequencies,
+                                                  LazyDictBasedInvertedIndexWithFrequencies),
+    'PackedListBasedInvertedIndexWithFrequencies': (PackedListBasedInvertedIndexWithFrequencies,),
+    'CompressedInvertedIndexWithFrequencies': (CompressedInvertedIndexWithFrequencies,),
+    'TermIdInvertedIndexWithFrequencies': (TermIdInvertedIndexWithFrequencies,),
+    'SegmentedIndex': (lambda filename: SegmentedIndex(filename, background_merges=False),),
+    'PositionalInvertedIndexWithFrequencies': (PositionalInvertedIndexWithFrequencies,),
+    'BM25InvertedIndex': (BM25InvertedIndex,),
+    'BM25InvertedIndex(exhaustive)': (lambda filename: BM25InvertedIndex(filename, top_k_pruning=False),),
+}
+try:
+    from numpy_index import NumpyInvertedIndexWithFrequencies
+    INDEX_FACTORIES['NumpyInvertedIndexWithFrequencies'] = (NumpyInvertedIndexWithFrequencies,)
+except ImportError:  # NumPy is optional.
+    pass
+
+TOKENIZER_FACTORIES: Dict[str, Callable[[], Tokenizer]] = {
+    'NaiveTokenizer': NaiveTokenizer,
+    'GroupOneTokenizer': GroupOneTokenizer,
+    'CompiledGroupOneTokenizer': CompiledGroupOneTokenizer,
+}
+
+
+def timed(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def benchmark_search_many(index: Index, queries: List[Query]) -> Dict[str, float]:
+    """
+    Times running the queries one at a time with search() and together with search_many().
+    :return: Dict with the seconds taken by each, and the speedup of search_many().
+    """
+    loop_seconds = timed(lambda: [index.search(query) for query in queries])
+    batch_seconds = timed(lambda: index.search_many(queries))
+    return {'search_loop_seconds': loop_seconds, 'search_many_seconds': batch_seconds,
+            'search_many_speedup': loop_seconds / batch_seconds}
+
+
+def generate_phrase_queries(num_queries: int, docs: List[TransformedDocument], seed: int = 0) -> List[Query]:
+    """
+    Generates phrase queries of 2 or 3 consecutive tokens taken from random documents, so every
+    query has at least one match.
+    """
+    rng = random.Random(seed)
+    docs = [doc for doc in docs if len(doc.tokens) >= 3]
+    queries = []
+    for _ in range(num_queries if docs else 0):
+        tokens = rng.choice(docs).tokens
+        length = rng.randint(2, 3)
+        start = rng.randrange(len(tokens) - length + 1)
+        terms = tokens[start:start + length]
+        queries.append(Query(terms=terms, num_results=10, clauses=[PositionalClause(terms)]))
+    return queries
+
+
+def benchmark_index(name: str, docs: List[TransformedDocument], queries: List[Query],
+                    directory: str, phrase_queries: Optional[List[Query]] = None) -> Dict[str, Any]:
+    """
+    Measures indexing throughput, write() and read() time, size of the written files, query
+    latencies, the time of search() and search_many() over all queries, and peak RSS of the index implementation INDEX_FACTORIES[name]. For indexes with
+    positions, the latencies of phrase_queries and the size of the positions are measured too. A
+    phase that fails is reported in 'error' and the measurements after it are missing.
+    """
+    create_index, *create_reader = INDEX_FACTORIES[name]
+    filename = os.path.join(directory, 'index')
+    result: Dict[str, Any] = {'baseline_rss_mb': peak_rss_mb()}
+    try:
+        index = create_index(filename)
+        seconds = timed(lambda: [index.add_document(doc) for doc in docs])
+        result['index_docs_per_second'] = len(docs) / seconds
+        result['write_seconds'] = timed(index.write)
+        result['index_file_bytes'] = sum(os.path.getsize(os.path.join(directory, file))
+                                         for file in os.listdir(directory))
+        index = (create_reader[0] if create_reader else create_index)(filename)
+        result['read_seconds'] = timed(index.read)
+        latencies = [timed(lambda: index.search(query)) * 1000 for query in queries]
+        for p in [50, 95, 99]:
+            result[f'query_p{p}_ms'] = percentile(latencies, p)
+        result.update(benchmark_search_many(index, queries))
+        if isinstance(index, PositionalInvertedIndexWithFrequencies):
+            result['positions_bytes'] = index.positions_size_in_bytes()
+            if phrase_queries:
+                latencies = [timed(lambda: index.search(query)) * 1000 for query in phrase_queries]
+                for p in [50, 95, 99]:
+                    result[f'phrase_query_p{p}_ms'] = percentile(latencies, p)
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def benchmark_tokenizer(name: str, docs: List[InputDocument]) -> Dict[str, Any]:
+    """
+    Measures the throughput and peak RSS of the tokenizer TOKENIZER_FACTORIES[name].
+    """
+    tokenizer = TOKENIZER_FACTORIES[name]()
+    baseline_rss_mb = peak_rss_mb()
+    number_of_tokens = 0
+    start = time.perf_counter()
+    for doc in docs:
+        number_of_tokens += len(tokenizer.tokenize(doc.text))
+    seconds = time.perf_counter() - start
+    return {'docs_per_second': len(docs) / seconds, 'tokens_per_second': number_of_tokens / seconds,
+            'baseline_rss_mb': baseline_rss_mb, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_benchmark(kind: str, name: str, num_docs: int, num_queries: int, seed: int) -> Dict[str, Any]:
+    """
+    Generates the corpus and runs one benchmark. Every benchmark runs in a new process, so that the
+    peak RSS of one implementation does not hide the next one.
+    """
+    vocabulary = ZipfVocabulary()
+    docs = generate_corpus(num_docs, vocabulary, seed)
+    if kind == 'tokenizer':
+        return benchmark_tokenizer(name, docs)
+    transformer = NaiveSearchDocumentTransformer(NaiveTokenizer())
+    transformed_docs = [transformer.transform_document(doc) for doc in docs]
+    del docs
+    queries = [Query(terms=NaiveTokenizer().tokenize(query_string), num_results=10)
+               for query_string in generate_query_strings(num_queries, vocabulary, seed)]
+    phrase_queries = generate_phrase_queries(num_queries, transformed_docs, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        return benchmark_index(name, transformed_docs, queries, directory, phrase_queries)
+
+
+def benchmark_sharding(num_docs: int, num_queries: int = 200, seed: int = 0,
+                       shard_counts: List[int] = (1, 2, 4, 8)) -> Dict[str, Any]:
+    """
+    Measures the query latencies of ShardedIndex served by worker processes for every number of
+    shards, and of a single DictBasedInvertedIndexWithFrequencies for comparison. Not part of
+    run_suite(), whose isolated benchmark processes cannot start the shard workers.
+    """
+    vocabulary = ZipfVocabulary()
+    transformer = NaiveSearchDocumentTransformer(NaiveTokenizer())
+    docs = [transformer.transform_document(doc) for doc in generate_corpus(num_docs, vocabulary, seed)]
+    queries = [Query(terms=NaiveTokenizer().tokenize(query_string), num_results=10)
+               for query_string in generate_query_strings(num_queries, vocabulary, seed)]
+
+    def latencies(index: Index) -> Dict[str, float]:
+        values = [timed(lambda: index.search(query)) * 1000 for query in queries]
+        return {'query_mean_ms': sum(values) / len(values),
+                **{f'query_p{p}_ms': percentile(values, p) for p in [50, 95, 99]}}
+
+    results = {'num_docs': num_docs, 'num_queries': num_queries, 'cpus': os.cpu_count()}
+    with tempfile.TemporaryDirectory() as directory:
+        single = DictBasedInvertedIndexWithFrequencies(os.path.join(directory, 'single'))
+        for doc in docs:
+            single.add_document(doc)
+        results['DictBasedInvertedIndexWithFrequencies'] = latencies(single)
+        del single
+        for number_of_shards in shard_counts:
+            filename = os.path.join(directory, f'sharded{number_of_shards}')
+            index = ShardedIndex(filename, number_of_shards)
+            for doc in docs:
+                index.add_document(doc)
+            index.write()
+            index = ShardedIndex(filename)
+            index.read()
+            try:
+                results[f'ShardedIndex({number_of_shards})'] = latencies(index)
+            finally:
+                index.close()
+    return results
+
+
+class GeneratedDocumentSource(DocumentSource):
+    def __init__(self, docs: List[InputDocument]):
+        self.docs = docs
+
+    def read(self) -> DocumentCollection:
+        return DictDocumentCollection({doc.doc_id: doc for doc in self.docs})
+
+
+def benchmark_parallel_indexing(num_docs: int, seed: int = 0, worker_counts: List[int] = (1, 2, 4),
+                                shard_size: int = 1000) -> Dict[str, Any]:
+    """
+    Measures the throughput of tokenizing and indexing documents into a
+    DictBasedInvertedIndexWithFrequencies with DefaultIndexingProcess, and with
+    ParallelIndexingProcess for every number of workers, with the speedup over
+    DefaultIndexingProcess.
+    """
+    source = GeneratedDocumentSource(generate_corpus(num_docs, ZipfVocabulary(), seed))
+    transformer = NaiveSearchDocumentTransformer(NaiveTokenizer())
+    results = {'num_docs': num_docs, 'shard_size': shard_size, 'cpus': os.cpu_count()}
+    serial_seconds = timed(lambda: DefaultIndexingProcess(
+        transformer, SingleIndexIndexer(DictBasedInvertedIndexWithFrequencies(''))).run(source))
+    results['DefaultIndexingProcess'] = {'docs_per_second': num_docs / serial_seconds}
+    for num_workers in worker_counts:
+        process = ParallelIndexingProcess(
+            transformer, SingleIndexIndexer(DictBasedInvertedIndexWithFrequencies('')),
+            EmptyIndexIndexer(DictBasedInvertedIndexWithFrequencies, ''), num_workers=num_workers,
+            shard_size=shard_size)
+        seconds = timed(lambda: process.run(source))
+        results[f'ParallelIndexingProcess({num_workers})'] = {'docs_per_second': num_docs / seconds,
+                                                              'speedup': serial_seconds / seconds}
+    return results
+
+
+def benchmark_freeze(num_docs: int, num_queries: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """
+    Reports the memory_report() of the indexes that support freeze() before and after freezing,
+    the memory saved, and the query latencies before and after.
+    """
+    vocabulary = ZipfVocabulary()
+    transformer = NaiveSearchDocumentTransformer(NaiveTokenizer())
+    docs = [transformer.transform_document(doc) for doc in generate_corpus(num_docs, vocabulary, seed)]
+    queries = [Query(terms=NaiveTokenizer().tokenize(query_string), num_results=10)
+               for query_string in generate_query_strings(num_queries, vocabulary, seed)]
+
+    def latencies(index: Index) -> Dict[str, float]:
+        values = [timed(lambda: index.search(query)) * 1000 for query in queries]
+        return {f'query_p{p}_ms': percentile(values, p) for p in [50, 95, 99]}
+
+    results = {'num_docs': num_docs, 'num_queries': num_queries}
+    for name in ['ListBasedInvertedIndexWithFrequencies', 'DictBasedInvertedIndexWithFrequencies']:
+        index = INDEX_FACTORIES[name][0]('')
+        for doc in docs:
+            index.add_document(doc)
+        result = {'built': index.memory_report(), 'built_latencies': latencies(index)}
+        result['freeze_seconds'] = timed(index.freeze)
+        result['frozen'] = index.memory_report()
+        result['frozen_latencies'] = latencies(index)
+        result['bytes_saved'] = result['built']['total_bytes'] - result['frozen']['total_bytes']
+        result['size_ratio'] = result['frozen']['total_bytes'] / result['built']['total_bytes']
+        results[name] = result
+    return results
+
+
+def benchmark_startup(scales: List[str], num_queries: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """
+    Compares the startup time of the indexes that support snapshots when loaded with the JSONL
+    read() and with read_snapshot(), at every scale, and the query latencies right after each load.
+    """
+    vocabulary = ZipfVocabulary()
+    transformer = NaiveSearchDocumentTransformer(NaiveTokenizer())
+    queries = [Query(terms=NaiveTokenizer().tokenize(query_string), num_results=10)
+               for query_string in generate_query_strings(num_queries, vocabulary, seed)]
+
+    def latencies(index: Index) -> Dict[str, float]:
+        values = [timed(lambda: index.search(query)) * 1000 for query in queries]
+        return {f'query_p{p}_ms': percentile(values, p) for p in [50, 95, 99]}
+
+    results = {}
+    for scale in scales:
+        docs = [transformer.transform_document(doc) for doc in generate_corpus(SCALES[scale], vocabulary, seed)]
+        scale_results = {'num_docs': len(docs)}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ['ListBasedInvertedIndexWithFrequencies', 'DictBasedInvertedIndexWithFrequencies']:
+                create_index = INDEX_FACTORIES[name][0]
+                filename = os.path.join(directory, name)
+                index = create_index(filename)
+                for doc in docs:
+                    index.add_document(doc)
+                index.write()
+                index.write_snapshot()
+                del index
+                jsonl_index = create_index(filename)
+                read_seconds = timed(jsonl_index.read)
+                jsonl_latencies = latencies(jsonl_index)
+                del jsonl_index
+                snapshot_index = create_index(filename)
+                snapshot_seconds = timed(snapshot_index.read_snapshot)
+                scale_results[name] = {
+                    'read_seconds': read_seconds,
+                    'read_snapshot_seconds': snapshot_seconds,
+                    'speedup': read_seconds / snapshot_seconds,
+                    'jsonl_bytes': os.path.getsize(filename),
+                    'snapshot_bytes': os.path.getsize(filename + '.snapshot'),
+                    'read_latencies': jsonl_latencies,
+                    'read_snapshot_latencies': latencies(snapshot_index),
+                }
+                del snapshot_index
+        results[scale] = scale_results
+    return results
+
+
+def run_suite(scales: List[str], num_queries: int = 200, seed: int = 0, isolated: bool = True,
+              index_names: Optional[List[str]] = None,
+              tokenizer_names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Runs the benchmark of every index and tokenizer at every scale.
+    :param scales: Names of SCALES to run.
+    :param num_queries: Number of queries timed for every index.
+    :param seed: Seed of the corpus and query generators.
+    :param isolated: Run every benchmark in a new process, needed for meaningful peak RSS.
+    :param index_names: Names in INDEX_FACTORIES to benchmark, all by default.
+    :param tokenizer_names: Names in TOKENIZER_FACTORIES to benchmark, all by default.
+    :return: JSON serializable results, see compare_results().
+    """
+    benchmarks = ([('index', name) for name in (index_names or INDEX_FACTORIES)]
+                  + [('tokenizer', name) for name in (tokenizer_names or TOKENIZER_FACTORIES)])
+    results = {'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+               'seed': seed, 'num_queries': num_queries, 'scales': {}}
+    for scale in scales:
+        scale_results = {'num_docs': SCALES[scale], 'index': {}, 'tokenizer': {}}
+        for kind, name in benchmarks:
+            args = (kind, name, SCALES[scale], num_queries, seed)
+            if isolated:
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    scale_results[kind][name] = executor.submit(run_benchmark, *args).result()
+            else:
+                scale_results[kind][name] = run_benchmark(*args)
+        results['scales'][scale] = scale_results
+    return results
+
+
+# Measurements where higher is better, for all others lower is better.
+HIGHER_IS_BETTER = {'index_docs_per_second', 'docs_per_second', 'tokens_per_second',
+                    'search_many_speedup'}
+
+
+def compare_results(baseline: Dict[str, Any], results: Dict[str, Any],
+                    tolerance: float = 0.2) -> List[str]:
+    """
+    Finds regressions between two run_suite() results.
+    :param tolerance: Relative change that is still considered noise.
+    :return: A description of every measurement present in both results that got worse by more
+        than the tolerance.
+    """
+    regressions = []
+    for scale, scale_results in results['scales'].items():
+        for kind in ['index', 'tokenizer']:
+            for name, measurements in scale_results[kind].items():
+                baseline_measurements = baseline['scales'].get(scale, {}).get(kind, {}).get(name, {})
+                for key, value in measurements.items():
+                    old_value = baseline_measurements.get(key)
+                    if not isinstance(value, (int, float)) or not isinstance(old_value, (int, float)) \
+                            or key.startswith('baseline') or old_value == 0:
+                        continue
+                    change = (value - old_value) / old_value
+                    if (key in HIGHER_IS_BETTER and change < -tolerance) or \
+                            (key not in HIGHER_IS_BETTER and change > tolerance):
+                        regressions.append(f'{scale} {name} {key}: {old_value:.4g} -> {value:.4g} '
+                                           f'({change:+.0%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks all indexes and tokenizers.')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['small'])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file the results are written to.')
+    parser.add_argument('--baseline', help='JSON file with results of an earlier run to compare to.')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--sharding', action='store_true',
+                        help='Only compare query latencies of ShardedIndex with 1, 2, 4 and 8 shards.')
+    parser.add_argument('--freeze', action='store_true',
+                        help='Only report the memory of the indexes before and after freeze().')
+    parser.add_argument('--startup', action='store_true',
+                        help='Only compare the startup time of read() and read_snapshot().')
+    parser.add_argument('--parallel-indexing', action='store_true',
+                        help='Only compare indexing throughput of ParallelIndexingProcess with 1, 2 and 4 workers.')
+    args = parser.parse_args()
+    if args.parallel_indexing:
+        print(json.dumps({scale: benchmark_parallel_indexing(SCALES[scale], args.seed)
+                          for scale in args.scales}, indent=2))
+        return
+    if args.startup:
+        print(json.dumps(benchmark_startup(args.scales, args.queries, args.seed), indent=2))
+        return
+    if args.freeze:
+        print(json.dumps({scale: benchmark_freeze(SCALES[scale], args.queries, args.seed)
+                          for scale in args.scales}, indent=2))
+        return
+    if args.sharding:
+        print(json.dumps({scale: benchmark_sharding(SCALES[scale], args.queries, args.seed)
+                          for scale in args.scales}, indent=2))
+        return
+    results = run_suite(args.scales, args.queries, args.seed)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(output)
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as fp:
+            regressions = compare_results(json.load(fp), results, args.tolerance)
+        for regression in regressions:
+            print('Regression:', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import json
+import math
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from documents import TransformedDocument
+from index import Index, search_many_with_postings, top_k_conjunctive, write_inverted_index_records
+from search_api import Query, SearchResults
+
+
+def bm25_inverse_document_frequency(term_document_count, number_of_documents):
+    # The +1 keeps the idf positive for terms that occur in more than half of the documents.
+    return math.log(1 + (number_of_documents - term_document_count + 0.5) / (term_document_count + 0.5))
+
+
+def bm25_term_score(term_count: int, document_length: int, average_length: float, idf: float,
+                    k1: float, b: float) -> float:
+    length_norm = k1 * (1 - b + b * document_length / average_length)
+    return idf * term_count * (k1 + 1) / (term_count + length_norm)
+
+
+def lengths_filename(index_filename: str) -> str:
+    return index_filename + '.lengths'
+
+
+class BM25InvertedIndex(Index):
+    """
+    Conjunctive index ranked with BM25, with the score of every posting precomputed.
+
+    Term counts and document lengths are kept as documents are added. write() turns them into
+    impacts, the BM25 score of every posting quantized to an integer of impact_bits bits on one
+    scale shared by all terms, and stores the postings of each term in decreasing order of impact.
+    Scoring a document is then a sum of integers, and top_k_conjunctive walks the impact ordered
+    postings without sorting them and stops once the top k cannot change.
+
+    The document lengths and the average length are written to lengths_filename(filename). Impacts
+    depend on collection-wide statistics, so adding documents invalidates all of them. They are
+    recomputed by the next write() or search().
+    """
+    def __init__(self, filename, k1: float = 1.2, b: float = 0.75, impact_bits: int = 8,
+                 top_k_pruning: bool = True):
+        """
+        :param filename: File the index is read from and written to.
+        :param k1: BM25 term frequency saturation.
+        :param b: BM25 document length normalization, from 0 (none) to 1 (full).
+        :param impact_bits: Impacts are integers from 0 to 2^impact_bits - 1.
+        :param top_k_pruning: Use top_k_conjunctive in search instead of scoring every match.
+        """
+        self.filename = filename
+        self.k1 = k1
+        self.b = b
+        self.impact_bits = impact_bits
+        self.top_k_pruning = top_k_pruning
+        self.number_of_documents = 0
+        # dict mapping a term to a dict with doc_id as a key and the term count as a value.
+        self.term_to_doc_id_and_counts = defaultdict(dict)
+        # Count of documents each term occurs in.
+        self.doc_counts = Counter()
+        # Number of tokens of every document.
+        self.doc_lengths: Dict[str, int] = dict()
+        self.total_length = 0
+        # dict mapping a term to a dict with doc_id as a key and the impact as a value, ordered by
+        # decreasing impact. Valid when impacts_version is the version of the index.
+        self.term_to_doc_id_and_impacts: Dict[str, Dict[str, int]] = dict()
+        self.max_impacts: Dict[str, int] = dict()
+        self.impacts_version = -1
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        self.version += 1
+        self.number_of_documents += 1
+        self.doc_lengths[doc.doc_id] = len(doc.tokens)
+        self.total_length += len(doc.tokens)
+        for term, count in Counter(doc.tokens).items():
+            self.doc_counts[term] += 1
+            self.term_to_doc_id_and_counts[term][doc.doc_id] = count
+
+    def merge(self, other: Index) -> None:
+        self.version += 1
+        self.number_of_documents += other.number_of_documents
+        self.doc_lengths.update(other.doc_lengths)
+        self.total_length += other.total_length
+        for term, doc_id_to_count in other.term_to_doc_id_and_counts.items():
+            self.term_to_doc_id_and_counts[term].update(doc_id_to_count)
+            self.doc_counts[term] += other.doc_counts[term]
+
+    def update_impacts(self) -> None:
+        """
+        Computes the impacts from the term counts and document lengths, unless they are up to date.
+        """
+        if self.impacts_version == self.version:
+            return
+        average_length = self.total_length / max(self.number_of_documents, 1)
+        term_to_scores = dict()
+        max_score = 0.0
+        for term, doc_id_to_count in self.term_to_doc_id_and_counts.items():
+            idf = bm25_inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+            scores = {doc_id: bm25_term_score(count, self.doc_lengths[doc_id], average_length, idf,
+                                              self.k1, self.b)
+                      for doc_id, count in doc_id_to_count.items()}
+            max_score = max(max_score, max(scores.values()))
+            term_to_scores[term] = scores
+        scale = (2 ** self.impact_bits - 1) / max_score if max_score > 0 else 0.0
+        self.term_to_doc_id_and_impacts = dict()
+        self.max_impacts = dict()
+        for term, scores in term_to_scores.items():
+            impacts = sorted(((doc_id, round(score * scale)) for doc_id, score in scores.items()),
+                             key=lambda posting: (-posting[1], posting[0]))
+            self.term_to_doc_id_and_impacts[term] = dict(impacts)
+            self.max_impacts[term] = impacts[0][1]
+        self.impacts_version = self.version
+
+    def write(self):
+        self.update_impacts()
+        records = ({
+            'term': term,
+            'documents_count': self.doc_counts[term],
+            'max_tf': max(self.term_to_doc_id_and_counts[term].values()),
+            'max_impact': self.max_impacts[term],
+            'index': [{'doc_id': doc_id, 'tf': self.term_to_doc_id_and_counts[term][doc_id], 'impact': impact}
+                      for doc_id, impact in doc_id_to_impact.items()]
+        } for term, doc_id_to_impact in self.term_to_doc_id_and_impacts.items())
+        write_inverted_index_records(self.filename, self.number_of_documents, records)
+        with open(lengths_filename(self.filename), 'w') as fp:
+            json.dump({'k1': self.k1, 'b': self.b, 'impact_bits': self.impact_bits,
+                       'average_length': self.total_length / max(self.number_of_documents, 1),
+                       'doc_ids': list(self.doc_lengths),
+                       'lengths': list(self.doc_lengths.values())}, fp)
+
+    def read(self):
+        self.version += 1
+        with open(lengths_filename(self.filename)) as fp:
+            record = json.load(fp)
+        # The stored impacts were computed with the parameters of the writer.
+        self.k1, self.b, self.impact_bits = record['k1'], record['b'], record['impact_bits']
+        lengths = array('I', record['lengths'])
+        self.doc_lengths = dict(zip(record['doc_ids'], lengths))
+        self.total_length = sum(lengths)
+        with open(self.filename) as fp:
+            record = json.loads(fp.readline())
+            self.number_of_documents = record['number_of_documents']
+            self.term_to_doc_id_and_counts = defaultdict(dict)
+            self.term_to_doc_id_and_impacts = dict()
+            self.doc_counts = Counter()
+            self.max_impacts = dict()
+            for line in fp:
+                record = json.loads(line)
+                term = record['term']
+                self.doc_counts[term] = record['documents_count']
+                self.max_impacts[term] = record['max_impact']
+                self.term_to_doc_id_and_counts[term] = {
+                    sub_record['doc_id']: sub_record['tf'] for sub_record in record['index']}
+                self.term_to_doc_id_and_impacts[term] = {
+                    sub_record['doc_id']: sub_record['impact'] for sub_record in record['index']}
+        self.impacts_version = self.version
+
+    def search(self, query: Query) -> SearchResults:
+        self.update_impacts()
+        for term in query.terms:
+            if term not in self.term_to_doc_id_and_impacts:
+                return SearchResults([])
+        if not self.top_k_pruning:
+            return self.search_many([query])[0]
+        postings = {term: self.term_to_doc_id_and_impacts[term] for term in query.terms}
+        # The idf is part of the impacts, every term has weight 1.
+        weights = dict.fromkeys(postings, 1)
+        return SearchResults(
+            top_k_conjunctive(query.terms, postings, weights, self.max_impacts, query.num_results,
+                              self.observer, impact_ordered=True))
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        self.update_impacts()
+        postings = {term: self.term_to_doc_id_and_impacts[term] for query in queries for term in query.terms
+                    if term in self.term_to_doc_id_and_impacts}
+        weights = dict.fromkeys(postings, 1)
+        return search_many_with_postings(queries, postings, weights, self.max_impacts, self.top_k_pruning,
+                                         impact_ordered=True)
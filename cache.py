@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Size-bounded least recently used cache with hit and miss counters.
+
+    The size of every value is measured with size_of (1 by default, which bounds the number of
+    entries), and the least recently used entries are evicted once the total goes over max_size or
+    the number of entries goes over max_entries. With a ttl, entries also expire ttl seconds after
+    they were put into the cache. All operations hold a lock, so the cache can be shared by threads.
+    """
+    def __init__(self, max_size: int, size_of: Callable[[Any], int] = lambda value: 1,
+                 max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.size_of = size_of
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        # dict mapping a key to a tuple (value, size, expiry time), ordered from least to most
+        # recently used.
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def get(self, key: Hashable, default=None):
+        """
+        Returns the cached value and marks it as most recently used, or default on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= self.clock():
+                self.pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value) -> None:
+        """
+        Caches the value, evicting least recently used entries as needed. A value bigger than
+        max_size on its own is not cached.
+        """
+        with self.lock:
+            self.pop(key)
+            size = self.size_of(value)
+            if size > self.max_size:
+                return
+            expiry = self.clock() + self.ttl if self.ttl is not None else None
+            self.entries[key] = (value, size, expiry)
+            self.size += size
+            while self.size > self.max_size or \
+                    (self.max_entries is not None and len(self.entries) > self.max_entries):
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def pop(self, key: Hashable, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return default
+            self.size -= entry[1]
+            return entry[0]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
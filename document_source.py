@@ -1,7 +1,11 @@
 import abc
 import json
+import mmap
+import os
 from abc import ABC
+from typing import Any, Dict, Iterable, Iterator, TextIO
 
+from cache import LRUCache
 from documents import DocumentCollection, DictDocumentCollection, InputDocument
 
 
@@ -9,8 +13,8 @@ class DocumentSource(ABC):
     """
     Text Acquisition component of the Indexing Process.
 
-    This can be a feed or a crawled source, though the current interface reads all documents
-    at the same time.
+    This can be a feed or a crawled source. read() loads all documents at the same time, stream()
+    yields them one at a time.
     """
     @abc.abstractmethod
     def read(self) -> DocumentCollection:
@@ -20,6 +24,81 @@ class DocumentSource(ABC):
         """
         pass
 
+    def stream(self) -> Iterator[InputDocument]:
+        """
+        Get documents from this source lazily, without keeping all of them in memory.
+
+        Sources that cannot do better fall back to iterating over read().
+        :return: Iterator over all documents from this source.
+        """
+        return iter(self.read())
+
+
+def _skip_whitespace(buffer: str, pos: int) -> int:
+    while pos < len(buffer) and buffer[pos] in ' \t\n\r':
+        pos += 1
+    return pos
+
+
+def iter_json_array(fp: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Parses a file holding a JSON array, yielding one element at a time.
+
+    Only the element being parsed is kept in memory, the file is read chunk_size characters at a
+    time.
+    :param fp: The file to parse.
+    :param chunk_size: Number of characters read at a time.
+    :return: Iterator over the array elements.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, eof
+        # Read at least as much as is buffered, so a large element is not reparsed too often.
+        more = fp.read(max(chunk_size, len(buffer) - pos))
+        eof = not more
+        buffer = buffer[pos:] + more
+        pos = 0
+        return not eof
+
+    def next_char() -> str:
+        nonlocal pos
+        pos = _skip_whitespace(buffer, pos)
+        while pos == len(buffer):
+            if not read_more():
+                raise ValueError('Unexpected end of JSON array')
+            pos = _skip_whitespace(buffer, pos)
+        return buffer[pos]
+
+    if next_char() != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+    if next_char() == ']':
+        return
+    while True:
+        next_char()
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if not read_more():
+                raise
+            continue
+        # A number at the end of the buffer may continue in the next chunk.
+        if end == len(buffer) and not eof:
+            read_more()
+            continue
+        yield value
+        pos = end
+        separator = next_char()
+        pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f'Expected , or ] in JSON array, got {separator!r}')
+
 
 class WikiJsonDocumentSource(DocumentSource):
     """
@@ -42,6 +121,11 @@ class WikiJsonDocumentSource(DocumentSource):
             docs.insert(InputDocument(doc_id=record['id'], text=record['init_text'], title=record['title']))
         return docs
 
+    def stream(self) -> Iterator[InputDocument]:
+        with open(self.filename) as fp:
+            for record in iter_json_array(fp):
+                yield InputDocument(doc_id=record['id'], text=record['init_text'], title=record['title'])
+
 
 class TrecCovidJsonlSource(DocumentSource):
     def __init__(self, filename: str):
@@ -54,3 +138,100 @@ class TrecCovidJsonlSource(DocumentSource):
                 record = json.loads(line)
                 doc_collection.insert(InputDocument(record['_id'], record['text'], record['title']))
         return doc_collection
+
+    def stream(self) -> Iterator[InputDocument]:
+        with open(self.filename) as f:
+            for line in f:
+                record = json.loads(line)
+                yield InputDocument(record['_id'], record['text'], record['title'])
+
+
+class TrecCovidJsonlDocumentCollection(DocumentCollection):
+    """
+    DocumentCollection that serves documents straight from a TREC-COVID corpus.jsonl file, so the
+    corpus text is never loaded into memory.
+
+    A doc_id -> byte offset index is built by scanning the corpus once and saved into
+    filename + '.offsets', and rebuilt only if the corpus size changes. The corpus is memory-mapped,
+    get_doc() parses just the line of the requested document, and the most recently used documents
+    are kept in a small LRUCache.
+    """
+    def __init__(self, filename: str, cache_size: int = 1000):
+        """
+        :param filename: Path to the corpus.jsonl file.
+        :param cache_size: Number of documents to cache, 0 disables the cache.
+        """
+        self.filename = filename
+        self.offsets_filename = filename + '.offsets'
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.offsets = self.read_offsets()
+        if self.offsets is None:
+            self.offsets = self.build_offsets()
+            self.write_offsets()
+        self.corpus = None
+        self.map_corpus()
+
+    def read_offsets(self):
+        if not os.path.exists(self.offsets_filename):
+            return None
+        with open(self.offsets_filename) as fp:
+            record = json.load(fp)
+        if record['corpus_size'] != os.path.getsize(self.filename):
+            return None
+        return record['offsets']
+
+    def build_offsets(self) -> Dict[str, int]:
+        offsets = dict()
+        offset = 0
+        with open(self.filename, 'rb') as fp:
+            for line in fp:
+                if line.strip():
+                    offsets[json.loads(line)['_id']] = offset
+                offset += len(line)
+        return offsets
+
+    def write_offsets(self) -> None:
+        with open(self.offsets_filename, 'w') as fp:
+            json.dump({'corpus_size': os.path.getsize(self.filename), 'offsets': self.offsets}, fp)
+
+    def map_corpus(self) -> None:
+        if self.corpus is not None:
+            self.corpus.close()
+        self.corpus = None
+        if os.path.getsize(self.filename):
+            with open(self.filename, 'rb') as fp:
+                self.corpus = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_doc(self, doc_id: str) -> InputDocument:
+        doc = self.cache.get(doc_id) if self.cache is not None else None
+        if doc is None:
+            offset = self.offsets[doc_id]
+            end = self.corpus.find(b'\n', offset)
+            record = json.loads(self.corpus[offset:end if end != -1 else len(self.corpus)])
+            doc = InputDocument(record['_id'], record['text'], record['title'])
+            if self.cache is not None:
+                self.cache.put(doc_id, doc)
+        return doc
+
+    def get_docs(self, doc_ids: Iterable[str]) -> DocumentCollection:
+        return DictDocumentCollection({doc_id: self.get_doc(doc_id) for doc_id in doc_ids})
+
+    def __iter__(self) -> Iterator[InputDocument]:
+        return TrecCovidJsonlSource(self.filename).stream()
+
+    def insert(self, doc: InputDocument) -> None:
+        """
+        Appends the document to the corpus file.
+        """
+        record = {'_id': doc.doc_id, 'title': doc.title, 'text': doc.text}
+        with open(self.filename, 'ab') as fp:
+            offset = fp.tell()
+            if offset and self.corpus[offset - 1:offset] != b'\n':
+                fp.write(b'\n')
+                offset += 1
+            fp.write((json.dumps(record) + '\n').encode())
+        self.offsets[doc.doc_id] = offset
+        if self.cache is not None:
+            self.cache.pop(doc.doc_id)
+        self.map_corpus()
+        self.write_offsets()
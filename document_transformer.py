@@ -1,7 +1,11 @@
 import abc
 from abc import ABC
+from array import array
+from typing import Iterable
 
-from documents import InputDocument, TransformedDocument
+from documents import DocumentBatch, InputDocument, TransformedDocument
+from tokenizer import Normalizer
+from vocabulary import Vocabulary
 
 
 class DocumentTransformer(ABC):
@@ -14,6 +18,14 @@ class DocumentTransformer(ABC):
     def transform_document(self, doc: InputDocument) -> TransformedDocument:
         pass
 
+    def transform_batch(self, docs: Iterable[InputDocument]) -> DocumentBatch:
+        """
+        Transforms documents in bulk into the columnar DocumentBatch representation.
+        :param docs: The InputDocuments to be transformed.
+        :return: The transformed documents, in the same order.
+        """
+        return DocumentBatch.from_documents(self.transform_document(doc) for doc in docs)
+
 
 class NaiveSearchDocumentTransformer(DocumentTransformer):
     """
@@ -34,3 +46,54 @@ class NaiveSearchDocumentTransformer(DocumentTransformer):
         :return: The transformed document
         """
         return TransformedDocument(doc_id=doc.doc_id, tokens=self.tokenizer.tokenize(doc.text))
+
+    def transform_batch(self, docs: Iterable[InputDocument]) -> DocumentBatch:
+        doc_ids = []
+        tokens = []
+        offsets = array('Q', [0])
+        for doc in docs:
+            doc_ids.append(doc.doc_id)
+            tokens.extend(self.tokenizer.tokenize(doc.text))
+            offsets.append(len(tokens))
+        return DocumentBatch(doc_ids=doc_ids, tokens=tokens, offsets=offsets)
+
+
+class NormalizingDocumentTransformer(DocumentTransformer):
+    """
+    DocumentTransformer that normalizes the tokens produced by another DocumentTransformer, e.g.
+    with a stemming CachedNormalizer.
+    """
+    def __init__(self, document_transformer: DocumentTransformer, normalizer: Normalizer):
+        """
+        :param document_transformer: Transformer producing the tokens.
+        :param normalizer: Normalizer applied to the tokens of every document.
+        """
+        self.document_transformer = document_transformer
+        self.normalizer = normalizer
+
+    def transform_document(self, doc: InputDocument) -> TransformedDocument:
+        transformed = self.document_transformer.transform_document(doc)
+        return TransformedDocument(doc_id=transformed.doc_id,
+                                   tokens=self.normalizer.normalize(transformed.tokens))
+
+
+class TermIdDocumentTransformer(DocumentTransformer):
+    """
+    DocumentTransformer that replaces the tokens produced by another DocumentTransformer with
+    their ids in a Vocabulary, stored as a compact array in TransformedDocument.term_ids.
+
+    The vocabulary has to be the one of the TermIdInvertedIndexWithFrequencies the documents are
+    added to.
+    """
+    def __init__(self, document_transformer: DocumentTransformer, vocabulary: Vocabulary):
+        """
+        :param document_transformer: Transformer producing the tokens.
+        :param vocabulary: Vocabulary the tokens are added to.
+        """
+        self.document_transformer = document_transformer
+        self.vocabulary = vocabulary
+
+    def transform_document(self, doc: InputDocument) -> TransformedDocument:
+        transformed = self.document_transformer.transform_document(doc)
+        return TransformedDocument(doc_id=transformed.doc_id, tokens=[],
+                                   term_ids=self.vocabulary.encode(transformed.tokens))
@@ -1,10 +1,11 @@
 import abc
 import dataclasses
 from abc import ABC
-from typing import List, Iterable, Iterator, Dict
+from array import array
+from typing import List, Iterable, Iterator, Dict, Optional
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class InputDocument:
     """
     Common raw document representation as produced by Text Aquisition stage.
@@ -16,7 +17,7 @@ class InputDocument:
     title: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class TransformedDocument:
     """
     Document representation after the Text Transformation stage.
@@ -25,6 +26,60 @@ class TransformedDocument:
     """
     doc_id: str
     tokens: List[str]
+    # Ids of the tokens in a Vocabulary, set instead of tokens by TermIdDocumentTransformer.
+    term_ids: Optional[array] = None
+
+
+@dataclasses.dataclass(slots=True)
+class DocumentBatch:
+    """
+    Columnar representation of a list of TransformedDocuments, used to transform and index
+    documents in bulk without an object per document.
+
+    The tokens of all documents are concatenated into one flat list, the tokens of the i-th document
+    being tokens[offsets[i]:offsets[i + 1]]. For documents with term_ids, the flat term ids use the
+    same offsets and tokens stays empty.
+    """
+    doc_ids: List[str]
+    tokens: List[str]
+    offsets: array
+    term_ids: Optional[array] = None
+
+    @staticmethod
+    def from_documents(docs: Iterable[TransformedDocument]) -> 'DocumentBatch':
+        """
+        :param docs: Documents that either all have term_ids, or none of them.
+        """
+        doc_ids = []
+        tokens = []
+        term_ids = None
+        offsets = array('Q', [0])
+        for doc in docs:
+            doc_ids.append(doc.doc_id)
+            if doc.term_ids is not None:
+                if term_ids is None:
+                    term_ids = array('I')
+                term_ids.extend(doc.term_ids)
+                offsets.append(len(term_ids))
+            else:
+                tokens.extend(doc.tokens)
+                offsets.append(len(tokens))
+        return DocumentBatch(doc_ids=doc_ids, tokens=tokens, offsets=offsets, term_ids=term_ids)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __iter__(self) -> Iterator[TransformedDocument]:
+        """
+        :return: Iterator over the documents of the batch, as TransformedDocuments.
+        """
+        offsets = self.offsets
+        for i, doc_id in enumerate(self.doc_ids):
+            if self.term_ids is not None:
+                yield TransformedDocument(doc_id=doc_id, tokens=[],
+                                          term_ids=self.term_ids[offsets[i]:offsets[i + 1]])
+            else:
+                yield TransformedDocument(doc_id=doc_id, tokens=self.tokens[offsets[i]:offsets[i + 1]])
 
 
 class DocumentCollection(ABC):
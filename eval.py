@@ -1,7 +1,9 @@
 # Functions for evaluating search results
 import dataclasses
 import json
-from typing import Dict, List
+import multiprocessing
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 
 import query_process
 from search_api import Query, SearchResults
@@ -37,14 +39,61 @@ def run_queries(
     """
 
     query_id_to_query = read_queries(queries_filename)
-    query_id_to_result_doc_ids = dict()  # The dict to be returned.
-    for query_id, query_string in query_id_to_query.items():
-        query: Query = query_process.query_parser.parse_query(query_string, num_results)
-        results: SearchResults = query_process.index.search(query)
-        query_id_to_result_doc_ids[query_id] = results.result_doc_ids
+    queries: List[Query] = [query_process.query_parser.parse_query(query_string, num_results)
+                            for query_string in query_id_to_query.values()]
+    all_results: List[SearchResults] = query_process.index.search_many(queries)
+    # The dict to be returned.
+    query_id_to_result_doc_ids = {query_id: results.result_doc_ids
+                                  for query_id, results in zip(query_id_to_query, all_results)}
     return query_id_to_result_doc_ids
 
 
+# QueryProcess of a worker of run_queries_parallel, set by _init_worker.
+_worker_query_process: Optional[query_process.QueryProcess] = None
+
+
+def _init_worker(process: query_process.QueryProcess) -> None:
+    global _worker_query_process
+    _worker_query_process = process
+
+
+def _run_query_chunk(query_strings: List[str], num_results: int) -> List[List[str]]:
+    queries = [_worker_query_process.query_parser.parse_query(query_string, num_results)
+               for query_string in query_strings]
+    return [results.result_doc_ids for results in _worker_query_process.index.search_many(queries)]
+
+
+def run_queries_parallel(
+        queries_filename: str, query_process: query_process.QueryProcess, num_results: int = 10,
+        num_workers: Optional[int] = None, chunk_size: int = 100
+) -> Dict[int, List[str]]:
+    """
+    Same as run_queries(), with the queries split into chunks that run in a pool of worker
+    processes.
+
+    Where the platform supports fork, the workers share the memory of the already loaded index
+    instead of receiving a pickled copy of it, so query_process is only read in the workers.
+    :param queries_filename: jsonl file with queries.
+    :param query_process: QueryProcess used to run search.
+    :param num_results: Number of results to request for each query.
+    :param num_workers: Number of worker processes, the number of CPUs by default.
+    :param chunk_size: Number of queries sent to a worker at a time.
+    :return: Dict that maps query ids to result_doc_id lists.
+    """
+    query_id_to_query = read_queries(queries_filename)
+    query_strings = list(query_id_to_query.values())
+    chunks = [query_strings[i:i + chunk_size] for i in range(0, len(query_strings), chunk_size)]
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(num_workers, initializer=_init_worker, initargs=(query_process,)) as pool:
+        async_results = [pool.apply_async(_run_query_chunk, (chunk, num_results)) for chunk in chunks]
+        all_result_doc_ids = [result_doc_ids for async_result in async_results
+                              for result_doc_ids in async_result.get()]
+    return dict(zip(query_id_to_query, all_result_doc_ids))
+
+
 def read_tests(tests_filename) -> List[EvalEntry]:
     """
     Reads the relevance ratings into a list of EvalEntries.
@@ -62,6 +111,19 @@ def read_tests(tests_filename) -> List[EvalEntry]:
     return out
 
 
+def index_grades(reference_values: List[EvalEntry]) -> Dict[Tuple[int, str], int]:
+    """
+    Builds a lookup of the relevance ratings.
+    :param reference_values: The output of read_tests().
+    :return: Dict that maps (query_id, doc_id) to the rating. The first rating wins for
+        duplicated pairs, as in annotate_single_result().
+    """
+    grades = dict()
+    for entry in reference_values:
+        grades.setdefault((entry.query_id, entry.result_doc_id), entry.eval_value)
+    return grades
+
+
 def annotate_single_result(
         query_id: int, doc_id: str, reference_values: List[EvalEntry]
 ) -> EvalEntry:
@@ -79,14 +141,67 @@ def annotate_results(query_id_to_result_doc_ids: Dict[int, List[str]],
     :param reference_values: The output of read_tests().
     :return: List of EvalEntries corresponding to actual results from out search engine.
     """
+    grades = index_grades(reference_values)
     out = list()
     for query_id, result_doc_ids in query_id_to_result_doc_ids.items():
         for doc_id in result_doc_ids:
-            out.append(annotate_single_result(
-                query_id=query_id, doc_id=doc_id, reference_values=reference_values))
+            out.append(EvalEntry(query_id=query_id, result_doc_id=doc_id,
+                                 eval_value=grades.get((query_id, doc_id), 0)))  # 0: Not relevant.
     return out
 
 
 def score_by_sum_of_eval_values(annotated_results: List[EvalEntry]) -> int:
     return sum([e.eval_value for e in annotated_results])
 
+
+def compute_metrics(query_id_to_result_doc_ids: Dict[int, List[str]],
+                    reference_values: List[EvalEntry], k: int = 10) -> Dict[str, float]:
+    """
+    Computes the mean precision at k, mean average precision and mean nDCG at k over all queries.
+
+    The ratings of the results of all queries are gathered into one (queries x k) array, and every
+    metric is computed over that array at once. Results rated above 0 count as relevant. Average
+    precision is normalized by the number of relevant ratings of the query, and nDCG uses the
+    (2^rating - 1) gain with the ideal ordering of the query's ratings.
+    :param query_id_to_result_doc_ids: The output of run_queries()
+    :param reference_values: The output of read_tests().
+    :param k: Number of top results taken into account.
+    :return: Dict with 'precision_at_k', 'map' and 'ndcg_at_k'.
+    """
+    # NumPy is optional, only the metrics need it.
+    import numpy as np
+
+    grades = index_grades(reference_values)
+    query_ids = list(query_id_to_result_doc_ids)
+    if not query_ids:
+        return {'precision_at_k': 0.0, 'map': 0.0, 'ndcg_at_k': 0.0}
+    query_id_to_row = {query_id: row for row, query_id in enumerate(query_ids)}
+    result_grades = np.zeros((len(query_ids), k))
+    for row, query_id in enumerate(query_ids):
+        for rank, doc_id in enumerate(query_id_to_result_doc_ids[query_id][:k]):
+            result_grades[row, rank] = grades.get((query_id, doc_id), 0)
+    # Best possible ratings of every query, in decreasing order.
+    query_id_to_judged_grades = defaultdict(list)
+    for (query_id, _), grade in grades.items():
+        if query_id in query_id_to_row and grade > 0:
+            query_id_to_judged_grades[query_id].append(grade)
+    ideal_grades = np.zeros((len(query_ids), k))
+    number_of_relevant = np.zeros(len(query_ids))
+    for query_id, judged_grades in query_id_to_judged_grades.items():
+        row = query_id_to_row[query_id]
+        number_of_relevant[row] = len(judged_grades)
+        top_grades = sorted(judged_grades, reverse=True)[:k]
+        ideal_grades[row, :len(top_grades)] = top_grades
+
+    relevant = result_grades > 0
+    ranks = np.arange(1, k + 1)
+    precision_at_rank = np.cumsum(relevant, axis=1) / ranks
+    precision_at_k = relevant.sum(axis=1) / k
+    average_precision = np.divide((precision_at_rank * relevant).sum(axis=1), number_of_relevant,
+                                  out=np.zeros(len(query_ids)), where=number_of_relevant > 0)
+    discounts = 1 / np.log2(ranks + 1)
+    dcg = ((2 ** result_grades - 1) * discounts).sum(axis=1)
+    ideal_dcg = ((2 ** ideal_grades - 1) * discounts).sum(axis=1)
+    ndcg = np.divide(dcg, ideal_dcg, out=np.zeros(len(query_ids)), where=ideal_dcg > 0)
+    return {'precision_at_k': float(precision_at_k.mean()), 'map': float(average_precision.mean()),
+            'ndcg_at_k': float(ndcg.mean())}
@@ -1,21 +1,49 @@
 import abc
+import base64
+import heapq
 import json
 import math
+import mmap
 from abc import ABC
+from array import array
+import os
 from collections import defaultdict, Counter
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-from documents import TransformedDocument
+from cache import LRUCache
+from documents import DocumentBatch, TransformedDocument
+from instrumentation import NULL_OBSERVER, PipelineObserver, deep_size_of
+from postings import CompressedPostingList, FrozenPostings, FrozenTermValues, PackedPostings, PostingCursor, \
+    freeze_postings
 from search_api import Query, SearchResults
+from snapshot import read_snapshot, write_snapshot
+from vocabulary import Vocabulary
 
 
 class Index(ABC):
     """
     Index that is the final output of the Indexing Process and the main source for Query Process.
     """
+    # Incremented by implementations whenever the indexed content changes, e.g. in add_document()
+    # and read(), so that anything derived from search results can tell it is stale.
+    version = 0
+    # Receives the search counters 'search.postings_touched' and 'search.candidates_scored' from
+    # implementations that report them.
+    observer: PipelineObserver = NULL_OBSERVER
+
     @abc.abstractmethod
     def add_document(self, doc: TransformedDocument) -> None:
         pass
 
+    def add_documents(self, batch: DocumentBatch) -> None:
+        """
+        Bulk version of add_document().
+        :param batch: The documents to add, in order.
+        """
+        for doc in batch:
+            self.add_document(doc)
+
     @abc.abstractmethod
     def search(self, query: Query) -> SearchResults:
         pass
@@ -28,6 +56,60 @@ class Index(ABC):
     def write(self):
         pass
 
+    def merge(self, other: 'Index') -> None:
+        """
+        Adds all documents of another index of the same type, as if they were added after the
+        documents of this index. Used to combine partial indexes built in parallel.
+        :param other: The index to merge into this one.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support merging')
+
+    def freeze(self) -> None:
+        """
+        Converts the built index in place into compact read-only structures for serving. Adding or
+        merging documents afterwards raises ValueError, read() makes the index mutable again.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support freezing')
+
+    @property
+    def frozen(self) -> bool:
+        return False
+
+    def write_snapshot(self) -> None:
+        """
+        Writes the index in a format that read_snapshot() loads without parsing the postings.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support snapshots')
+
+    def read_snapshot(self) -> None:
+        """
+        Loads the index written by write_snapshot(). The index is frozen afterwards.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support snapshots')
+
+    def check_not_frozen(self) -> None:
+        if self.frozen:
+            raise ValueError(f'{type(self).__name__} is frozen and cannot be changed')
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Estimates the memory held by the index.
+        :return: Dict with the bytes held by every attribute of the index under 'structures', and
+            their sum under 'total_bytes'. Objects shared between attributes are only counted in
+            the first one.
+        """
+        seen = set()
+        structures = {name: deep_size_of(value, seen) for name, value in vars(self).items()}
+        return {'structures': structures, 'total_bytes': sum(structures.values())}
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        """
+        Batch search. Implementations can share work between queries with common terms.
+        :param queries: The queries to run.
+        :return: The results of every query, in the same order as the queries.
+        """
+        return [self.search(query) for query in queries]
+
 
 class Indexer(ABC):
     """
@@ -45,6 +127,11 @@ class NaiveIndex(Index):
 
     def add_document(self, doc: TransformedDocument) -> None:
         self.docs.append(doc)
+        self.version += 1
+
+    def merge(self, other: Index) -> None:
+        self.docs.extend(other.docs)
+        self.version += 1
 
     def search(self, query: Query) -> SearchResults:
         query_terms = set(query.terms)
@@ -65,6 +152,7 @@ class NaiveIndex(Index):
         #     self.docs.append(TransformedDocument(doc_id=record['doc_id'], tokens=record['tokens']))
         self.docs = [TransformedDocument(doc_id=record['doc_id'], tokens=record['tokens'])
                      for record in records]
+        self.version += 1
 
     def write(self):
         with open(self.filename, 'w') as fp:
@@ -86,6 +174,11 @@ class TextProcessIndex(Index):
 
     def add_document(self, doc: TransformedDocument) -> None:
         self.docs.append(doc)
+        self.version += 1
+
+    def merge(self, other: Index) -> None:
+        self.docs.extend(other.docs)
+        self.version += 1
 
     def search(self, query: Query) -> SearchResults:
         query_terms = set(query.terms)
@@ -106,6 +199,7 @@ class TextProcessIndex(Index):
         #     self.docs.append(TransformedDocument(doc_id=record['doc_id'], tokens=record['tokens']))
         self.docs = [TransformedDocument(doc_id=record['doc_id'], tokens=record['tokens'])
                      for record in records]
+        self.version += 1
 
     def write(self):
         with open(self.filename, 'w') as fp:
@@ -130,50 +224,411 @@ def inverse_document_frequency(term_document_count, number_of_document):
     return math.log(number_of_document / term_document_count)
 
 
+def rank_by_score(match_scores: Dict[str, float]) -> List[str]:
+    """
+    Orders doc_ids by decreasing score. Ties are broken by doc_id, so the ranking does not depend on
+    the order in which the scores were computed.
+    """
+    return sorted(match_scores.keys(), key=lambda doc_id: (-match_scores[doc_id], doc_id))
+
+
+def frozen_structures(index: Index, as_mapping: bool) -> Tuple[FrozenPostings, FrozenTermValues, FrozenTermValues]:
+    """
+    Packs term_to_doc_id_and_frequencies, doc_counts and max_tfs of an inverted index: the postings
+    into a FrozenPostings, and the per-term statistics into arrays in the order of its sorted term
+    table. The index is not changed.
+    :return: The frozen postings, doc_counts and max_tfs. The index's own if it is frozen.
+    """
+    if isinstance(index.term_to_doc_id_and_frequencies, FrozenPostings):
+        return index.term_to_doc_id_and_frequencies, index.doc_counts, index.max_tfs
+    postings = freeze_postings(index.term_to_doc_id_and_frequencies, as_mapping)
+    # doc_counts is a Counter, so missing terms count 0.
+    doc_counts = FrozenTermValues(postings, array('I', [index.doc_counts[term] for term in postings.terms]),
+                                  missing=0)
+    max_tfs = FrozenTermValues(postings, array('d', [index.max_tfs[term] for term in postings.terms]))
+    return postings, doc_counts, max_tfs
+
+
+def freeze_inverted_index(index: Index, as_mapping: bool) -> None:
+    """
+    freeze() of the inverted indexes with term_to_doc_id_and_frequencies, doc_counts and max_tfs.
+    """
+    index.term_to_doc_id_and_frequencies, index.doc_counts, index.max_tfs = frozen_structures(index, as_mapping)
+
+
+def snapshot_filename(index_filename: str) -> str:
+    return index_filename + '.snapshot'
+
+
+def write_index_snapshot(index: Index, **extra_state) -> None:
+    """
+    write_snapshot() of the inverted indexes with term_to_doc_id_and_frequencies, doc_counts and
+    max_tfs: their frozen structures are written with snapshot.write_snapshot(), so the arrays
+    are stored as contiguous buffers.
+    :param extra_state: Additional state of a subclass, written into the same snapshot.
+    """
+    postings, doc_counts, max_tfs = frozen_structures(index, as_mapping=False)
+    write_snapshot(snapshot_filename(index.filename), {
+        'number_of_documents': index.number_of_documents,
+        'postings': postings,
+        'doc_counts': doc_counts,
+        'max_tfs': max_tfs,
+        **extra_state,
+    })
+
+
+def read_index_snapshot(index: Index, as_mapping: bool) -> Dict[str, Any]:
+    """
+    read_snapshot() of the inverted indexes with term_to_doc_id_and_frequencies, doc_counts and
+    max_tfs. Only the term and doc_id tables are unpickled, the arrays are memoryviews into the
+    memory-mapped snapshot, kept open in index.snapshot_buffer.
+    :return: The whole snapshot state, including the extra_state given to write_index_snapshot().
+    """
+    state, index.snapshot_buffer = read_snapshot(snapshot_filename(index.filename))
+    index.version += 1
+    index.number_of_documents = state['number_of_documents']
+    index.term_to_doc_id_and_frequencies = state['postings']
+    # The layout is the same for lists and mappings, only the type of the looked up postings differs.
+    index.term_to_doc_id_and_frequencies.as_mapping = as_mapping
+    index.doc_counts = state['doc_counts']
+    index.max_tfs = state['max_tfs']
+    return state
+
+
+def add_postings_statistics(report: Dict[str, Any], term_to_postings: Mapping) -> Dict[str, Any]:
+    """
+    Adds the number of terms and postings, and the bytes per posting, to a memory_report().
+    """
+    if isinstance(term_to_postings, FrozenPostings):
+        number_of_postings = term_to_postings.number_of_postings
+    else:
+        number_of_postings = sum(len(postings) for postings in term_to_postings.values())
+    report['number_of_terms'] = len(term_to_postings)
+    report['number_of_postings'] = number_of_postings
+    report['postings_per_term'] = number_of_postings / max(len(term_to_postings), 1)
+    report['bytes_per_posting'] = report['total_bytes'] / max(number_of_postings, 1)
+    return report
+
+
+class _RankedDoc:
+    """
+    Entry of the top-k heap in top_k_conjunctive, ordered the same way as rank_by_score with the
+    worst document being the smallest.
+    """
+    __slots__ = ('score', 'doc_id')
+
+    def __init__(self, score: float, doc_id: str):
+        self.score = score
+        self.doc_id = doc_id
+
+    def __lt__(self, other: '_RankedDoc') -> bool:
+        return (self.score, other.doc_id) < (other.score, self.doc_id)
+
+
+# Relative slack for comparing score upper bounds, so that floating point rounding in a bound can
+# never prune a document that belongs to the top k.
+_BOUND_SLACK = 1 + 1e-9
+
+
+def top_k_conjunctive(terms: List[str], postings: Dict[str, Mapping],
+                      idfs: Dict[str, float], max_tfs: Dict[str, float],
+                      num_results: int, observer: PipelineObserver = NULL_OBSERVER,
+                      impact_ordered: bool = False) -> List[str]:
+    """
+    MaxScore style top-k retrieval for conjunctive queries.
+
+    The postings of the rarest term drive the search in decreasing order of tf, the other terms are
+    only probed for the driving documents. A bounded heap keeps the best num_results documents.
+    Once the driving posting plus the maximum scores of the other terms cannot beat the worst
+    document in the heap, no remaining document can make it into the top k and the search stops.
+    Scores are summed in query term order, so the results are identical to the exhaustive search.
+    :param terms: Query terms, all of them present in postings.
+    :param postings: Maps each query term to a doc_id -> tf mapping.
+    :param idfs: Maps each query term to its inverse document frequency.
+    :param max_tfs: Maps each query term to the maximum tf in its postings.
+    :param num_results: Number of results to return.
+    :param observer: Gets the number of postings touched and candidates fully scored.
+    :param impact_ordered: The postings already iterate in decreasing order of tf, so the driving
+        postings are used as they are instead of being sorted.
+    :return: The top num_results doc_ids ordered as by rank_by_score.
+    """
+    if not terms or num_results <= 0:
+        return []
+    term_counts = Counter(terms)
+    max_scores = {term: count * max_tfs[term] * idfs[term] for term, count in term_counts.items()}
+    driver, *others = sorted(term_counts, key=lambda term: len(postings[term]))
+    # Upper bounds of the score the remaining probed terms can add.
+    remaining_max_scores = [sum(max_scores[term] for term in others[i:]) for i in range(len(others))]
+    remaining_max_scores.append(0.0)
+    driver_weight = term_counts[driver] * idfs[driver]
+    heap = []
+    postings_touched = len(postings[driver])
+    candidates_scored = 0
+    if impact_ordered:
+        driver_postings = postings[driver].items()
+    else:
+        driver_postings = sorted(postings[driver].items(), key=lambda posting: posting[1], reverse=True)
+    for doc_id, tf in driver_postings:
+        partial_score = tf * driver_weight
+        if len(heap) == num_results and \
+                (partial_score + remaining_max_scores[0]) * _BOUND_SLACK < heap[0].score:
+            break
+        for i, term in enumerate(others):
+            postings_touched += 1
+            if doc_id not in postings[term]:
+                break
+            partial_score += postings[term][doc_id] * idfs[term] * term_counts[term]
+            if len(heap) == num_results and \
+                    (partial_score + remaining_max_scores[i + 1]) * _BOUND_SLACK < heap[0].score:
+                break
+        else:
+            candidates_scored += 1
+            ranked_doc = _RankedDoc(sum(postings[term][doc_id] * idfs[term] for term in terms), doc_id)
+            if len(heap) < num_results:
+                heapq.heappush(heap, ranked_doc)
+            elif heap[0] < ranked_doc:
+                heapq.heapreplace(heap, ranked_doc)
+    observer.count('search.postings_touched', postings_touched)
+    observer.count('search.candidates_scored', candidates_scored)
+    return [ranked_doc.doc_id for ranked_doc in sorted(heap, reverse=True)]
+
+
+def search_many_with_postings(queries: List[Query], postings: Dict[str, Mapping],
+                              idfs: Dict[str, float], max_tfs: Dict[str, float],
+                              top_k_pruning: bool, impact_ordered: bool = False) -> List[SearchResults]:
+    """
+    Runs a batch of conjunctive queries over postings prepared once for the whole batch.
+
+    Queries with the same terms are scored and ranked only once, for the largest num_results among
+    them. Scores are summed in query term order, so the results are the same as from search().
+    :param queries: The queries to run.
+    :param postings: Maps every indexed term of the queries to a doc_id -> tf mapping.
+    :param idfs: Maps every indexed term of the queries to its inverse document frequency.
+    :param max_tfs: Maps every indexed term to its maximum tf, used with top_k_pruning.
+    :param top_k_pruning: Rank with top_k_conjunctive instead of scoring every match.
+    :param impact_ordered: Same as in top_k_conjunctive.
+    :return: The results of every query.
+    """
+    terms_to_num_results = defaultdict(int)
+    for query in queries:
+        terms = tuple(query.terms)
+        terms_to_num_results[terms] = max(terms_to_num_results[terms], query.num_results)
+    terms_to_ranking = dict()
+    for terms, num_results in terms_to_num_results.items():
+        if not terms or any(term not in postings for term in terms):
+            terms_to_ranking[terms] = []
+        elif top_k_pruning:
+            terms_to_ranking[terms] = top_k_conjunctive(list(terms), postings, idfs, max_tfs, num_results,
+                                                        impact_ordered=impact_ordered)
+        else:
+            # Intersecting from the rarest term keeps the intermediate sets small.
+            rarest_first = sorted(set(terms), key=lambda term: len(postings[term]))
+            matching_doc_ids = set(postings[rarest_first[0]].keys())
+            for term in rarest_first[1:]:
+                matching_doc_ids &= postings[term].keys()
+            match_scores = {doc_id: sum(postings[term][doc_id] * idfs[term] for term in terms)
+                            for doc_id in matching_doc_ids}
+            # Same order as rank_by_score, without sorting the documents that are not returned.
+            terms_to_ranking[terms] = heapq.nsmallest(
+                num_results, match_scores, key=lambda doc_id: (-match_scores[doc_id], doc_id))
+    return [SearchResults(terms_to_ranking[tuple(query.terms)][0:query.num_results]) for query in queries]
+
+
+def term_dictionary_filename(index_filename: str) -> str:
+    return index_filename + '.terms'
+
+
+def write_inverted_index_records(
+        filename: str, number_of_documents: int, records: Iterable[Dict[str, Any]]) -> None:
+    """
+    Writes an inverted index as JSON lines: a metadata line followed by one record per term.
+
+    Next to it, a term dictionary with the byte offset and length of every term record is written
+    into term_dictionary_filename(filename), so LazyPostings can load single terms.
+    :param filename: The index file.
+    :param number_of_documents: Number of indexed documents, stored in the metadata line.
+    :param records: Term records, each with at least 'term', 'documents_count' and 'max_tf'.
+    """
+    with open(filename, 'wb') as fp, open(term_dictionary_filename(filename), 'w') as terms_fp:
+        line = (json.dumps({'number_of_documents': number_of_documents}) + '\n').encode()
+        fp.write(line)
+        offset = len(line)
+        for record in records:
+            line = (json.dumps(record) + '\n').encode()
+            fp.write(line)
+            entry = {
+                'term': record['term'],
+                'offset': offset,
+                'length': len(line),
+                'documents_count': record['documents_count'],
+                'max_tf': record['max_tf'],
+            }
+            terms_fp.write(json.dumps(entry) + '\n')
+            offset += len(line)
+
+
+def read_term_dictionary(filename: str) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Reads the term dictionary of an index written by write_inverted_index_records.
+
+    Indexes written before term dictionaries existed are scanned once instead.
+    :param filename: The index file.
+    :return: The number of indexed documents, and the term dictionary entries.
+    """
+    with open(filename, 'rb') as fp:
+        metadata_line = fp.readline()
+        number_of_documents = json.loads(metadata_line)['number_of_documents']
+        if os.path.exists(term_dictionary_filename(filename)):
+            with open(term_dictionary_filename(filename)) as terms_fp:
+                return number_of_documents, [json.loads(line) for line in terms_fp]
+        entries = []
+        offset = len(metadata_line)
+        for line in fp:
+            record = json.loads(line)
+            entries.append({
+                'term': record['term'],
+                'offset': offset,
+                'length': len(line),
+                'documents_count': record['documents_count'],
+                'max_tf': record.get('max_tf', max(r['tf'] for r in record['index'])),
+            })
+            offset += len(line)
+        return number_of_documents, entries
+
+
+class LazyPostings(Mapping):
+    """
+    Read-only term -> postings mapping that loads the postings of a term from the index file when
+    the term is first looked up.
+
+    Loaded postings are kept in an LRUCache bounded by the number of postings, so memory use
+    depends on the terms queried rather than on the size of the index. Records are sliced out of a
+    memory mapping of the file, which has no file position, so lookups can run in several threads.
+    close() releases the mapping.
+    """
+    def __init__(self, filename: str, term_dictionary: List[Dict[str, Any]],
+                 parse_postings: Callable[[List[Dict[str, Any]]], Any], cache: LRUCache):
+        """
+        :param filename: The index file.
+        :param term_dictionary: Entries returned by read_term_dictionary.
+        :param parse_postings: Converts the 'index' field of a term record into postings.
+        :param cache: Cache for the loaded postings.
+        """
+        self.filename = filename
+        self.term_offsets = {entry['term']: (entry['offset'], entry['length'])
+                             for entry in term_dictionary}
+        self.parse_postings = parse_postings
+        self.cache = cache
+        with open(filename, 'rb') as fp:
+            self.buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        self.buffer.close()
+
+    def __getitem__(self, term: str):
+        postings = self.cache.get(term)
+        if postings is None:
+            offset, length = self.term_offsets[term]
+            record = json.loads(self.buffer[offset:offset + length])
+            postings = self.parse_postings(record['index'])
+            self.cache.put(term, postings)
+        return postings
+
+    def __contains__(self, term) -> bool:
+        return term in self.term_offsets
+
+    def __iter__(self):
+        return iter(self.term_offsets)
+
+    def __len__(self) -> int:
+        return len(self.term_offsets)
+
+
 class ListBasedInvertedIndexWithFrequencies(Index):
-    def __init__(self, filename):
+    def __init__(self, filename, top_k_pruning: bool = False):
+        """
+        :param filename: File the index is read from and written to.
+        :param top_k_pruning: Use top_k_conjunctive in search instead of scoring every match. The
+            results are the same either way.
+        """
         self.filename = filename
+        self.top_k_pruning = top_k_pruning
         self.number_of_documents = 0
         # dict mapping a term to a list of pairs (doc_id, term_frequency)
         self.term_to_doc_id_and_frequencies = defaultdict(list)
         # Count of documents each term occurs in.
         self.doc_counts = Counter()
+        # Maximum term_frequency of each term, the score upper bound used by top-k pruning.
+        self.max_tfs = dict()
+        # Memory-mapped snapshot the frozen structures point into, after read_snapshot().
+        self.snapshot_buffer = None
 
     def add_document(self, doc: TransformedDocument) -> None:
+        self.check_not_frozen()
+        self.version += 1
         self.number_of_documents += 1
         term_counts = Counter(doc.tokens)
         for term, count in term_counts.items():
             self.doc_counts[term] += 1
             tf = term_frequency(count, len(doc.tokens))
             self.term_to_doc_id_and_frequencies[term].append((doc.doc_id, tf))
+            self.max_tfs[term] = max(tf, self.max_tfs.get(term, tf))
+
+    def add_documents(self, batch: DocumentBatch) -> None:
+        self.check_not_frozen()
+        # Reads the columns of the batch directly, without creating a TransformedDocument per
+        # document. Subclasses that override add_document() have to override this too.
+        self.version += 1
+        self.number_of_documents += len(batch)
+        tokens, offsets = batch.tokens, batch.offsets
+        for i, doc_id in enumerate(batch.doc_ids):
+            start, end = offsets[i], offsets[i + 1]
+            for term, count in Counter(tokens[start:end]).items():
+                self.doc_counts[term] += 1
+                tf = term_frequency(count, end - start)
+                self.term_to_doc_id_and_frequencies[term].append((doc_id, tf))
+                self.max_tfs[term] = max(tf, self.max_tfs.get(term, tf))
+
+    def merge(self, other: Index) -> None:
+        self.check_not_frozen()
+        self.version += 1
+        self.number_of_documents += other.number_of_documents
+        for term, doc_id_and_frequencies in other.term_to_doc_id_and_frequencies.items():
+            self.term_to_doc_id_and_frequencies[term].extend(doc_id_and_frequencies)
+            self.doc_counts[term] += other.doc_counts[term]
+            self.max_tfs[term] = max(other.max_tfs[term], self.max_tfs.get(term, other.max_tfs[term]))
 
     def read(self):
+        self.version += 1
         with open(self.filename) as fp:
             record = json.loads(fp.readline())
             self.number_of_documents = record['number_of_documents']
             self.term_to_doc_id_and_frequencies = defaultdict(list)
             self.doc_counts = Counter()
+            self.max_tfs = dict()
             for line in fp:
                 record = json.loads(line)
                 term = record['term']
                 self.doc_counts[term] = record['documents_count']
                 self.term_to_doc_id_and_frequencies[term] = [
                     (sub_record['doc_id'], sub_record['tf']) for sub_record in record['index']]
+                # Indexes written before max_tf was stored get it computed here.
+                self.max_tfs[term] = record.get(
+                    'max_tf', max(tf for _, tf in self.term_to_doc_id_and_frequencies[term]))
 
     def write(self):
-        with open(self.filename, 'w') as fp:
-            metadata = {'number_of_documents': self.number_of_documents}
-            fp.write(json.dumps(metadata) + '\n')
-            for term, doc_count in self.doc_counts.items():
-                record = {
-                    'term': term,
-                    'documents_count': doc_count,
-                    'index': [{'doc_id': doc_id, 'tf': tf}
-                              for doc_id, tf in self.term_to_doc_id_and_frequencies[term]]
-                }
-                fp.write(json.dumps(record) + '\n')
+        records = ({
+            'term': term,
+            'documents_count': doc_count,
+            'max_tf': self.max_tfs[term],
+            'index': [{'doc_id': doc_id, 'tf': tf}
+                      for doc_id, tf in self.term_to_doc_id_and_frequencies[term]]
+        } for term, doc_count in self.doc_counts.items())
+        write_inverted_index_records(self.filename, self.number_of_documents, records)
 
     def search(self, query: Query) -> SearchResults:
+        if self.top_k_pruning:
+            return self.search_top_k(query)
         match_scores = defaultdict(float)
         match_counts = defaultdict(int)
         for term in query.terms:
@@ -183,75 +638,625 @@ class ListBasedInvertedIndexWithFrequencies(Index):
             for doc_id, tf in self.term_to_doc_id_and_frequencies[term]:
                 match_counts[doc_id] += 1
                 match_scores[doc_id] += tf * idf
+        self.observer.count('search.postings_touched',
+                            sum(len(self.term_to_doc_id_and_frequencies[term]) for term in query.terms))
         match_scores = {doc_id: score
                         for doc_id, score in match_scores.items()
                         if match_counts[doc_id] == len(query.terms)}
-        sorted_results = sorted(match_scores.keys(), key=match_scores.get)
+        self.observer.count('search.candidates_scored', len(match_scores))
+        sorted_results = rank_by_score(match_scores)
         return SearchResults(sorted_results[0:query.num_results])
 
+    def search_top_k(self, query: Query) -> SearchResults:
+        """
+        search() implementation based on top_k_conjunctive.
+
+        Lists have no random access, so the postings of the query terms are turned into dicts
+        first. That is a single pass in C per term instead of a Python loop over every posting.
+        """
+        for term in query.terms:
+            if term not in self.term_to_doc_id_and_frequencies:
+                return SearchResults([])
+        postings = {term: dict(self.term_to_doc_id_and_frequencies[term]) for term in query.terms}
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for term in postings}
+        return SearchResults(
+            top_k_conjunctive(query.terms, postings, idfs, self.max_tfs, query.num_results,
+                              self.observer))
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        """
+        Batch search that turns the posting list of every term into a dict once per batch, then
+        scores each query with lookups into those dicts.
+        """
+        terms = {term for query in queries for term in query.terms
+                 if term in self.term_to_doc_id_and_frequencies}
+        postings = {term: dict(self.term_to_doc_id_and_frequencies[term]) for term in terms}
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for term in terms}
+        return search_many_with_postings(queries, postings, idfs, self.max_tfs, self.top_k_pruning)
+
+    @property
+    def frozen(self) -> bool:
+        return isinstance(self.term_to_doc_id_and_frequencies, FrozenPostings)
+
+    def freeze(self) -> None:
+        """
+        Replaces the posting lists with a FrozenPostings, which returns PackedPostings in place of
+        the lists of (doc_id, tf) pairs.
+        """
+        if not self.frozen:
+            freeze_inverted_index(self, as_mapping=False)
+
+    def write_snapshot(self) -> None:
+        """
+        Writes the index, in its frozen form, into snapshot_filename(filename). The index itself
+        is not frozen.
+        """
+        write_index_snapshot(self)
+
+    def read_snapshot(self) -> None:
+        read_index_snapshot(self, as_mapping=False)
+
+    def memory_report(self) -> Dict[str, Any]:
+        return add_postings_statistics(super().memory_report(), self.term_to_doc_id_and_frequencies)
+
+
+class PackedListBasedInvertedIndexWithFrequencies(ListBasedInvertedIndexWithFrequencies):
+    """
+    ListBasedInvertedIndexWithFrequencies stored in a binary format.
+
+    doc_ids are interned to dense integer ids. The postings of all terms are written into
+    filename + '.postings' as two packed arrays, int32 doc ids followed by float32 tfs, and filename
+    holds a JSON header with the doc_id table and a term table pointing into those arrays.
+    read() memory-maps the postings file instead of parsing it, so the index is read-only after
+    read(): adding or merging documents raises ValueError. close() unmaps the file and empties the
+    index.
+    """
+    def __init__(self, filename, top_k_pruning: bool = False):
+        super().__init__(filename, top_k_pruning)
+        self.postings_filename = filename + '.postings'
+        self.postings_buffer = None
+        # Whether the postings are the PackedPostings of read(), which cannot be appended to.
+        self.read_only = False
+
+    def check_not_frozen(self) -> None:
+        super().check_not_frozen()
+        if self.read_only:
+            raise ValueError(f'{type(self).__name__} is read-only after read()')
+
+    def close(self) -> None:
+        """
+        Closes the postings file mapped by read(), if any. The postings are dropped with the
+        mapping, so the index is empty afterwards.
+        """
+        if not self.read_only:
+            return
+        self.version += 1
+        self.number_of_documents = 0
+        self.term_to_doc_id_and_frequencies = defaultdict(list)
+        self.doc_counts = Counter()
+        self.max_tfs = dict()
+        self.read_only = False
+        if self.postings_buffer is not None:
+            self.postings_buffer.close()
+            self.postings_buffer = None
+
+    def write(self):
+        doc_id_to_ordinal = dict()
+        doc_ordinals = array('i')
+        tfs = array('f')
+        terms = []
+        for term, doc_count in self.doc_counts.items():
+            start = len(doc_ordinals)
+            for doc_id, tf in self.term_to_doc_id_and_frequencies[term]:
+                doc_ordinals.append(doc_id_to_ordinal.setdefault(doc_id, len(doc_id_to_ordinal)))
+                tfs.append(tf)
+            # The bound has to be taken after rounding the tfs to float32.
+            terms.append([term, doc_count, start, len(doc_ordinals), max(tfs[start:])])
+        with open(self.filename, 'w') as fp:
+            header = {
+                'number_of_documents': self.number_of_documents,
+                'number_of_postings': len(doc_ordinals),
+                'doc_ids': list(doc_id_to_ordinal),
+                'terms': terms,
+            }
+            json.dump(header, fp)
+        with open(self.postings_filename, 'wb') as fp:
+            doc_ordinals.tofile(fp)
+            tfs.tofile(fp)
+
+    def read(self):
+        self.close()
+        self.version += 1
+        with open(self.filename) as fp:
+            header = json.load(fp)
+        self.number_of_documents = header['number_of_documents']
+        number_of_postings = header['number_of_postings']
+        if number_of_postings:
+            with open(self.postings_filename, 'rb') as fp:
+                self.postings_buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = memoryview(self.postings_buffer)
+            doc_ordinals = buffer[:4 * number_of_postings].cast('i')
+            tfs = buffer[4 * number_of_postings:8 * number_of_postings].cast('f')
+        else:
+            doc_ordinals, tfs = array('i'), array('f')
+        doc_ids = header['doc_ids']
+        self.term_to_doc_id_and_frequencies = dict()
+        self.doc_counts = Counter()
+        self.max_tfs = dict()
+        for term, doc_count, start, end, max_tf in header['terms']:
+            self.doc_counts[term] = doc_count
+            self.max_tfs[term] = max_tf
+            self.term_to_doc_id_and_frequencies[term] = PackedPostings(
+                doc_ids, doc_ordinals, tfs, start, end)
+        self.read_only = True
+
+
+def convert_to_packed_index(
+        jsonl_filename: str, packed_filename: str) -> PackedListBasedInvertedIndexWithFrequencies:
+    """
+    Converts an index written by ListBasedInvertedIndexWithFrequencies into the binary format.
+    :param jsonl_filename: The existing JSONL index file.
+    :param packed_filename: Where to write the binary index.
+    :return: The packed index, ready to be searched.
+    """
+    index = ListBasedInvertedIndexWithFrequencies(jsonl_filename)
+    index.read()
+    packed_index = PackedListBasedInvertedIndexWithFrequencies(packed_filename)
+    packed_index.number_of_documents = index.number_of_documents
+    packed_index.term_to_doc_id_and_frequencies = index.term_to_doc_id_and_frequencies
+    packed_index.doc_counts = index.doc_counts
+    packed_index.max_tfs = index.max_tfs
+    packed_index.write()
+    return packed_index
+
+
+class LazyListBasedInvertedIndexWithFrequencies(ListBasedInvertedIndexWithFrequencies):
+    """
+    ListBasedInvertedIndexWithFrequencies that only reads the term dictionary in read(). Postings
+    are loaded on demand through LazyPostings, so the index is read-only after read().
+    """
+    def __init__(self, filename, cache_size: int = 1000000, top_k_pruning: bool = False):
+        """
+        :param filename: File the index is read from and written to.
+        :param cache_size: Maximum number of postings kept in memory.
+        :param top_k_pruning: Same as in ListBasedInvertedIndexWithFrequencies.
+        """
+        super().__init__(filename, top_k_pruning)
+        self.postings_cache = LRUCache(cache_size, size_of=len)
+
+    def close(self) -> None:
+        """
+        Closes the index file opened by read(), if any.
+        """
+        if isinstance(self.term_to_doc_id_and_frequencies, LazyPostings):
+            self.term_to_doc_id_and_frequencies.close()
+
+    def read(self):
+        self.close()
+        self.version += 1
+        self.number_of_documents, term_dictionary = read_term_dictionary(self.filename)
+        self.doc_counts = Counter({entry['term']: entry['documents_count'] for entry in term_dictionary})
+        self.max_tfs = {entry['term']: entry['max_tf'] for entry in term_dictionary}
+        self.postings_cache.clear()
+        self.term_to_doc_id_and_frequencies = LazyPostings(
+            self.filename, term_dictionary,
+            lambda index: [(sub_record['doc_id'], sub_record['tf']) for sub_record in index],
+            self.postings_cache)
+
 
 class DictBasedInvertedIndexWithFrequencies(Index):
-    def __init__(self, filename):
+    def __init__(self, filename, top_k_pruning: bool = False):
+        """
+        :param filename: File the index is read from and written to.
+        :param top_k_pruning: Use top_k_conjunctive in search instead of scoring every match. The
+            results are the same either way.
+        """
         self.filename = filename
+        self.top_k_pruning = top_k_pruning
         self.number_of_documents = 0
         # dict mapping a term to a dict with doc_id as a key, and term_frequency as a value)
         self.term_to_doc_id_and_frequencies = defaultdict(dict)
         # Count of documents each term occurs in.
         self.doc_counts = Counter()
+        # Maximum term_frequency of each term, the score upper bound used by top-k pruning.
+        self.max_tfs = dict()
+        # Memory-mapped snapshot the frozen structures point into, after read_snapshot().
+        self.snapshot_buffer = None
 
     def add_document(self, doc: TransformedDocument) -> None:
+        self.check_not_frozen()
+        self.version += 1
         self.number_of_documents += 1
         term_counts = Counter(doc.tokens)
         for term, count in term_counts.items():
             self.doc_counts[term] += 1
             tf = term_frequency(count, len(doc.tokens))
             self.term_to_doc_id_and_frequencies[term][doc.doc_id] = tf
+            self.max_tfs[term] = max(tf, self.max_tfs.get(term, tf))
+
+    def add_documents(self, batch: DocumentBatch) -> None:
+        self.check_not_frozen()
+        # Reads the columns of the batch directly, without creating a TransformedDocument per
+        # document. Subclasses that override add_document() have to override this too.
+        self.version += 1
+        self.number_of_documents += len(batch)
+        tokens, offsets = batch.tokens, batch.offsets
+        for i, doc_id in enumerate(batch.doc_ids):
+            start, end = offsets[i], offsets[i + 1]
+            for term, count in Counter(tokens[start:end]).items():
+                self.doc_counts[term] += 1
+                tf = term_frequency(count, end - start)
+                self.term_to_doc_id_and_frequencies[term][doc_id] = tf
+                self.max_tfs[term] = max(tf, self.max_tfs.get(term, tf))
+
+    def merge(self, other: Index) -> None:
+        self.check_not_frozen()
+        self.version += 1
+        self.number_of_documents += other.number_of_documents
+        for term, doc_id_to_frequency in other.term_to_doc_id_and_frequencies.items():
+            self.term_to_doc_id_and_frequencies[term].update(doc_id_to_frequency)
+            self.doc_counts[term] += other.doc_counts[term]
+            self.max_tfs[term] = max(other.max_tfs[term], self.max_tfs.get(term, other.max_tfs[term]))
 
     def write(self):
-        with open(self.filename, 'w') as fp:
-            metadata = {'number_of_documents': self.number_of_documents}
-            fp.write(json.dumps(metadata) + '\n')
-            for term, doc_count in self.doc_counts.items():
-                record = {
-                    'term': term,
-                    'documents_count': doc_count,
-                    'index': [{'doc_id': doc_id, 'tf': tf}
-                              for doc_id, tf in self.term_to_doc_id_and_frequencies[term].items()]
-                }
-                fp.write(json.dumps(record) + '\n')
+        records = ({
+            'term': term,
+            'documents_count': doc_count,
+            'max_tf': self.max_tfs[term],
+            'index': [{'doc_id': doc_id, 'tf': tf}
+                      for doc_id, tf in self.term_to_doc_id_and_frequencies[term].items()]
+        } for term, doc_count in self.doc_counts.items())
+        write_inverted_index_records(self.filename, self.number_of_documents, records)
 
     def read(self):
+        self.version += 1
         with open(self.filename) as fp:
             record = json.loads(fp.readline())
             self.number_of_documents = record['number_of_documents']
             self.term_to_doc_id_and_frequencies = defaultdict(dict)
             self.doc_counts = Counter()
+            self.max_tfs = dict()
             for line in fp:
                 record = json.loads(line)
                 term = record['term']
                 self.doc_counts[term] = record['documents_count']
                 self.term_to_doc_id_and_frequencies[term] = {
                     sub_record['doc_id']: sub_record['tf'] for sub_record in record['index']}
+                # Indexes written before max_tf was stored get it computed here.
+                self.max_tfs[term] = record.get(
+                    'max_tf', max(self.term_to_doc_id_and_frequencies[term].values()))
 
     def search(self, query: Query) -> SearchResults:
+        if self.top_k_pruning:
+            return self.search_top_k(query)
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for term in query.terms if term in self.term_to_doc_id_and_frequencies}
+        match_scores = self.score_matches(query.terms, idfs)
+        sorted_results = rank_by_score(match_scores)
+        return SearchResults(sorted_results[0:query.num_results])
+
+    def score_matches(self, terms: List[str], idfs: Dict[str, float]) -> Dict[str, float]:
+        """
+        Scores the documents that contain all the given terms.
+
+        The idfs are supplied by the caller, so that indexes made of several
+        DictBasedInvertedIndexWithFrequencies can score with collection-wide statistics.
+        :param terms: Query terms.
+        :param idfs: Maps each query term to its inverse document frequency.
+        :return: dict mapping the doc_id of every matching document to its score.
+        """
         result_doc_ids = None
-        for term in query.terms:
+        for term in terms:
             if term not in self.term_to_doc_id_and_frequencies or result_doc_ids == set():
-                return SearchResults([])
+                return dict()
             if result_doc_ids is None:
                 result_doc_ids = self.term_to_doc_id_and_frequencies[term].keys()
             else:
                 result_doc_ids &= self.term_to_doc_id_and_frequencies[term].keys()
 
+        self.observer.count('search.postings_touched',
+                            sum(len(self.term_to_doc_id_and_frequencies[term]) for term in terms))
+        self.observer.count('search.candidates_scored', len(result_doc_ids or ()))
         match_scores = defaultdict(float)
-        for term in query.terms:
+        for term in terms:
             tfs = self.term_to_doc_id_and_frequencies[term]
-            idf = inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+            idf = idfs[term]
             for docid in result_doc_ids:
                 tf = tfs[docid]
                 match_scores[docid] += tf * idf
+        return match_scores
+
+    def search_top_k(self, query: Query) -> SearchResults:
+        """
+        search() implementation based on top_k_conjunctive.
+        """
+        for term in query.terms:
+            if term not in self.term_to_doc_id_and_frequencies:
+                return SearchResults([])
+        postings = {term: self.term_to_doc_id_and_frequencies[term] for term in query.terms}
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for term in postings}
+        return SearchResults(
+            top_k_conjunctive(query.terms, postings, idfs, self.max_tfs, query.num_results,
+                              self.observer))
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        """
+        Batch search that looks up the postings and idf of every term once per batch.
+        """
+        terms = {term for query in queries for term in query.terms
+                 if term in self.term_to_doc_id_and_frequencies}
+        postings = {term: self.term_to_doc_id_and_frequencies[term] for term in terms}
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for term in terms}
+        return search_many_with_postings(queries, postings, idfs, self.max_tfs, self.top_k_pruning)
+
+    @property
+    def frozen(self) -> bool:
+        return isinstance(self.term_to_doc_id_and_frequencies, FrozenPostings)
+
+    def freeze(self) -> None:
+        """
+        Replaces the postings dicts with a FrozenPostings, which returns PackedPostingsMaps in place
+        of the doc_id -> tf dicts.
+        """
+        if not self.frozen:
+            freeze_inverted_index(self, as_mapping=True)
+
+    def write_snapshot(self) -> None:
+        """
+        Writes the index, in its frozen form, into snapshot_filename(filename). The index itself
+        is not frozen.
+        """
+        write_index_snapshot(self)
+
+    def read_snapshot(self) -> None:
+        read_index_snapshot(self, as_mapping=True)
+
+    def memory_report(self) -> Dict[str, Any]:
+        return add_postings_statistics(super().memory_report(), self.term_to_doc_id_and_frequencies)
+
+
+class TermIdInvertedIndexWithFrequencies(DictBasedInvertedIndexWithFrequencies):
+    """
+    DictBasedInvertedIndexWithFrequencies keyed by integer term ids from a Vocabulary instead of
+    term strings.
+
+    Documents are added with their term_ids when they are set, which then have to come from the
+    vocabulary of this index (see TermIdDocumentTransformer), otherwise their tokens are added to
+    the vocabulary. Queries are searched by their term_ids when set, otherwise their terms are
+    looked up in the vocabulary. merge() remaps the term ids of the other index, so partial indexes
+    built in parallel can each have their own vocabulary.
+
+    The index file has the DictBasedInvertedIndexWithFrequencies format, and the vocabulary is
+    written next to it into filename + '.vocabulary', which keeps the term ids stable.
+    """
+    def __init__(self, filename, vocabulary: Optional[Vocabulary] = None, top_k_pruning: bool = False):
+        """
+        :param filename: File the index is read from and written to.
+        :param vocabulary: Vocabulary shared with the document transformer and the query parser, a
+            new one by default.
+        :param top_k_pruning: Same as in DictBasedInvertedIndexWithFrequencies.
+        """
+        super().__init__(filename, top_k_pruning)
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+
+    def vocabulary_filename(self) -> str:
+        return self.filename + '.vocabulary'
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        self.check_not_frozen()
+        term_ids = doc.term_ids if doc.term_ids is not None else self.vocabulary.encode(doc.tokens)
+        super().add_document(TransformedDocument(doc_id=doc.doc_id, tokens=term_ids))
+
+    def add_documents(self, batch: DocumentBatch) -> None:
+        self.check_not_frozen()
+        if batch.term_ids is None:
+            batch = DocumentBatch(doc_ids=batch.doc_ids, tokens=[], offsets=batch.offsets,
+                                  term_ids=self.vocabulary.encode(batch.tokens))
+        super().add_documents(DocumentBatch(doc_ids=batch.doc_ids, tokens=batch.term_ids,
+                                            offsets=batch.offsets))
+
+    def merge(self, other: Index) -> None:
+        self.check_not_frozen()
+        self.version += 1
+        self.number_of_documents += other.number_of_documents
+        term_id_map = [self.vocabulary.add(term) for term in other.vocabulary.terms]
+        for other_term_id, doc_id_to_frequency in other.term_to_doc_id_and_frequencies.items():
+            term_id = term_id_map[other_term_id]
+            other_max_tf = other.max_tfs[other_term_id]
+            self.term_to_doc_id_and_frequencies[term_id].update(doc_id_to_frequency)
+            self.doc_counts[term_id] += other.doc_counts[other_term_id]
+            self.max_tfs[term_id] = max(other_max_tf, self.max_tfs.get(term_id, other_max_tf))
+
+    def write(self):
+        records = ({
+            'term': self.vocabulary.term(term_id),
+            'documents_count': doc_count,
+            'max_tf': self.max_tfs[term_id],
+            'index': [{'doc_id': doc_id, 'tf': tf}
+                      for doc_id, tf in self.term_to_doc_id_and_frequencies[term_id].items()]
+        } for term_id, doc_count in self.doc_counts.items())
+        write_inverted_index_records(self.filename, self.number_of_documents, records)
+        self.vocabulary.write(self.vocabulary_filename())
+
+    def read(self):
+        self.version += 1
+        self.vocabulary = Vocabulary.read(self.vocabulary_filename())
+        with open(self.filename) as fp:
+            record = json.loads(fp.readline())
+            self.number_of_documents = record['number_of_documents']
+            self.term_to_doc_id_and_frequencies = defaultdict(dict)
+            self.doc_counts = Counter()
+            self.max_tfs = dict()
+            for line in fp:
+                record = json.loads(line)
+                term_id = self.vocabulary.add(record['term'])
+                self.doc_counts[term_id] = record['documents_count']
+                self.term_to_doc_id_and_frequencies[term_id] = {
+                    sub_record['doc_id']: sub_record['tf'] for sub_record in record['index']}
+                self.max_tfs[term_id] = record['max_tf']
+
+    def write_snapshot(self) -> None:
+        super().write_snapshot()
+        self.vocabulary.write(self.vocabulary_filename())
+
+    def read_snapshot(self) -> None:
+        self.vocabulary = Vocabulary.read(self.vocabulary_filename())
+        super().read_snapshot()
+
+    def to_term_id_query(self, query: Query) -> Query:
+        term_ids = query.term_ids if query.term_ids is not None else self.vocabulary.lookup(query.terms)
+        return Query(terms=term_ids, num_results=query.num_results)
+
+    def search(self, query: Query) -> SearchResults:
+        return super().search(self.to_term_id_query(query))
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        return super().search_many([self.to_term_id_query(query) for query in queries])
+
+
+class LazyDictBasedInvertedIndexWithFrequencies(DictBasedInvertedIndexWithFrequencies):
+    """
+    DictBasedInvertedIndexWithFrequencies that only reads the term dictionary in read(). Postings
+    are loaded on demand through LazyPostings, so the index is read-only after read().
+    """
+    def __init__(self, filename, cache_size: int = 1000000, top_k_pruning: bool = False):
+        """
+        :param filename: File the index is read from and written to.
+        :param cache_size: Maximum number of postings kept in memory.
+        :param top_k_pruning: Same as in DictBasedInvertedIndexWithFrequencies.
+        """
+        super().__init__(filename, top_k_pruning)
+        self.postings_cache = LRUCache(cache_size, size_of=len)
 
-        sorted_results = sorted(match_scores.keys(), key=match_scores.get, reverse=True)
+    def close(self) -> None:
+        """
+        Closes the index file opened by read(), if any.
+        """
+        if isinstance(self.term_to_doc_id_and_frequencies, LazyPostings):
+            self.term_to_doc_id_and_frequencies.close()
+
+    def read(self):
+        self.close()
+        self.version += 1
+        self.number_of_documents, term_dictionary = read_term_dictionary(self.filename)
+        self.doc_counts = Counter({entry['term']: entry['documents_count'] for entry in term_dictionary})
+        self.max_tfs = {entry['term']: entry['max_tf'] for entry in term_dictionary}
+        self.postings_cache.clear()
+        self.term_to_doc_id_and_frequencies = LazyPostings(
+            self.filename, term_dictionary,
+            lambda index: {sub_record['doc_id']: sub_record['tf'] for sub_record in index},
+            self.postings_cache)
+
+
+class CompressedInvertedIndexWithFrequencies(Index):
+    """
+    Inverted index that keeps its postings in CompressedPostingLists.
+
+    doc_ids are interned to dense integer ids in the order the documents are added, so every
+    posting list stays sorted and can be gap encoded. Conjunctive search walks the posting lists
+    with PostingCursors, using skip pointers to jump ahead to the next candidate document.
+    """
+    def __init__(self, filename, skip_interval: int = 64):
+        self.filename = filename
+        self.skip_interval = skip_interval
+        self.number_of_documents = 0
+        # Dense integer ids of the documents are the positions in this list.
+        self.doc_ids = []
+        # dict mapping a term to a CompressedPostingList.
+        self.term_to_postings = dict()
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        self.version += 1
+        self.number_of_documents += 1
+        doc_ordinal = len(self.doc_ids)
+        self.doc_ids.append(doc.doc_id)
+        term_counts = Counter(doc.tokens)
+        for term, count in term_counts.items():
+            if term not in self.term_to_postings:
+                self.term_to_postings[term] = CompressedPostingList(self.skip_interval)
+            self.term_to_postings[term].append(doc_ordinal, term_frequency(count, len(doc.tokens)))
+
+    def merge(self, other: Index) -> None:
+        # The other index's doc ordinals all come after ours, so the posting lists stay sorted.
+        ordinal_offset = len(self.doc_ids)
+        self.version += 1
+        self.number_of_documents += other.number_of_documents
+        self.doc_ids.extend(other.doc_ids)
+        for term, other_postings in other.term_to_postings.items():
+            if term not in self.term_to_postings:
+                self.term_to_postings[term] = CompressedPostingList(self.skip_interval)
+            postings = self.term_to_postings[term]
+            for doc_ordinal, tf in other_postings:
+                postings.append(doc_ordinal + ordinal_offset, tf)
+
+    def write(self):
+        with open(self.filename, 'w') as fp:
+            metadata = {'number_of_documents': self.number_of_documents, 'skip_interval': self.skip_interval,
+                        'doc_ids': self.doc_ids}
+            fp.write(json.dumps(metadata) + '\n')
+            for term, postings in self.term_to_postings.items():
+                record = {
+                    'term': term,
+                    'documents_count': len(postings),
+                    'last_doc_id': postings.last_doc_id,
+                    'doc_ids': base64.b64encode(postings.data).decode('ascii'),
+                    'tfs': base64.b64encode(postings.tfs.tobytes()).decode('ascii'),
+                    'skip_doc_ids': postings.skip_doc_ids.tolist(),
+                    'skip_offsets': postings.skip_offsets.tolist(),
+                }
+                fp.write(json.dumps(record) + '\n')
+
+    def read(self):
+        self.version += 1
+        with open(self.filename) as fp:
+            record = json.loads(fp.readline())
+            self.number_of_documents = record['number_of_documents']
+            # The skip pointers were built with the interval of the writer.
+            self.skip_interval = record['skip_interval']
+            self.doc_ids = record['doc_ids']
+            self.term_to_postings = dict()
+            for line in fp:
+                record = json.loads(line)
+                postings = CompressedPostingList(self.skip_interval)
+                postings.data = bytearray(base64.b64decode(record['doc_ids']))
+                postings.tfs.frombytes(base64.b64decode(record['tfs']))
+                postings.skip_doc_ids.extend(record['skip_doc_ids'])
+                postings.skip_offsets.extend(record['skip_offsets'])
+                postings.last_doc_id = record['last_doc_id']
+                self.term_to_postings[record['term']] = postings
+
+    def search(self, query: Query) -> SearchResults:
+        if not query.terms:
+            return SearchResults([])
+        for term in query.terms:
+            if term not in self.term_to_postings:
+                return SearchResults([])
+        # The shortest posting list drives the intersection, the others are advanced to its doc ids.
+        cursors = {term: PostingCursor(self.term_to_postings[term])
+                   for term in sorted(set(query.terms), key=lambda t: len(self.term_to_postings[t]))}
+        idfs = {term: inverse_document_frequency(len(self.term_to_postings[term]),
+                                                 self.number_of_documents)
+                for term in cursors}
+        driver, *others = cursors.values()
+        match_scores = dict()
+        while driver.doc_id is not None:
+            candidate = driver.doc_id
+            for cursor in others:
+                if cursor.advance(candidate) != candidate:
+                    break
+            else:
+                match_scores[self.doc_ids[candidate]] = sum(
+                    cursors[term].tf * idfs[term] for term in query.terms)
+                driver.next()
+                continue
+            if cursor.doc_id is None:
+                break
+            driver.advance(cursor.doc_id)
+        sorted_results = rank_by_score(match_scores)
         return SearchResults(sorted_results[0:query.num_results])
 
 
@@ -261,3 +1266,20 @@ class SingleIndexIndexer(Indexer):
 
     def create_index(self) -> Index:
         return self.index
+
+
+class EmptyIndexIndexer(Indexer):
+    """
+    Indexer that creates a new, empty index on every call, e.g. for the partial indexes of
+    ParallelIndexingProcess, unlike SingleIndexIndexer which always returns the same index.
+    """
+    def __init__(self, index_class: Callable[..., Index], *args, **kwargs):
+        """
+        :param index_class: Index class, or other callable returning an index, called with args and kwargs.
+        """
+        self.index_class = index_class
+        self.args = args
+        self.kwargs = kwargs
+
+    def create_index(self) -> Index:
+        return self.index_class(*self.args, **self.kwargs)
@@ -1,7 +1,19 @@
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
+from typing import Iterable, Iterator, List, Optional
+
 import document_source
+from bm25_index import BM25InvertedIndex
 from document_source import DocumentSource, WikiJsonDocumentSource
+from documents import InputDocument
 from document_transformer import DocumentTransformer, NaiveSearchDocumentTransformer
+from instrumentation import NULL_OBSERVER, PipelineObserver
 from index import Index, Indexer, NaiveIndexer, SingleIndexIndexer, ListBasedInvertedIndexWithFrequencies, TextProcessIndexer
+from positional_index import PositionalInvertedIndexWithFrequencies
+from spimi_index import SpimiIndexer
 from tokenizer import NaiveTokenizer, GroupOneTokenizer
 
 
@@ -12,9 +24,17 @@ class DefaultIndexingProcess:
     This class runs components of the indexing process supplied to it either in the constructor
     or in the arguments to the |run| function below.
     """
-    def __init__(self, document_transformer: DocumentTransformer, indexer: Indexer):
+    def __init__(self, document_transformer: DocumentTransformer, indexer: Indexer,
+                 observer: PipelineObserver = NULL_OBSERVER):
+        """
+        :param document_transformer: Transforms every document before it is indexed.
+        :param indexer: Creates the index.
+        :param observer: Receives the timings of the 'acquisition', 'transformation' and
+            'indexing' stages.
+        """
         self.document_transformer = document_transformer
         self.indexer = indexer
+        self.observer = observer
 
     def run(self, source: DocumentSource) -> Index:
         """
@@ -22,17 +42,89 @@ class DefaultIndexingProcess:
         :param source: Source of documents to index.
         :return: An index used to search documents from the given source.
         """
-        # Run the aquisition stage, or just load the results of that stage. Enable iteration over
-        # all documents from the given source.
-        document_collection = source.read()
+        # Run the aquisition stage, or just load the results of that stage. Documents are streamed,
+        # so only the document being indexed is kept in memory.
+        documents = self.observer.iterate('acquisition', source.stream())
         # Create an empty index. Documents will be added one at a time.
         index = self.indexer.create_index()
-        for doc in document_collection:
+        for doc in documents:
             # Transform and index the document.
-            transformed_doc = self.document_transformer.transform_document(doc)
-            index.add_document(transformed_doc)
+            with self.observer.stage('transformation'):
+                transformed_doc = self.document_transformer.transform_document(doc)
+            with self.observer.stage('indexing'):
+                index.add_document(transformed_doc)
+        return index
+
+
+def index_documents(
+        document_transformer: DocumentTransformer, indexer: Indexer, docs: List[InputDocument]) -> Index:
+    """
+    Builds an index of the given documents. Runs in the worker processes of ParallelIndexingProcess.
+    """
+    index = indexer.create_index()
+    index.add_documents(document_transformer.transform_batch(docs))
+    return index
+
+
+def split_into_shards(docs: Iterable[InputDocument], shard_size: int) -> Iterator[List[InputDocument]]:
+    docs = iter(docs)
+    while True:
+        shard = list(itertools.islice(docs, shard_size))
+        if not shard:
+            return
+        yield shard
+
+
+class ParallelIndexingProcess(DefaultIndexingProcess):
+    """
+    Indexing process that transforms and indexes documents in a pool of worker processes.
+
+    The documents are split into shards of consecutive documents. Every worker builds a partial
+    index of a shard using partial_indexer, and the partial indexes are merged in shard order into
+    the index created by indexer, so the result is the same as with DefaultIndexingProcess.
+    The document transformer and partial_indexer are pickled into the workers, so partial_indexer
+    has to create a new, empty index on every call, such as EmptyIndexIndexer, and not return the
+    final index like SingleIndexIndexer does. The indexes have to support Index.merge().
+    """
+    def __init__(self, document_transformer: DocumentTransformer, indexer: Indexer, partial_indexer: Indexer,
+                 num_workers: Optional[int] = None, shard_size: int = 1000,
+                 observer: PipelineObserver = NULL_OBSERVER):
+        """
+        :param document_transformer: Transformer run in the workers.
+        :param indexer: Creates the final index.
+        :param partial_indexer: Creates an empty partial index for every shard in the workers.
+        :param num_workers: Number of worker processes, the number of CPUs by default.
+        :param shard_size: Number of documents sent to a worker at a time.
+        :param observer: Receives the timings of the 'acquisition' stage, and of the 'merge' stage
+            including the time spent waiting for workers.
+        """
+        super().__init__(document_transformer, indexer, observer)
+        self.partial_indexer = partial_indexer
+        self.num_workers = num_workers
+        self.shard_size = shard_size
+
+    def run(self, source: DocumentSource) -> Index:
+        index = self.indexer.create_index()
+        index_shard = functools.partial(index_documents, self.document_transformer, self.partial_indexer)
+        # Shards are read from the source only as workers free up, so at most max_pending shards
+        # are held in memory.
+        max_pending = 2 * (self.num_workers or os.cpu_count() or 1)
+        pending = collections.deque()
+        with multiprocessing.Pool(self.num_workers) as pool:
+            for shard in split_into_shards(self.observer.iterate('acquisition', source.stream()),
+                                           self.shard_size):
+                pending.append(pool.apply_async(index_shard, (shard,)))
+                if len(pending) >= max_pending:
+                    self.merge_next(index, pending)
+            while pending:
+                self.merge_next(index, pending)
         return index
 
+    def merge_next(self, index: Index, pending: collections.deque) -> None:
+        with self.observer.stage('merge'):
+            partial_index = pending.popleft().get()
+            index.merge(partial_index)
+
 
 def create_naive_indexing_process(index_filename: str) -> DefaultIndexingProcess:
     return DefaultIndexingProcess(
@@ -58,6 +150,24 @@ def run_covid_trec_indexing_process(input_filename: str, output_filename: str):
     index.write()
 
 
+def create_positional_indexing_process(index_filename: str) -> DefaultIndexingProcess:
+    return DefaultIndexingProcess(
+        document_transformer=NaiveSearchDocumentTransformer(tokenizer=NaiveTokenizer()),
+        indexer=SingleIndexIndexer(PositionalInvertedIndexWithFrequencies(index_filename)))
+
+
+def create_bm25_indexing_process(index_filename: str) -> DefaultIndexingProcess:
+    return DefaultIndexingProcess(
+        document_transformer=NaiveSearchDocumentTransformer(tokenizer=NaiveTokenizer()),
+        indexer=SingleIndexIndexer(BM25InvertedIndex(index_filename)))
+
+
+def create_spimi_indexing_process(index_filename: str, memory_budget: int) -> DefaultIndexingProcess:
+    return DefaultIndexingProcess(
+        document_transformer=NaiveSearchDocumentTransformer(tokenizer=NaiveTokenizer()),
+        indexer=SpimiIndexer(index_filename, memory_budget))
+
+
 def create_text_process_indexing_process(index_filename: str) -> DefaultIndexingProcess:
     return DefaultIndexingProcess(
         document_transformer=NaiveSearchDocumentTransformer(tokenizer=GroupOneTokenizer()),
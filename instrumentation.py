@@ -0,0 +1,172 @@
+import abc
+import contextlib
+import dataclasses
+import json
+import sys
+import time
+import types
+from abc import ABC
+from collections import Counter
+from typing import Any, ContextManager, Dict, Iterable, Iterator, Optional, Set
+
+
+class PipelineObserver(ABC):
+    """
+    Receives the timings of the stages of the indexing and query pipelines, and counters such as
+    the number of postings touched by search.
+    """
+    @abc.abstractmethod
+    def stage(self, name: str, items: int = 1) -> ContextManager:
+        """
+        :param name: Name of the stage, e.g. 'transformation'.
+        :param items: Number of items, e.g. documents, processed by this run of the stage.
+        :return: Context manager timing the stage.
+        """
+        pass
+
+    @abc.abstractmethod
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Iterates over iterable, timing every item it produces as a run of the stage name. Used for
+        stages that produce their output lazily, like document acquisition.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name, items=0):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+
+_END = object()
+
+
+class NullObserver(PipelineObserver):
+    """
+    Default observer that records nothing, at the cost of an empty with statement per stage.
+    """
+    _null_context = contextlib.nullcontext()
+
+    def stage(self, name: str, items: int = 1) -> ContextManager:
+        return self._null_context
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        return iter(iterable)
+
+
+NULL_OBSERVER = NullObserver()
+
+
+@dataclasses.dataclass(slots=True)
+class StageMetrics:
+    calls: int = 0
+    items: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'items', 'wall_start', 'cpu_start')
+
+    def __init__(self, metrics: StageMetrics, items: int):
+        self.metrics = metrics
+        self.items = items
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def __exit__(self, *exc_info):
+        self.metrics.cpu_seconds += time.process_time() - self.cpu_start
+        self.metrics.wall_seconds += time.perf_counter() - self.wall_start
+        self.metrics.calls += 1
+        self.metrics.items += self.items
+        return False
+
+
+class MetricsObserver(PipelineObserver):
+    """
+    Observer that accumulates the number of calls and items, wall time and CPU time of every stage,
+    and the total of every counter.
+    """
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = dict()
+        self.counters = Counter()
+
+    def stage(self, name: str, items: int = 1) -> ContextManager:
+        metrics = self.stages.get(name)
+        if metrics is None:
+            metrics = self.stages[name] = StageMetrics()
+        return _StageTimer(metrics, items)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        for item in super().iterate(name, iterable):
+            self.stages[name].items += 1
+            yield item
+
+    def dump(self) -> Dict[str, Any]:
+        """
+        :return: JSON serializable snapshot of all metrics.
+        """
+        return {'stages': {name: dataclasses.asdict(metrics) for name, metrics in self.stages.items()},
+                'counters': dict(self.counters)}
+
+    def write(self, filename: str) -> None:
+        with open(filename, 'w') as fp:
+            json.dump(self.dump(), fp, indent=2)
+
+    def reset(self) -> None:
+        self.stages.clear()
+        self.counters.clear()
+
+
+# Objects that do not reference other objects, or whose references are not owned by the index.
+_LEAF_TYPES = (str, bytes, bytearray, int, float, bool, type(None), memoryview, type, types.ModuleType,
+               types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_size_of(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """
+    Estimates the memory held by obj and every object it references, counting each object once.
+    Buffers behind memoryviews, such as memory-mapped files, are not counted.
+    :param obj: The object to measure.
+    :param seen: Ids of the objects already counted, shared between calls so that objects shared
+        by several structures are only counted in the first one.
+    :return: Size in bytes.
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, _LEAF_TYPES):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            if hasattr(current, '__dict__'):
+                stack.append(vars(current))
+            for cls in type(current).__mro__:
+                slots = getattr(cls, '__slots__', ())
+                for slot in [slots] if isinstance(slots, str) else slots:
+                    if hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+    return size
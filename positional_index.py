@@ -0,0 +1,195 @@
+import base64
+import json
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import accumulate
+from typing import List
+
+from documents import DocumentBatch, TransformedDocument
+from index import Index, DictBasedInvertedIndexWithFrequencies, inverse_document_frequency, \
+    rank_by_score, read_index_snapshot, write_index_snapshot, write_inverted_index_records
+from postings import decode_varint, encode_varint
+from search_api import PositionalClause, Query, SearchResults
+
+
+def encode_positions(positions: List[int]) -> bytes:
+    """
+    Encodes increasing token positions as variable-byte encoded gaps.
+    """
+    out = bytearray()
+    previous = 0
+    for position in positions:
+        encode_varint(position - previous, out)
+        previous = position
+    return bytes(out)
+
+
+def decode_positions(data: bytes) -> List[int]:
+    # Gaps below 128 take one byte, which is the case for all gaps of frequent terms, the ones with
+    # the longest position lists. Those are summed up without decoding byte by byte.
+    if max(data, default=0) < 0x80:
+        return list(accumulate(data))
+    positions = []
+    position = 0
+    pos = 0
+    while pos < len(data):
+        gap, pos = decode_varint(data, pos)
+        position += gap
+        positions.append(position)
+    return positions
+
+
+def match_ordered(position_lists: List[List[int]], max_distance: int) -> bool:
+    """
+    Positional merge join: whether there are positions p0 < p1 < ... taken from the given lists in
+    order, with each p(i+1) - p(i) <= max_distance.
+    """
+    # Every position of the first list that can start a match, mapped to the position reached so
+    # far. Both lists stay sorted, so every step is a single merge pass.
+    starts = position_lists[0]
+    reached = position_lists[0]
+    for positions in position_lists[1:]:
+        next_starts = []
+        next_reached = []
+        i = 0
+        for start, position in zip(starts, reached):
+            i = bisect_left(positions, position + 1, i)
+            if i < len(positions) and positions[i] - position <= max_distance:
+                next_starts.append(start)
+                next_reached.append(positions[i])
+        if not next_starts:
+            return False
+        starts, reached = next_starts, next_reached
+    return True
+
+
+def match_near(first: List[int], second: List[int], max_distance: int) -> bool:
+    """
+    Merge join of two sorted position lists: whether a position of first and a position of
+    second are at most max_distance apart. A position is never matched with itself, so when both
+    lists are the positions of the same term two distinct occurrences are needed.
+    """
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if first[i] != second[j] and abs(first[i] - second[j]) <= max_distance:
+            return True
+        if first[i] < second[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+class PositionalInvertedIndexWithFrequencies(DictBasedInvertedIndexWithFrequencies):
+    """
+    DictBasedInvertedIndexWithFrequencies that also stores the token positions of every posting,
+    so phrase and NEAR/k queries are answered from the index alone.
+
+    Positions are stored per (term, doc_id) as variable-byte encoded gaps. search() scores the
+    documents containing all query terms as the parent class does, and keeps those satisfying every
+    PositionalClause of the query, checked with merge joins over the decoded positions.
+
+    The index file has the DictBasedInvertedIndexWithFrequencies format with base64 positions
+    added to every posting, so it can also be read by the parent class.
+    """
+    def __init__(self, filename, top_k_pruning: bool = False):
+        """
+        :param filename: File the index is read from and written to.
+        :param top_k_pruning: Same as in DictBasedInvertedIndexWithFrequencies, only used for queries
+            without clauses.
+        """
+        super().__init__(filename, top_k_pruning)
+        # dict mapping a term to a dict with doc_id as a key and the encoded positions as a value.
+        self.term_to_doc_id_and_positions = defaultdict(dict)
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        super().add_document(doc)
+        term_positions = defaultdict(list)
+        for position, term in enumerate(doc.tokens):
+            term_positions[term].append(position)
+        for term, positions in term_positions.items():
+            self.term_to_doc_id_and_positions[term][doc.doc_id] = encode_positions(positions)
+
+    def add_documents(self, batch: DocumentBatch) -> None:
+        Index.add_documents(self, batch)
+
+    def merge(self, other: Index) -> None:
+        super().merge(other)
+        for term, doc_id_to_positions in other.term_to_doc_id_and_positions.items():
+            self.term_to_doc_id_and_positions[term].update(doc_id_to_positions)
+
+    def write(self):
+        records = ({
+            'term': term,
+            'documents_count': doc_count,
+            'max_tf': self.max_tfs[term],
+            'index': [{'doc_id': doc_id, 'tf': tf,
+                       'positions': base64.b64encode(self.term_to_doc_id_and_positions[term][doc_id]).decode()}
+                      for doc_id, tf in self.term_to_doc_id_and_frequencies[term].items()]
+        } for term, doc_count in self.doc_counts.items())
+        write_inverted_index_records(self.filename, self.number_of_documents, records)
+
+    def read(self):
+        self.version += 1
+        with open(self.filename) as fp:
+            record = json.loads(fp.readline())
+            self.number_of_documents = record['number_of_documents']
+            self.term_to_doc_id_and_frequencies = defaultdict(dict)
+            self.term_to_doc_id_and_positions = defaultdict(dict)
+            self.doc_counts = Counter()
+            self.max_tfs = dict()
+            for line in fp:
+                record = json.loads(line)
+                term = record['term']
+                self.doc_counts[term] = record['documents_count']
+                self.max_tfs[term] = record['max_tf']
+                self.term_to_doc_id_and_frequencies[term] = {
+                    sub_record['doc_id']: sub_record['tf'] for sub_record in record['index']}
+                self.term_to_doc_id_and_positions[term] = {
+                    sub_record['doc_id']: base64.b64decode(sub_record['positions'])
+                    for sub_record in record['index']}
+
+    def write_snapshot(self) -> None:
+        """
+        Writes the snapshot of the parent class with the encoded positions added to it. Positions
+        are pickled with the snapshot, so read_snapshot() copies them instead of mapping them.
+        """
+        write_index_snapshot(self, positions=dict(self.term_to_doc_id_and_positions))
+
+    def read_snapshot(self) -> None:
+        self.term_to_doc_id_and_positions = read_index_snapshot(self, as_mapping=True)['positions']
+
+    def positions(self, term: str, doc_id: str) -> List[int]:
+        return decode_positions(self.term_to_doc_id_and_positions[term][doc_id])
+
+    def matches_clause(self, doc_id: str, clause: PositionalClause) -> bool:
+        position_lists = [self.positions(term, doc_id) for term in clause.terms]
+        if len(position_lists) < 2:
+            return True
+        if clause.ordered:
+            return match_ordered(position_lists, clause.max_distance)
+        return all(match_near(first, second, clause.max_distance)
+                   for first, second in zip(position_lists, position_lists[1:]))
+
+    def search(self, query: Query) -> SearchResults:
+        if not query.clauses:
+            return super().search(query)
+        terms = query.terms + [term for clause in query.clauses for term in clause.terms
+                               if term not in query.terms]
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for term in terms if term in self.term_to_doc_id_and_frequencies}
+        match_scores = {doc_id: score for doc_id, score in self.score_matches(terms, idfs).items()
+                        if all(self.matches_clause(doc_id, clause) for clause in query.clauses)}
+        sorted_results = rank_by_score(match_scores)
+        return SearchResults(sorted_results[0:query.num_results])
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        return [self.search(query) for query in queries]
+
+    def positions_size_in_bytes(self) -> int:
+        """
+        :return: Number of bytes of encoded positions, the memory cost of positions on top of the
+            parent class.
+        """
+        return sum(len(positions) for doc_id_to_positions in self.term_to_doc_id_and_positions.values()
+                   for positions in doc_id_to_positions.values())
@@ -0,0 +1,368 @@
+import pickle
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PackedPostings(Sequence):
+    """
+    Read-only posting list stored as two parallel packed buffers.
+
+    doc_ordinals holds dense integer document ids that are translated back to the original doc_ids
+    through the shared doc_ids table, tfs holds the matching term frequencies. Both buffers can be
+    arrays or memoryviews over a memory-mapped file, and only the [start, end) slice belongs to
+    this posting list, so creating a PackedPostings never copies any posting data.
+
+    Iterating yields (doc_id, tf) pairs, so it can be used wherever a list of pairs is expected.
+    """
+    def __init__(self, doc_ids: List[str], doc_ordinals, tfs, start: int, end: int):
+        self.doc_ids = doc_ids
+        self.doc_ordinals = doc_ordinals
+        self.tfs = tfs
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, i) -> Tuple[str, float]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('posting index out of range')
+        return self.doc_ids[self.doc_ordinals[self.start + i]], self.tfs[self.start + i]
+
+    def __iter__(self):
+        doc_ids = self.doc_ids
+        for ordinal, tf in zip(self.doc_ordinals[self.start:self.end], self.tfs[self.start:self.end]):
+            yield doc_ids[ordinal], tf
+
+
+class PackedPostingsMap(Mapping):
+    """
+    Read-only doc_id -> tf mapping over a [start, end) slice of packed buffers, the dict
+    counterpart of PackedPostings.
+
+    doc_ordinals are sorted within the slice and the doc_ids table is sorted too, so a lookup is a
+    binary search for the ordinal of the doc_id followed by a binary search in the slice.
+    """
+    __slots__ = ('doc_ids', 'doc_ordinals', 'tfs', 'start', 'end')
+
+    def __init__(self, doc_ids: List[str], doc_ordinals, tfs, start: int, end: int):
+        self.doc_ids = doc_ids
+        self.doc_ordinals = doc_ordinals
+        self.tfs = tfs
+        self.start = start
+        self.end = end
+
+    def position(self, doc_id: str) -> int:
+        """
+        :return: Index of doc_id in the buffers, or -1 if it is not in this posting list.
+        """
+        ordinal = bisect_left(self.doc_ids, doc_id)
+        if ordinal == len(self.doc_ids) or self.doc_ids[ordinal] != doc_id:
+            return -1
+        i = bisect_left(self.doc_ordinals, ordinal, self.start, self.end)
+        return i if i < self.end and self.doc_ordinals[i] == ordinal else -1
+
+    def __getitem__(self, doc_id: str) -> float:
+        i = self.position(doc_id)
+        if i < 0:
+            raise KeyError(doc_id)
+        return self.tfs[i]
+
+    def __contains__(self, doc_id) -> bool:
+        return self.position(doc_id) >= 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __iter__(self):
+        doc_ids = self.doc_ids
+        for ordinal in self.doc_ordinals[self.start:self.end]:
+            yield doc_ids[ordinal]
+
+    def keys(self):
+        # A set, so that the set operations of search run in C instead of probing this mapping.
+        return set(self)
+
+    def items(self):
+        doc_ids = self.doc_ids
+        return [(doc_ids[ordinal], tf)
+                for ordinal, tf in zip(self.doc_ordinals[self.start:self.end], self.tfs[self.start:self.end])]
+
+
+def _pack_buffer(values, protocol: int) -> Tuple[str, object]:
+    """
+    Pickles an array or a memoryview of a FrozenPostings. With protocol 5 the data is passed as a
+    PickleBuffer, which pickle can write out-of-band, see snapshot.write_snapshot().
+    """
+    typecode = values.typecode if isinstance(values, array) else values.format
+    return typecode, pickle.PickleBuffer(values) if protocol >= 5 else bytes(values)
+
+
+def _unpack_buffer(typecode: str, data) -> memoryview:
+    # An out-of-band buffer comes back as it was supplied to pickle.loads(), in-band data as bytes.
+    return memoryview(data).cast('B').cast(typecode)
+
+
+def _restore_frozen_postings(terms, offsets, doc_ids, doc_ordinals, tfs, as_mapping) -> 'FrozenPostings':
+    return FrozenPostings(terms, _unpack_buffer(*offsets), doc_ids, _unpack_buffer(*doc_ordinals),
+                          _unpack_buffer(*tfs), as_mapping)
+
+
+def _restore_frozen_term_values(postings, values, missing) -> 'FrozenTermValues':
+    return FrozenTermValues(postings, _unpack_buffer(*values), missing)
+
+
+class FrozenPostings(Mapping):
+    """
+    Read-only term -> postings mapping made by freeze_postings(), which takes a fraction of the
+    memory of dicts or lists of tuples.
+
+    Terms are kept in a sorted table with the offsets of their postings, and the postings of all
+    terms are stored in two packed arrays: uint32 ordinals into the sorted doc_ids table, and the
+    float64 tfs. Within a term, postings are sorted by ordinal. Looking up a term returns a
+    PackedPostings, or a PackedPostingsMap with as_mapping, so the frozen postings can replace
+    lists of (doc_id, tf) pairs or doc_id -> tf dicts respectively.
+
+    The arrays can also be memoryviews, as after loading a snapshot. With pickle protocol 5 they
+    are pickled as PickleBuffers, which snapshot.write_snapshot() stores out-of-band.
+    """
+    def __init__(self, terms: List, offsets: array, doc_ids: List[str], doc_ordinals: array, tfs: array,
+                 as_mapping: bool):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.doc_ordinals = doc_ordinals
+        self.tfs = tfs
+        self.as_mapping = as_mapping
+
+    def find(self, term) -> int:
+        """
+        :return: Index of term in the term table, or -1 if it has no postings.
+        """
+        try:
+            i = bisect_left(self.terms, term)
+        except TypeError:  # Not comparable with the terms, e.g. None for unknown term ids.
+            return -1
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def __getitem__(self, term):
+        i = self.find(term)
+        if i < 0:
+            raise KeyError(term)
+        postings_type = PackedPostingsMap if self.as_mapping else PackedPostings
+        return postings_type(self.doc_ids, self.doc_ordinals, self.tfs, self.offsets[i], self.offsets[i + 1])
+
+    def __contains__(self, term) -> bool:
+        return self.find(term) >= 0
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    @property
+    def number_of_postings(self) -> int:
+        return len(self.doc_ordinals)
+
+    def __reduce_ex__(self, protocol):
+        return _restore_frozen_postings, (
+            self.terms, _pack_buffer(self.offsets, protocol), self.doc_ids,
+            _pack_buffer(self.doc_ordinals, protocol), _pack_buffer(self.tfs, protocol), self.as_mapping)
+
+
+class FrozenTermValues(Mapping):
+    """
+    Read-only term -> value mapping stored as an array aligned with the term table of a
+    FrozenPostings, used for per-term statistics such as document counts.
+    """
+    def __init__(self, postings: FrozenPostings, values: array, missing=None):
+        """
+        :param postings: Holds the term table.
+        :param values: Value of every term of the table, in the same order.
+        :param missing: Value of terms that are not in the table, which raise KeyError if None.
+        """
+        self.postings = postings
+        self.values = values
+        self.missing = missing
+
+    def __getitem__(self, term):
+        i = self.postings.find(term)
+        if i >= 0:
+            return self.values[i]
+        if self.missing is None:
+            raise KeyError(term)
+        return self.missing
+
+    def __contains__(self, term) -> bool:
+        return self.postings.find(term) >= 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.postings.terms)
+
+    def __reduce_ex__(self, protocol):
+        return _restore_frozen_term_values, (self.postings, _pack_buffer(self.values, protocol), self.missing)
+
+
+def freeze_postings(term_to_postings: Dict, as_mapping: bool) -> FrozenPostings:
+    """
+    Packs postings into a FrozenPostings.
+    :param term_to_postings: Maps every term to its postings, either an iterable of (doc_id, tf)
+        pairs or a doc_id -> tf mapping.
+    :param as_mapping: Whether the frozen postings of a term are looked up by doc_id.
+    """
+    def pairs(postings) -> Iterable[Tuple[str, float]]:
+        return postings.items() if isinstance(postings, Mapping) else postings
+
+    doc_ids = sorted({doc_id for postings in term_to_postings.values() for doc_id, _ in pairs(postings)})
+    doc_id_to_ordinal = {doc_id: ordinal for ordinal, doc_id in enumerate(doc_ids)}
+    terms = sorted(term for term, postings in term_to_postings.items() if len(postings))
+    offsets = array('Q', [0])
+    doc_ordinals = array('I')
+    tfs = array('d')
+    for term in terms:
+        for ordinal, tf in sorted((doc_id_to_ordinal[doc_id], tf) for doc_id, tf in pairs(term_to_postings[term])):
+            doc_ordinals.append(ordinal)
+            tfs.append(tf)
+        offsets.append(len(doc_ordinals))
+    return FrozenPostings(terms, offsets, doc_ids, doc_ordinals, tfs, as_mapping)
+
+
+def encode_varint(value: int, out: bytearray) -> None:
+    """
+    Appends a non-negative integer to out using variable-byte encoding: 7 bits per byte, with the
+    high bit set on every byte except the last one.
+    """
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos: int) -> Tuple[int, int]:
+    """
+    Decodes a variable-byte encoded integer.
+    :param data: Buffer written by encode_varint.
+    :param pos: Offset of the first byte of the integer.
+    :return: The decoded integer and the offset right after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+# Term frequencies are ratios in (0, 1] and are stored as 16 bit integers.
+TF_QUANTIZATION_LEVELS = 0xffff
+
+
+def quantize_tf(tf: float) -> int:
+    return max(1, min(TF_QUANTIZATION_LEVELS, round(tf * TF_QUANTIZATION_LEVELS)))
+
+
+def dequantize_tf(quantized_tf: int) -> float:
+    return quantized_tf / TF_QUANTIZATION_LEVELS
+
+
+class CompressedPostingList:
+    """
+    Posting list of integer doc ids in increasing order with quantized term frequencies.
+
+    doc ids are stored as variable-byte encoded gaps, and every skip_interval-th posting gets a skip
+    pointer (its doc id and byte offset), so PostingCursor.advance() can jump over whole blocks
+    without decoding them. A posting takes 3-4 bytes instead of a (doc_id, tf) tuple.
+    """
+    def __init__(self, skip_interval: int = 64):
+        self.skip_interval = skip_interval
+        self.data = bytearray()
+        self.tfs = array('H')
+        self.skip_doc_ids = array('i')
+        self.skip_offsets = array('i')
+        self.last_doc_id = 0
+
+    def append(self, doc_id: int, tf: float) -> None:
+        if self.tfs and doc_id <= self.last_doc_id:
+            raise ValueError(f'doc ids must be appended in increasing order, got {doc_id} '
+                             f'after {self.last_doc_id}')
+        if len(self.tfs) % self.skip_interval == 0:
+            self.skip_doc_ids.append(doc_id)
+            self.skip_offsets.append(len(self.data))
+        encode_varint(doc_id - self.last_doc_id, self.data)
+        self.tfs.append(quantize_tf(tf))
+        self.last_doc_id = doc_id
+
+    def __len__(self) -> int:
+        return len(self.tfs)
+
+    def __iter__(self):
+        cursor = PostingCursor(self)
+        while cursor.doc_id is not None:
+            yield cursor.doc_id, cursor.tf
+            cursor.next()
+
+    def size_in_bytes(self) -> int:
+        return (len(self.data) + self.tfs.itemsize * len(self.tfs)
+                + self.skip_doc_ids.itemsize * len(self.skip_doc_ids) * 2)
+
+
+class PostingCursor:
+    """
+    Forward-only cursor over a CompressedPostingList.
+
+    doc_id and tf describe the current posting, doc_id is None once the cursor is exhausted.
+    """
+    def __init__(self, postings: CompressedPostingList):
+        self.postings = postings
+        self.i = -1
+        self.pos = 0
+        self.doc_id = 0
+        self.next()
+
+    @property
+    def tf(self) -> float:
+        return dequantize_tf(self.postings.tfs[self.i])
+
+    def next(self) -> Optional[int]:
+        """
+        Moves to the next posting.
+        :return: The new current doc id, or None if there are no more postings.
+        """
+        self.i += 1
+        if self.i >= len(self.postings):
+            self.doc_id = None
+            return None
+        gap, self.pos = decode_varint(self.postings.data, self.pos)
+        self.doc_id += gap
+        return self.doc_id
+
+    def advance(self, target: int) -> Optional[int]:
+        """
+        Moves to the first posting with doc id >= target, using skip pointers to avoid decoding
+        postings that cannot match.
+        :return: The new current doc id, or None if there is no such posting.
+        """
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        postings = self.postings
+        skip = bisect_right(postings.skip_doc_ids, target) - 1
+        if skip >= 0 and skip * postings.skip_interval > self.i:
+            self.i = skip * postings.skip_interval
+            _, self.pos = decode_varint(postings.data, postings.skip_offsets[skip])
+            self.doc_id = postings.skip_doc_ids[skip]
+        while self.doc_id is not None and self.doc_id < target:
+            self.next()
+        return self.doc_id
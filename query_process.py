@@ -1,13 +1,20 @@
 import abc
+import re
 import sys
+import time
 from abc import ABC
+from typing import Dict, List, Optional
 
 import document_source
 import documents
+from cache import LRUCache
+from instrumentation import NULL_OBSERVER, PipelineObserver
 from index import Index, NaiveIndex, ListBasedInvertedIndexWithFrequencies
-from search_api import Query, SearchResults
+from positional_index import PositionalInvertedIndexWithFrequencies
+from search_api import PositionalClause, Query, SearchResults
 
-from tokenizer import NaiveTokenizer, Tokenizer
+from tokenizer import NaiveTokenizer, Normalizer, Tokenizer
+from vocabulary import Vocabulary
 
 
 class QueryParser(ABC):
@@ -30,11 +37,17 @@ class NaiveQueryParser(QueryParser):
     """
     A QueryParser implementation that runs the supplied tokenizer.
     """
-    def __init__(self, tokenizer: Tokenizer):
+    def __init__(self, tokenizer: Tokenizer, normalizer: Optional[Normalizer] = None,
+                 vocabulary: Optional[Vocabulary] = None):
         """
         :param tokenizer: A tokenizer instance that will be used in parse_query.
+        :param normalizer: Optional normalizer applied to the tokens, it should match the one
+            used when indexing.
+        :param vocabulary: Optional vocabulary of the index, used to set the term_ids of queries.
         """
         self.tokenizer = tokenizer
+        self.normalizer = normalizer
+        self.vocabulary = vocabulary
 
     def parse_query(self, query_str: str, num_results: int) -> Query:
         """
@@ -42,7 +55,56 @@ class NaiveQueryParser(QueryParser):
         :param query_str: The input query string entered by the user.
         :return: Query representation with tokenized query.
         """
-        return Query(terms=self.tokenizer.tokenize(query_str), num_results=num_results)
+        terms = self.analyze(query_str)
+        term_ids = self.vocabulary.lookup(terms) if self.vocabulary is not None else None
+        return Query(terms=terms, num_results=num_results, term_ids=term_ids)
+
+    def analyze(self, text: str) -> List[str]:
+        """
+        :return: The tokenized and normalized terms of text.
+        """
+        terms = self.tokenizer.tokenize(text)
+        if self.normalizer is not None:
+            terms = self.normalizer.normalize(terms)
+        return terms
+
+
+# A quoted phrase, a NEAR/k operator or a single word.
+_QUERY_PART = re.compile(r'"([^"]*)"|\bNEAR/(\d+)\b|(\S+)')
+
+
+class PhraseQueryParser(NaiveQueryParser):
+    """
+    A QueryParser that also understands quoted phrases and the NEAR/k operator, for indexes that
+    store positions such as PositionalInvertedIndexWithFrequencies.
+
+    "a b c" matches documents where the terms appear next to each other in this order, and
+    x NEAR/k y matches documents where the last term of x and the first term of y are at most k
+    positions apart in any order. x and y are words or phrases. A word the tokenizer splits into
+    several terms is treated as a phrase. All terms are also required and scored as in
+    NaiveQueryParser.
+    """
+    def parse_query(self, query_str: str, num_results: int) -> Query:
+        terms = []
+        clauses = []
+        previous = None  # Terms of the previous word or phrase, the left operand of NEAR/k.
+        near_distance = None
+        for phrase, distance, word in _QUERY_PART.findall(query_str):
+            if distance:
+                near_distance = int(distance)
+                continue
+            part_terms = self.analyze(phrase or word)
+            if not part_terms:
+                continue
+            if near_distance is not None and previous is not None:
+                clauses.append(PositionalClause([previous[-1], part_terms[0]], near_distance, ordered=False))
+            if len(part_terms) > 1:
+                clauses.append(PositionalClause(part_terms))
+            terms.extend(part_terms)
+            previous = part_terms
+            near_distance = None
+        term_ids = self.vocabulary.lookup(terms) if self.vocabulary is not None else None
+        return Query(terms=terms, num_results=num_results, term_ids=term_ids, clauses=clauses or None)
 
 
 class ResultFormatter(ABC):
@@ -80,22 +142,104 @@ class OutputTitlesResultFormatter(ResultFormatter):
         return out
 
 
+class QueryResultCache:
+    """
+    LRU cache of formatted search results, keyed by the normalized query: its sorted terms and the
+    number of results.
+
+    The cache is bounded by the number of entries and optionally by the total length of the cached
+    output, and entries can expire after ttl seconds. Everything is dropped whenever the version
+    of the index changes. Besides hits and misses, the stats count the seconds of search and
+    formatting saved by the hits.
+    """
+    def __init__(self, max_entries: int = 10000, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        """
+        :param max_entries: Maximum number of cached queries.
+        :param max_bytes: Maximum total length of the cached output strings, unbounded by default.
+        :param ttl: Seconds after which an entry expires, never by default.
+        """
+        # Entries are pairs (output string, seconds it took to compute).
+        self.cache = LRUCache(max_bytes if max_bytes is not None else float('inf'),
+                              size_of=lambda entry: len(entry[0]), max_entries=max_entries, ttl=ttl)
+        self.index_version = None
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def key(query: Query):
+        clauses = tuple((tuple(clause.terms), clause.max_distance, clause.ordered)
+                        for clause in query.clauses or ())
+        return tuple(sorted(query.terms)), query.num_results, clauses
+
+    def check_version(self, index: Index) -> None:
+        if index.version != self.index_version:
+            self.cache.clear()
+            self.index_version = index.version
+
+    def get(self, query: Query, index: Index) -> Optional[str]:
+        """
+        :return: The cached output for the query, or None.
+        """
+        self.check_version(index)
+        entry = self.cache.get(self.key(query))
+        if entry is None:
+            return None
+        self.seconds_saved += entry[1]
+        return entry[0]
+
+    def put(self, query: Query, index: Index, output: str, seconds: float) -> None:
+        """
+        :param query: The query.
+        :param index: The index the query ran on.
+        :param output: The formatted results.
+        :param seconds: The time it took to search and format the results.
+        """
+        self.check_version(index)
+        self.cache.put(self.key(query), (output, seconds))
+
+    def stats(self) -> Dict[str, float]:
+        stats = self.cache.stats()
+        stats['seconds_saved'] = self.seconds_saved
+        return stats
+
+
 class QueryProcess:
     """
     Class responsible for running the whole query process.
     """
     def __init__(
-            self, query_parser: QueryParser, index: Index, result_formatter: ResultFormatter):
+            self, query_parser: QueryParser, index: Index, result_formatter: ResultFormatter,
+            result_cache: Optional[QueryResultCache] = None,
+            observer: PipelineObserver = NULL_OBSERVER):
         """
         Constructor taking all the necessary components.
         :param query_parser: Specific implementation of a QueryParser.
         :param index: Specific implementation of an Index with all the data necessary to run a
             search.
         :param result_formatter: Specific implementation of a ResultFormatter.
+        :param result_cache: Optional cache of the output for repeated queries.
+        :param observer: Receives the timings of the 'parsing', 'search' and 'formatting' stages
+            and the 'queries' and 'cache_hits' counters. It is also set as the observer of the
+            index, to get the search counters.
         """
         self.query_parser = query_parser
         self.index = index
         self.result_formatter = result_formatter
+        self.result_cache = result_cache
+        self.observer = observer
+        if observer is not NULL_OBSERVER:
+            index.observer = observer
+
+    def parse_query(self, query_string: str, num_results: int = 10) -> Query:
+        with self.observer.stage('parsing'):
+            return self.query_parser.parse_query(query_string, num_results)
+
+    def search(self, query: Query) -> SearchResults:
+        """
+        Runs the search without formatting the results, for callers that present them on their own.
+        """
+        with self.observer.stage('search'):
+            return self.index.search(query)
 
     def run(self, query_string: str, num_results: int = 10) -> str:
         """
@@ -104,9 +248,19 @@ class QueryProcess:
         :param query_string: The query string taken from the user.
         :return: A human-readable representation of search results displayed to the user.
         """
-        query: Query = self.query_parser.parse_query(query_string, num_results)
-        results: SearchResults = self.index.search(query)
-        output_str: str = self.result_formatter.format_results_for_display(results)
+        self.observer.count('queries')
+        query: Query = self.parse_query(query_string, num_results)
+        if self.result_cache is not None:
+            output_str = self.result_cache.get(query, self.index)
+            if output_str is not None:
+                self.observer.count('cache_hits')
+                return output_str
+        start = time.perf_counter()
+        results: SearchResults = self.search(query)
+        with self.observer.stage('formatting', items=len(results.result_doc_ids)):
+            output_str: str = self.result_formatter.format_results_for_display(results)
+        if self.result_cache is not None:
+            self.result_cache.put(query, self.index, output_str, time.perf_counter() - start)
         return output_str
 
 
@@ -120,11 +274,21 @@ def create_naive_query_process(index_filename) -> QueryProcess:
     return process
 
 
+def create_positional_query_process(index_filename, corpus_filename) -> QueryProcess:
+    index = PositionalInvertedIndexWithFrequencies(index_filename)
+    index.read()
+    doc_collection = document_source.TrecCovidJsonlDocumentCollection(corpus_filename)
+    process = QueryProcess(
+        query_parser=PhraseQueryParser(NaiveTokenizer()),
+        index=index,
+        result_formatter=OutputTitlesResultFormatter(doc_collection))
+    return process
+
+
 def create_query_process(index_filename, corpus_filename) -> QueryProcess:
     index = ListBasedInvertedIndexWithFrequencies(index_filename)
     index.read()
-    source = document_source.TrecCovidJsonlSource(corpus_filename)
-    doc_collection = source.read()
+    doc_collection = document_source.TrecCovidJsonlDocumentCollection(corpus_filename)
     process = QueryProcess(
         query_parser=NaiveQueryParser(NaiveTokenizer()),
         index=index,
@@ -132,12 +296,13 @@ def create_query_process(index_filename, corpus_filename) -> QueryProcess:
     return process
 
 
-def main(index_filename: str) -> None:
+def main(index_filename: str, corpus_filename: str) -> None:
     """
     Reads the index from the provided file and runs an interactive query search loop.
     :param index_filename: The file to read the index data from.
+    :param corpus_filename: The jsonl corpus the index was built from, used to display titles.
     """
-    qp = create_query_process(index_filename)
+    qp = create_query_process(index_filename, corpus_filename)
     query = input("Please enter a query:")
     while query:
         print(qp.run(query_string=query))
@@ -147,4 +312,4 @@ def main(index_filename: str) -> None:
 if __name__ == "__main__":
     # sys.argv is a list of all the command-line arguments supplied to the script.
     # sys.argv[0] is the name of this script, so actual arguments start from position 1.
-    main(index_filename=sys.argv[1])
+    main(index_filename=sys.argv[1], corpus_filename=sys.argv[2])
@@ -0,0 +1,242 @@
+import asyncio
+import concurrent.futures
+import functools
+import json
+import multiprocessing
+import sys
+import urllib.parse
+from typing import Any, Dict, Optional, Tuple
+
+from documents import DocumentCollection
+from query_process import QueryProcess, create_query_process
+
+# Largest accepted request line or header line, in bytes.
+MAX_LINE_LENGTH = 8192
+MAX_HEADERS = 100
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+def search_json(query_process: QueryProcess, document_collection: Optional[DocumentCollection],
+                query_string: str, num_results: int) -> Dict[str, Any]:
+    """
+    Runs a query and returns the response of the /search endpoint.
+    """
+    results = query_process.search(query_process.parse_query(query_string, num_results))
+    if document_collection is None:
+        return {'query': query_string, 'results': [{'doc_id': doc_id} for doc_id in results.result_doc_ids]}
+    return {'query': query_string,
+            'results': [{'doc_id': doc_id, 'title': document_collection.get_doc(doc_id).title}
+                        for doc_id in results.result_doc_ids]}
+
+
+# QueryProcess and DocumentCollection of a worker process, set by _init_worker.
+_worker_query_process: Optional[QueryProcess] = None
+_worker_document_collection: Optional[DocumentCollection] = None
+
+
+def _init_worker(query_process: QueryProcess, document_collection: Optional[DocumentCollection]) -> None:
+    global _worker_query_process, _worker_document_collection
+    _worker_query_process = query_process
+    _worker_document_collection = document_collection
+
+
+def _start_worker() -> None:
+    pass
+
+
+def _worker_search_json(query_string: str, num_results: int) -> Dict[str, Any]:
+    return search_json(_worker_query_process, _worker_document_collection, query_string, num_results)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class QueryServer:
+    """
+    HTTP/JSON query server built on asyncio, serving a QueryProcess loaded once at startup.
+
+    Endpoints:
+      GET /search?q=<query>&n=<number of results>  ->  {"query": ..., "results": [{"doc_id", "title"}]}
+      GET /health  ->  {"status": "ok", "pending": <number of searches in progress>}
+
+    Searches are CPU-bound, so they run in a pool of worker processes (or threads) and the event
+    loop only parses requests and writes responses. A search that takes longer than timeout
+    seconds is answered with 504. At most max_pending searches are queued or running at any time,
+    including searches that timed out but are still running in a worker, further requests are
+    rejected right away with 503 instead of piling up. With process workers
+    on platforms that support fork, the workers share the memory of the loaded index.
+    """
+    def __init__(self, query_process: QueryProcess, document_collection: Optional[DocumentCollection] = None,
+                 num_workers: Optional[int] = None, use_processes: bool = True, timeout: float = 10.0,
+                 max_pending: int = 64, max_results: int = 100):
+        """
+        :param query_process: Used to parse and run the queries.
+        :param document_collection: Optional collection the titles of the results are read from.
+        :param num_workers: Number of search workers, the number of CPUs by default.
+        :param use_processes: Search in worker processes, or in threads of this process.
+        :param timeout: Seconds after which a search is answered with 504.
+        :param max_pending: Maximum number of searches queued or running at the same time.
+        :param max_results: Maximum accepted value of the n parameter.
+        """
+        self.query_process = query_process
+        self.document_collection = document_collection
+        self.num_workers = num_workers
+        self.use_processes = use_processes
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.pending = 0
+        self.executor: Optional[concurrent.futures.Executor] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def create_executor(self) -> concurrent.futures.Executor:
+        if not self.use_processes:
+            return concurrent.futures.ThreadPoolExecutor(self.num_workers)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        return concurrent.futures.ProcessPoolExecutor(
+            self.num_workers, mp_context=context, initializer=_init_worker,
+            initargs=(self.query_process, self.document_collection))
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> Tuple[str, int]:
+        """
+        Starts the workers and listens for connections.
+        :return: The address the server listens on, useful with port 0.
+        """
+        self.executor = self.create_executor()
+        # Forked workers would inherit the sockets of the connections open when they start, which
+        # would then stay open after the response. Starting them before listening avoids that.
+        await asyncio.get_running_loop().run_in_executor(self.executor, _start_worker)
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE_LENGTH)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8080) -> None:
+        await self.start(host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    def run_search(self, query_string: str, num_results: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self.use_processes:
+            return loop.run_in_executor(self.executor, _worker_search_json, query_string, num_results)
+        return loop.run_in_executor(self.executor, functools.partial(
+            search_json, self.query_process, self.document_collection, query_string, num_results))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, body = await self.respond(reader)
+            await self.write_response(writer, status, body)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any]]:
+        """
+        Reads a request and runs it.
+        :return: The status and body of the response. Errors of the search itself are answered
+            with 500, so that every request gets a response.
+        """
+        try:
+            method, target = await asyncio.wait_for(self.read_request(reader), self.timeout)
+        except HttpError as e:
+            return e.status, {'error': str(e)}
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            return 400, {'error': 'malformed or incomplete request'}
+        try:
+            return await self.handle_request(method, target)
+        except HttpError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'search failed with {type(e).__name__}'}
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str]:
+        """
+        Reads the request line and headers. Requests have no body, so it is not read.
+        :return: The method and the request target.
+        """
+        request_line = (await reader.readuntil(b'\n')).decode('latin-1').split()
+        if len(request_line) != 3 or not request_line[2].startswith('HTTP/'):
+            raise HttpError(400, 'malformed request line')
+        for _ in range(MAX_HEADERS):
+            if (await reader.readuntil(b'\n')).strip() == b'':
+                return request_line[0], request_line[1]
+        raise HttpError(400, 'too many headers')
+
+    async def handle_request(self, method: str, target: str) -> Tuple[int, Dict[str, Any]]:
+        url = urllib.parse.urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'pending': self.pending}
+        if url.path != '/search':
+            raise HttpError(404, f'unknown path {url.path}')
+        if method != 'GET':
+            raise HttpError(405, 'only GET is supported')
+        params = urllib.parse.parse_qs(url.query)
+        query_string = params.get('q', [''])[0]
+        try:
+            num_results = int(params.get('n', ['10'])[0])
+        except ValueError:
+            raise HttpError(400, 'n must be an integer')
+        if not 0 < num_results <= self.max_results:
+            raise HttpError(400, f'n must be between 1 and {self.max_results}')
+        if self.pending >= self.max_pending:
+            raise HttpError(503, 'too many pending searches')
+        self.pending += 1
+        search = self.run_search(query_string, num_results)
+        # Cancelling the future would not stop the worker, so the slot is only released when the
+        # search has actually finished, and the timeout is applied to a shield of the future.
+        search.add_done_callback(self.release_pending)
+        try:
+            return 200, await asyncio.wait_for(asyncio.shield(search), self.timeout)
+        except asyncio.TimeoutError:
+            raise HttpError(504, f'search took longer than {self.timeout} seconds')
+
+    def release_pending(self, search: asyncio.Future) -> None:
+        self.pending -= 1
+        if not search.cancelled():
+            # Nothing awaits the searches that timed out, their errors would be logged as never retrieved.
+            search.exception()
+
+    @staticmethod
+    async def write_response(writer: asyncio.StreamWriter, status: int, body: Dict[str, Any]) -> None:
+        content = json.dumps(body).encode()
+        headers = [f'HTTP/1.1 {status} {_REASONS[status]}', 'Content-Type: application/json',
+                   f'Content-Length: {len(content)}', 'Connection: close']
+        if status == 503:
+            headers.append('Retry-After: 1')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + content)
+        await writer.drain()
+
+
+def main(index_filename: str, corpus_filename: str, port: int = 8080) -> None:
+    """
+    Loads the index and the corpus and serves queries on localhost until interrupted.
+    """
+    query_process = create_query_process(index_filename, corpus_filename)
+    server = QueryServer(query_process, query_process.result_formatter.document_collection)
+    try:
+        asyncio.run(server.serve_forever(port=port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    # python query_server.py <index file> <corpus jsonl file> [port]
+    main(index_filename=sys.argv[1], corpus_filename=sys.argv[2],
+         port=int(sys.argv[3]) if len(sys.argv) > 3 else 8080)
@@ -1,11 +1,29 @@
 import dataclasses
-from typing import List
+from typing import List, Optional
+
+
+@dataclasses.dataclass
+class PositionalClause:
+    """
+    Constraint on the positions of terms in a document. With ordered, the terms have to appear in
+    this order with each one at most max_distance positions after the previous one, so a phrase
+    has max_distance 1. Otherwise, each pair of consecutive terms has to be at most max_distance
+    positions apart in any order, as in NEAR/k.
+    """
+    terms: List[str]
+    max_distance: int = 1
+    ordered: bool = True
 
 
 @dataclasses.dataclass
 class Query:
     terms: List[str]
     num_results: int
+    # Ids of the terms in the Vocabulary of the index, None for terms missing from it. Only set by
+    # query parsers that have the vocabulary.
+    term_ids: Optional[List[Optional[int]]] = None
+    # Positional constraints, on terms that are also in terms. Only used by indexes with positions.
+    clauses: Optional[List[PositionalClause]] = None
 
 
 @dataclasses.dataclass
@@ -0,0 +1,305 @@
+import dataclasses
+import json
+import os
+import threading
+from collections import Counter
+from typing import List, Optional, Set
+
+from documents import TransformedDocument
+from index import Index, Indexer, DictBasedInvertedIndexWithFrequencies, inverse_document_frequency, \
+    rank_by_score, term_dictionary_filename
+from search_api import Query, SearchResults
+
+
+@dataclasses.dataclass(eq=False)
+class Segment:
+    """
+    Immutable part of a SegmentedIndex. Only deleted_doc_ids changes after the segment is written.
+    """
+    name: str
+    index: DictBasedInvertedIndexWithFrequencies
+    doc_ids: Set[str]
+    deleted_doc_ids: Set[str]
+
+    @property
+    def number_of_live_documents(self) -> int:
+        return len(self.doc_ids) - len(self.deleted_doc_ids)
+
+
+def combine_segments(segments: List[Segment], name: str, filename: str) -> Segment:
+    """
+    Combines the live documents of the given segments into a new segment.
+    :param segments: Segments to merge, in the order their documents were added.
+    :param name: Name of the new segment.
+    :param filename: Index file of the new segment.
+    :return: The merged segment, not yet written.
+    """
+    merged = DictBasedInvertedIndexWithFrequencies(filename)
+    doc_ids = set()
+    for segment in segments:
+        live_doc_ids = segment.doc_ids - segment.deleted_doc_ids
+        doc_ids |= live_doc_ids
+        merged.number_of_documents += len(live_doc_ids)
+        for term, tfs in segment.index.term_to_doc_id_and_frequencies.items():
+            for doc_id, tf in tfs.items():
+                if doc_id in live_doc_ids:
+                    merged.term_to_doc_id_and_frequencies[term][doc_id] = tf
+                    merged.doc_counts[term] += 1
+                    merged.max_tfs[term] = max(tf, merged.max_tfs.get(term, tf))
+    return Segment(name=name, index=merged, doc_ids=doc_ids, deleted_doc_ids=set())
+
+
+class SegmentedIndex(Index):
+    """
+    Index made of immutable DictBasedInvertedIndexWithFrequencies segments, which makes adding
+    documents to an existing index cheap.
+
+    Added documents are buffered and flushed into a new segment file once max_buffered_documents is
+    reached, or on write(). search() scores every segment, and an in-memory segment of the
+    buffered documents, with collection-wide idfs and merges the results. Deleted documents are recorded as tombstones and are only dropped
+    from the segment files when their segment is merged, so until then they still count in the
+    idfs. Whenever merge_factor segments of a similar size exist, they are merged into one, by
+    default in a background thread.
+
+    filename holds a manifest listing the segments and their tombstones. Each segment is stored in
+    filename + '.' + segment name, with its doc_ids in the same name + '.docs'.
+    """
+    def __init__(self, filename: str, max_buffered_documents: int = 10000, merge_factor: int = 10,
+                 background_merges: bool = True):
+        """
+        :param filename: File the manifest is read from and written to.
+        :param max_buffered_documents: Number of added documents that triggers a flush.
+        :param merge_factor: Number of segments of a similar size that get merged together.
+        :param background_merges: Run merges in a background thread instead of in flush().
+        """
+        self.filename = filename
+        self.max_buffered_documents = max_buffered_documents
+        self.merge_factor = merge_factor
+        self.background_merges = background_merges
+        self.segments: List[Segment] = []
+        self.buffered_docs: List[TransformedDocument] = []
+        self.next_segment_number = 0
+        # Guards segments, buffered_docs and next_segment_number against the merge thread and
+        # concurrent searches.
+        self.lock = threading.RLock()
+        self.merge_thread: Optional[threading.Thread] = None
+        # In-memory segment of buffered_docs searched by search(), and the version it was built at.
+        self.buffered_segment: Optional[Segment] = None
+        self.buffered_segment_version = -1
+
+    def segment_filename(self, name: str) -> str:
+        return f'{self.filename}.{name}'
+
+    def new_segment_name(self) -> str:
+        with self.lock:
+            name = f'segment{self.next_segment_number}'
+            self.next_segment_number += 1
+            return name
+
+    def build_segment(self, name: str, filename: str, docs: List[TransformedDocument]) -> Segment:
+        index = DictBasedInvertedIndexWithFrequencies(filename)
+        for doc in docs:
+            index.add_document(doc)
+        return Segment(name=name, index=index, doc_ids={doc.doc_id for doc in docs}, deleted_doc_ids=set())
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        with self.lock:
+            self.version += 1
+            self.buffered_docs.append(doc)
+            flush = len(self.buffered_docs) >= self.max_buffered_documents
+        if flush:
+            self.flush()
+
+    def delete_document(self, doc_id: str) -> None:
+        """
+        Deletes all documents with the given doc_id added so far.
+        """
+        with self.lock:
+            self.version += 1
+            self.buffered_docs = [doc for doc in self.buffered_docs if doc.doc_id != doc_id]
+            for segment in self.segments:
+                if doc_id in segment.doc_ids:
+                    segment.deleted_doc_ids.add(doc_id)
+
+    def flush(self) -> None:
+        """
+        Writes the buffered documents into a new segment and starts a merge if one is due.
+        """
+        # The buffer is only emptied once its segment is added, so that concurrent searches see
+        # the buffered documents in exactly one place, and two flushes cannot write them twice.
+        with self.lock:
+            if not self.buffered_docs:
+                return
+            name = self.new_segment_name()
+            segment = self.build_segment(name, self.segment_filename(name), self.buffered_docs)
+            self.write_segment(segment)
+            self.segments.append(segment)
+            self.buffered_docs = []
+            self.write_manifest()
+        self.maybe_merge()
+
+    def get_buffered_segment(self) -> Optional[Segment]:
+        """
+        :return: An in-memory segment of the buffered documents, rebuilt only after the index
+            changed, or None if no document is buffered.
+        """
+        with self.lock:
+            if not self.buffered_docs:
+                return None
+            if self.buffered_segment_version != self.version:
+                self.buffered_segment = self.build_segment('buffer', '', self.buffered_docs)
+                self.buffered_segment_version = self.version
+            return self.buffered_segment
+
+    def write_segment(self, segment: Segment) -> None:
+        segment.index.write()
+        with open(segment.index.filename + '.docs', 'w') as fp:
+            json.dump(list(segment.doc_ids), fp)
+
+    def remove_segment_files(self, segment: Segment) -> None:
+        for filename in [segment.index.filename, term_dictionary_filename(segment.index.filename),
+                         segment.index.filename + '.docs']:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def write_manifest(self) -> None:
+        with self.lock:
+            manifest = {
+                'next_segment_number': self.next_segment_number,
+                'segments': [{'name': segment.name, 'deleted_doc_ids': list(segment.deleted_doc_ids)}
+                             for segment in self.segments],
+            }
+        with open(self.filename, 'w') as fp:
+            json.dump(manifest, fp)
+
+    def merge_candidates(self) -> Optional[List[Segment]]:
+        """
+        Merge policy: segments are put into tiers by the logarithm of their number of live
+        documents in base merge_factor, and the first merge_factor adjacent segments in the same
+        tier are merged.
+        :return: The segments to merge, or None if no merge is due.
+        """
+        # Only adjacent segments are merged, so documents stay in the order they were added.
+        run = []
+        run_tier = None
+        for segment in self.segments:
+            tier = 0
+            size = segment.number_of_live_documents
+            while size >= self.merge_factor:
+                size //= self.merge_factor
+                tier += 1
+            if tier != run_tier:
+                run = []
+                run_tier = tier
+            run.append(segment)
+            if len(run) == self.merge_factor:
+                return run
+        return None
+
+    def maybe_merge(self) -> None:
+        if self.merge_thread is not None and self.merge_thread.is_alive():
+            return
+        if self.background_merges:
+            self.merge_thread = threading.Thread(target=self.run_merges, daemon=True)
+            self.merge_thread.start()
+        else:
+            self.run_merges()
+
+    def run_merges(self) -> None:
+        """
+        Merges segments until the merge policy finds nothing more to merge.
+        """
+        while True:
+            with self.lock:
+                candidates = self.merge_candidates()
+            if candidates is None:
+                return
+            self.merge_segments(candidates)
+
+    def merge_segments(self, segments: List[Segment]) -> None:
+        """
+        Replaces the given adjacent segments with a single segment without their deleted documents.
+        """
+        with self.lock:
+            deleted_before_merge = [set(segment.deleted_doc_ids) for segment in segments]
+        name = self.new_segment_name()
+        merged = combine_segments(
+            [dataclasses.replace(segment, deleted_doc_ids=deleted_doc_ids)
+             for segment, deleted_doc_ids in zip(segments, deleted_before_merge)],
+            name, self.segment_filename(name))
+        self.write_segment(merged)
+        with self.lock:
+            # Documents deleted while the merge was running are still in the merged segment.
+            for segment, deleted_doc_ids in zip(segments, deleted_before_merge):
+                merged.deleted_doc_ids |= segment.deleted_doc_ids - deleted_doc_ids
+            position = self.segments.index(segments[0])
+            self.segments[position:position + len(segments)] = [merged]
+            # Dropping deleted documents changes the idfs.
+            self.version += 1
+            self.write_manifest()
+        for segment in segments:
+            self.remove_segment_files(segment)
+
+    def wait_for_merges(self) -> None:
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+
+    def search(self, query: Query) -> SearchResults:
+        with self.lock:
+            segments = list(self.segments)
+            buffered_segment = self.get_buffered_segment()
+        # The buffered documents were added last, as if they were in the newest segment.
+        if buffered_segment is not None:
+            segments.append(buffered_segment)
+        number_of_documents = sum(segment.index.number_of_documents for segment in segments)
+        doc_counts = Counter()
+        for term in set(query.terms):
+            doc_counts[term] = sum(segment.index.doc_counts[term] for segment in segments)
+            if doc_counts[term] == 0:
+                return SearchResults([])
+        idfs = {term: inverse_document_frequency(doc_count, number_of_documents)
+                for term, doc_count in doc_counts.items()}
+        match_scores = dict()
+        for segment in segments:
+            for doc_id, score in segment.index.score_matches(query.terms, idfs).items():
+                if doc_id not in segment.deleted_doc_ids:
+                    match_scores[doc_id] = score
+        sorted_results = rank_by_score(match_scores)
+        return SearchResults(sorted_results[0:query.num_results])
+
+    def write(self):
+        self.flush()
+        self.write_manifest()
+
+    def read(self):
+        self.version += 1
+        with open(self.filename) as fp:
+            manifest = json.load(fp)
+        segments = []
+        for record in manifest['segments']:
+            index = DictBasedInvertedIndexWithFrequencies(self.segment_filename(record['name']))
+            index.read()
+            with open(index.filename + '.docs') as fp:
+                doc_ids = set(json.load(fp))
+            segments.append(Segment(name=record['name'], index=index, doc_ids=doc_ids,
+                                    deleted_doc_ids=set(record['deleted_doc_ids'])))
+        with self.lock:
+            self.segments = segments
+            self.next_segment_number = manifest['next_segment_number']
+            self.buffered_docs = []
+
+
+class SegmentedIndexer(Indexer):
+    """
+    Indexer that reopens the SegmentedIndex in index_filename if it exists, so running the indexing
+    process adds the new documents to it instead of rebuilding it.
+    """
+    def __init__(self, index_filename: str, max_buffered_documents: int = 10000):
+        self.index_filename = index_filename
+        self.max_buffered_documents = max_buffered_documents
+
+    def create_index(self) -> Index:
+        index = SegmentedIndex(self.index_filename, self.max_buffered_documents)
+        if os.path.exists(self.index_filename):
+            index.read()
+        return index
@@ -0,0 +1,247 @@
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import zlib
+from collections import Counter
+from multiprocessing.connection import Connection
+from typing import Dict, List, Tuple
+
+from documents import TransformedDocument
+from index import Index, Indexer, DictBasedInvertedIndexWithFrequencies, inverse_document_frequency, \
+    read_term_dictionary, top_k_conjunctive
+from search_api import Query, SearchResults
+
+
+def shard_of(doc_id: str, number_of_shards: int) -> int:
+    """
+    :return: The shard of the document. crc32 is stable across processes and runs, unlike hash().
+    """
+    return zlib.crc32(doc_id.encode()) % number_of_shards
+
+
+def search_shard(index: DictBasedInvertedIndexWithFrequencies, queries: List[Query],
+                 idfs: Dict[str, float], top_k_pruning: bool) -> List[List[Tuple[float, str]]]:
+    """
+    Runs queries on one shard with the given collection-wide idfs.
+    :return: For every query, the (score, doc_id) pairs of the shard's top num_results documents.
+    """
+    all_results = []
+    for query in queries:
+        if not query.terms or any(term not in index.term_to_doc_id_and_frequencies for term in query.terms):
+            all_results.append([])
+            continue
+        if top_k_pruning:
+            postings = {term: index.term_to_doc_id_and_frequencies[term] for term in query.terms}
+            match_scores = {doc_id: sum(postings[term][doc_id] * idfs[term] for term in query.terms)
+                            for doc_id in top_k_conjunctive(query.terms, postings, idfs, index.max_tfs,
+                                                            query.num_results)}
+        else:
+            match_scores = index.score_matches(query.terms, idfs)
+        top_doc_ids = heapq.nsmallest(query.num_results, match_scores,
+                                      key=lambda doc_id: (-match_scores[doc_id], doc_id))
+        all_results.append([(match_scores[doc_id], doc_id) for doc_id in top_doc_ids])
+    return all_results
+
+
+def _serve_shard(connection: Connection, filename: str, top_k_pruning: bool) -> None:
+    """
+    Main function of a shard worker process: loads the shard, then answers (queries, idfs)
+    requests with search_shard() results until it receives None.
+    """
+    index = DictBasedInvertedIndexWithFrequencies(filename)
+    index.read()
+    connection.send(None)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        queries, idfs = request
+        try:
+            connection.send(search_shard(index, queries, idfs, top_k_pruning))
+        except Exception as e:
+            connection.send(e)
+    connection.close()
+
+
+class ShardedIndex(Index):
+    """
+    Index that partitions documents by shard_of(doc_id) into number_of_shards
+    DictBasedInvertedIndexWithFrequencies shards, each written to its own file.
+
+    The coordinator only keeps the collection-wide document counts. search() computes the idfs
+    from them, sends the query to every shard at once, and merges the per shard top k, so the
+    results are the same as from a single index. After read(), every shard is loaded and
+    searched by its own worker process, connected to the coordinator with a pipe, so shards are
+    searched in parallel and no process holds the whole index. Otherwise, or with
+    use_processes=False, the shards are held and searched in this process. close() stops the
+    workers. The pipes are shared, so searches from several threads take turns on them. A copy of
+    the index forked into another process, e.g. a worker of QueryServer or of the parallel
+    evaluation, does not use the pipes of its parent: it loads the shards itself on its first search.
+
+    filename holds a manifest with the number of shards. Shard i is stored in
+    filename + '.shard<i>'.
+    """
+    def __init__(self, filename: str, number_of_shards: int = 4, use_processes: bool = True,
+                 top_k_pruning: bool = False):
+        """
+        :param filename: File the manifest is read from and written to.
+        :param number_of_shards: Number of shards, replaced by the one in the manifest on read().
+        :param use_processes: Serve the shards from worker processes after read().
+        :param top_k_pruning: Same as in DictBasedInvertedIndexWithFrequencies, used in the shards.
+        """
+        self.filename = filename
+        self.number_of_shards = number_of_shards
+        self.use_processes = use_processes
+        self.top_k_pruning = top_k_pruning
+        self.shards = [DictBasedInvertedIndexWithFrequencies(self.shard_filename(i))
+                       for i in range(number_of_shards)]
+        # Connections to the worker process of every shard, empty when the shards are in this process.
+        self.workers: List[Tuple[multiprocessing.Process, Connection]] = []
+        # Process that started the workers, the only one allowed to use their pipes.
+        self.workers_pid = None
+        # Held for every request and response exchanged with the workers, so that concurrent
+        # searches do not receive each other's results.
+        self.workers_lock = threading.Lock()
+        self.number_of_documents = 0
+        # Count of documents each term occurs in, over all shards.
+        self.doc_counts = Counter()
+
+    def __getstate__(self):
+        # Locks cannot be pickled, e.g. when a partial index is sent back by a worker of
+        # ParallelIndexingProcess.
+        state = dict(self.__dict__)
+        del state['workers_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.workers_lock = threading.Lock()
+
+    def shard_filename(self, shard: int) -> str:
+        return f'{self.filename}.shard{shard}'
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        if self.workers:
+            raise ValueError('documents cannot be added to shards served by worker processes')
+        self.version += 1
+        self.number_of_documents += 1
+        self.doc_counts.update(set(doc.tokens))
+        self.shards[shard_of(doc.doc_id, self.number_of_shards)].add_document(doc)
+
+    def merge(self, other: Index) -> None:
+        if other.number_of_shards != self.number_of_shards:
+            raise ValueError(f'cannot merge {other.number_of_shards} shards into {self.number_of_shards}')
+        self.version += 1
+        self.number_of_documents += other.number_of_documents
+        self.doc_counts.update(other.doc_counts)
+        for shard, other_shard in zip(self.shards, other.shards):
+            shard.merge(other_shard)
+
+    def write(self):
+        for shard in self.shards:
+            shard.write()
+        with open(self.filename, 'w') as fp:
+            json.dump({'number_of_shards': self.number_of_shards}, fp)
+
+    def read(self):
+        self.close()
+        self.version += 1
+        with open(self.filename) as fp:
+            self.number_of_shards = json.load(fp)['number_of_shards']
+        # The document counts come from the term dictionaries, without loading any postings.
+        self.number_of_documents = 0
+        self.doc_counts = Counter()
+        for shard in range(self.number_of_shards):
+            number_of_documents, term_dictionary = read_term_dictionary(self.shard_filename(shard))
+            self.number_of_documents += number_of_documents
+            for entry in term_dictionary:
+                self.doc_counts[entry['term']] += entry['documents_count']
+        if self.use_processes:
+            self.shards = []
+            self.start_workers()
+        else:
+            self.read_shards()
+
+    def read_shards(self) -> None:
+        self.shards = [DictBasedInvertedIndexWithFrequencies(self.shard_filename(i))
+                       for i in range(self.number_of_shards)]
+        for shard in self.shards:
+            shard.read()
+
+    def start_workers(self) -> None:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        for shard in range(self.number_of_shards):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=_serve_shard, daemon=True,
+                                      args=(worker_connection, self.shard_filename(shard), self.top_k_pruning))
+            process.start()
+            worker_connection.close()
+            self.workers.append((process, connection))
+        self.workers_pid = os.getpid()
+        # Waits until every shard is loaded.
+        for _, connection in self.workers:
+            connection.recv()
+
+    def check_forked(self) -> None:
+        """
+        Replaces the workers inherited from the parent process with shards read in this process.
+        The pipes are dropped without telling the workers, which keep serving the parent.
+        """
+        if self.workers and self.workers_pid != os.getpid():
+            self.workers = []
+            self.workers_lock = threading.Lock()
+            self.read_shards()
+
+    def close(self) -> None:
+        """
+        Stops the worker processes, if any.
+        """
+        self.check_forked()
+        with self.workers_lock:
+            for process, connection in self.workers:
+                connection.send(None)
+                connection.close()
+                process.join()
+            self.workers = []
+
+    def search(self, query: Query) -> SearchResults:
+        return self.search_many([query])[0]
+
+    def search_many(self, queries: List[Query]) -> List[SearchResults]:
+        """
+        Sends all queries to every shard in one request and merges the results.
+        """
+        idfs = {term: inverse_document_frequency(self.doc_counts[term], self.number_of_documents)
+                for query in queries for term in query.terms if self.doc_counts[term] > 0}
+        self.check_forked()
+        if self.workers:
+            with self.workers_lock:
+                for _, connection in self.workers:
+                    connection.send((queries, idfs))
+                shard_results = [connection.recv() for _, connection in self.workers]
+            for results in shard_results:
+                if isinstance(results, Exception):
+                    raise results
+        else:
+            shard_results = [search_shard(shard, queries, idfs, self.top_k_pruning) for shard in self.shards]
+        all_results = []
+        for query, results in zip(queries, zip(*shard_results)):
+            top = heapq.nsmallest(query.num_results, itertools.chain.from_iterable(results),
+                                  key=lambda scored_doc: (-scored_doc[0], scored_doc[1]))
+            all_results.append(SearchResults([doc_id for _, doc_id in top]))
+        return all_results
+
+
+class ShardedIndexer(Indexer):
+    def __init__(self, index_filename: str, number_of_shards: int = 4):
+        self.index_filename = index_filename
+        self.number_of_shards = number_of_shards
+
+    def create_index(self) -> Index:
+        return ShardedIndex(self.index_filename, self.number_of_shards)
@@ -0,0 +1,69 @@
+import mmap
+import pickle
+import struct
+from typing import Any, Tuple
+
+# Identifies snapshot files and their version.
+SNAPSHOT_MAGIC = b'IRSNAP01'
+# Out-of-band buffers start at multiples of this, so that they can be cast to any array type.
+_ALIGNMENT = 8
+_LENGTH = struct.Struct('<Q')
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGNMENT
+
+
+def write_snapshot(filename: str, obj: Any) -> None:
+    """
+    Writes obj into a snapshot file with pickle protocol 5. Objects that pickle their data as
+    pickle.PickleBuffer, such as FrozenPostings, have it written out-of-band as raw contiguous
+    buffers after the pickle, so that read_snapshot() can map them instead of copying them.
+
+    Layout: SNAPSHOT_MAGIC, the pickle length, the number of buffers, the pickle, then every buffer
+    as its length followed by its bytes, starting at an aligned offset.
+    """
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    with open(filename, 'wb') as fp:
+        fp.write(SNAPSHOT_MAGIC)
+        fp.write(_LENGTH.pack(len(data)))
+        fp.write(_LENGTH.pack(len(buffers)))
+        fp.write(data)
+        offset = len(SNAPSHOT_MAGIC) + 2 * _LENGTH.size + len(data)
+        for buffer in buffers:
+            raw = buffer.raw()
+            fp.write(_LENGTH.pack(raw.nbytes))
+            offset += _LENGTH.size
+            fp.write(b'\0' * _padding(offset))
+            offset += _padding(offset)
+            fp.write(raw)
+            offset += raw.nbytes
+
+
+def read_snapshot(filename: str) -> Tuple[Any, mmap.mmap]:
+    """
+    Loads an object written by write_snapshot(). The file is memory-mapped and the out-of-band
+    buffers are handed to pickle as memoryviews into the mapping, so they are not copied and only
+    the pages that get used are ever read from disk.
+    :return: The object, and the mapping, which has to stay open as long as the object is used.
+    """
+    with open(filename, 'rb') as fp:
+        buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    if bytes(view[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+        raise ValueError(f'{filename} is not a snapshot')
+    offset = len(SNAPSHOT_MAGIC)
+    (data_length,) = _LENGTH.unpack_from(view, offset)
+    (number_of_buffers,) = _LENGTH.unpack_from(view, offset + _LENGTH.size)
+    offset += 2 * _LENGTH.size
+    data = view[offset:offset + data_length]
+    offset += data_length
+    buffers = []
+    for _ in range(number_of_buffers):
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        offset += _padding(offset)
+        buffers.append(view[offset:offset + length])
+        offset += length
+    return pickle.loads(data, buffers=buffers), buffer
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import json
+import os
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator
+
+from documents import DocumentBatch, TransformedDocument
+from index import Index, Indexer, ListBasedInvertedIndexWithFrequencies, write_inverted_index_records
+
+# Rough number of bytes taken in memory by a (doc_id, tf) posting in a list, and by a new term in
+# the term dicts. Only used to decide when to flush a run.
+POSTING_SIZE_ESTIMATE = 100
+TERM_SIZE_ESTIMATE = 250
+
+
+def read_run(filename: str) -> Iterator[Dict[str, Any]]:
+    with open(filename) as fp:
+        for line in fp:
+            yield json.loads(line)
+
+
+def read_index_records(filename: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads the term records of an index file written by SpimiInvertedIndexWriter in the format of
+    the runs, so that it can be merged as a run.
+    """
+    with open(filename) as fp:
+        fp.readline()
+        for line in fp:
+            record = json.loads(line)
+            record['index'] = [(sub_record['doc_id'], sub_record['tf']) for sub_record in record['index']]
+            yield record
+
+
+def merge_run_records(records: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combines the records of one term from several runs, given in run order.
+    """
+    merged = None
+    for record in records:
+        if merged is None:
+            merged = {'term': record['term'], 'documents_count': 0, 'max_tf': record['max_tf'], 'index': []}
+        merged['documents_count'] += record['documents_count']
+        merged['max_tf'] = max(merged['max_tf'], record['max_tf'])
+        merged['index'].extend({'doc_id': doc_id, 'tf': tf} for doc_id, tf in record['index'])
+    return merged
+
+
+class SpimiInvertedIndexWriter(ListBasedInvertedIndexWithFrequencies):
+    """
+    Builds a ListBasedInvertedIndexWithFrequencies file with single-pass in-memory indexing (SPIMI),
+    for corpora that do not fit in memory.
+
+    Postings are collected in memory until their estimated size reaches memory_budget bytes. Then
+    they are written into a run file sorted by term, and memory is cleared. write() flushes the last
+    run and k-way merges all runs into the final index file, which can then be loaded with read()
+    or by any index that reads the ListBasedInvertedIndexWithFrequencies format. Only the
+    documents added since the last flush are searchable before that. A later write() merges the
+    final index file written before as the first run, so documents can be added in between.
+    """
+    def __init__(self, filename, memory_budget: int = 1 << 30):
+        """
+        :param filename: The final index file. Runs are written next to it.
+        :param memory_budget: Estimated number of bytes of postings kept in memory.
+        """
+        super().__init__(filename)
+        self.memory_budget = memory_budget
+        self.estimated_memory = 0
+        self.run_filenames = []
+        # Whether filename holds the documents of an earlier write().
+        self.written = False
+
+    def add_document(self, doc: TransformedDocument) -> None:
+        number_of_terms = len(self.term_to_doc_id_and_frequencies)
+        super().add_document(doc)
+        new_terms = len(self.term_to_doc_id_and_frequencies) - number_of_terms
+        self.estimated_memory += (len(set(doc.tokens)) * POSTING_SIZE_ESTIMATE
+                                  + new_terms * TERM_SIZE_ESTIMATE)
+        if self.estimated_memory >= self.memory_budget:
+            self.flush_run()
+
+    def add_documents(self, batch: DocumentBatch) -> None:
+        # One document at a time, so a run can be flushed in the middle of the batch.
+        for doc in batch:
+            self.add_document(doc)
+
+    def flush_run(self) -> None:
+        """
+        Writes the postings held in memory into a new run file sorted by term.
+        """
+        if not self.term_to_doc_id_and_frequencies:
+            return
+        run_filename = f'{self.filename}.run{len(self.run_filenames)}'
+        with open(run_filename, 'w') as fp:
+            for term in sorted(self.term_to_doc_id_and_frequencies):
+                record = {
+                    'term': term,
+                    'documents_count': self.doc_counts[term],
+                    'max_tf': self.max_tfs[term],
+                    'index': self.term_to_doc_id_and_frequencies[term],
+                }
+                fp.write(json.dumps(record) + '\n')
+        self.run_filenames.append(run_filename)
+        self.term_to_doc_id_and_frequencies = defaultdict(list)
+        self.doc_counts = Counter()
+        self.max_tfs = dict()
+        self.estimated_memory = 0
+
+    def write(self):
+        self.flush_run()
+        runs = [read_run(run_filename) for run_filename in self.run_filenames]
+        previous_filename = f'{self.filename}.previous'
+        if self.written:
+            # The documents of the earlier write() come first.
+            os.replace(self.filename, previous_filename)
+            runs.insert(0, read_index_records(previous_filename))
+        # heapq.merge keeps records with the same term in run order, so postings stay in the
+        # order the documents were added.
+        merged_runs = heapq.merge(*runs, key=lambda record: record['term'])
+        records = (merge_run_records(term_records)
+                   for _, term_records in itertools.groupby(merged_runs, key=lambda record: record['term']))
+        write_inverted_index_records(self.filename, self.number_of_documents, records)
+        for run_filename in self.run_filenames:
+            os.remove(run_filename)
+        if self.written:
+            os.remove(previous_filename)
+        self.run_filenames = []
+        self.written = True
+
+    def read(self):
+        super().read()
+        # The documents of filename are in memory now, they must not be merged again.
+        self.written = False
+
+    def write_snapshot(self) -> None:
+        # Only the postings added since the last flush are in memory, the others are in the runs.
+        raise NotImplementedError(f'{type(self).__name__} does not support snapshots')
+
+    def read_snapshot(self) -> None:
+        raise NotImplementedError(f'{type(self).__name__} does not support snapshots')
+
+
+class SpimiIndexer(Indexer):
+    def __init__(self, index_filename: str, memory_budget: int = 1 << 30):
+        self.index_filename = index_filename
+        self.memory_budget = memory_budget
+
+    def create_index(self) -> Index:
+        return SpimiInvertedIndexWriter(self.index_filename, self.memory_budget)
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+import benchmarks
+
+
+class BenchmarksTest(TestCase):
+    def test_corpus_is_reproducible(self):
+        vocabulary = benchmarks.ZipfVocabulary(vocabulary_size=1000)
+        self.assertEqual(1000, len(set(vocabulary.words)))
+        self.assertEqual(benchmarks.generate_corpus(20, vocabulary, seed=1),
+                         benchmarks.generate_corpus(20, vocabulary, seed=1))
+        self.assertNotEqual(benchmarks.generate_corpus(20, vocabulary, seed=1),
+                            benchmarks.generate_corpus(20, vocabulary, seed=2))
+
+    def test_run_benchmark(self):
+        result = benchmarks.run_benchmark('index', 'DictBasedInvertedIndexWithFrequencies', 50, 10, 0)
+        self.assertNotIn('error', result)
+        for key in ['index_docs_per_second', 'write_seconds', 'read_seconds', 'query_p50_ms',
+                    'query_p95_ms', 'query_p99_ms', 'search_loop_seconds', 'search_many_seconds',
+                    'search_many_speedup', 'peak_rss_mb']:
+            self.assertIn(key, result)
+        result = benchmarks.run_benchmark('index', 'PositionalInvertedIndexWithFrequencies', 50, 10, 0)
+        self.assertNotIn('error', result)
+        for key in ['index_file_bytes', 'positions_bytes', 'phrase_query_p50_ms', 'phrase_query_p99_ms']:
+            self.assertIn(key, result)
+        self.assertIn('tokens_per_second', benchmarks.run_benchmark('tokenizer', 'NaiveTokenizer', 50, 10, 0))
+
+    def test_benchmark_sharding(self):
+        result = benchmarks.benchmark_sharding(50, 10, shard_counts=[1, 2])
+        for name in ['DictBasedInvertedIndexWithFrequencies', 'ShardedIndex(1)', 'ShardedIndex(2)']:
+            self.assertIn('query_p50_ms', result[name])
+
+    def test_benchmark_parallel_indexing(self):
+        result = benchmarks.benchmark_parallel_indexing(50, worker_counts=[1, 2], shard_size=10)
+        self.assertIn('docs_per_second', result['DefaultIndexingProcess'])
+        for name in ['ParallelIndexingProcess(1)', 'ParallelIndexingProcess(2)']:
+            self.assertIn('speedup', result[name])
+
+    def test_benchmark_freeze(self):
+        result = benchmarks.benchmark_freeze(50, 10)
+        for name in ['ListBasedInvertedIndexWithFrequencies', 'DictBasedInvertedIndexWithFrequencies']:
+            self.assertLess(result[name]['frozen']['total_bytes'], result[name]['built']['total_bytes'])
+            self.assertIn('query_p50_ms', result[name]['frozen_latencies'])
+
+    def test_benchmark_startup(self):
+        result = benchmarks.benchmark_startup(['small'], 10)['small']
+        for name in ['ListBasedInvertedIndexWithFrequencies', 'DictBasedInvertedIndexWithFrequencies']:
+            for key in ['read_seconds', 'read_snapshot_seconds', 'speedup', 'snapshot_bytes']:
+                self.assertIn(key, result[name])
+
+    def test_compare_results(self):
+        def results(docs_per_second, query_p50_ms):
+            return {'scales': {'small': {'index': {'NaiveIndex': {
+                'index_docs_per_second': docs_per_second, 'query_p50_ms': query_p50_ms}}, 'tokenizer': {}}}}
+        self.assertEqual([], benchmarks.compare_results(results(100, 1.0), results(90, 1.1)))
+        self.assertEqual(['small NaiveIndex index_docs_per_second: 100 -> 50 (-50%)',
+                          'small NaiveIndex query_p50_ms: 1 -> 2 (+100%)'],
+                         benchmarks.compare_results(results(100, 1.0), results(50, 2.0)))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, benchmarks.percentile(values, 50))
+        self.assertEqual(99, benchmarks.percentile(values, 99))
@@ -0,0 +1,94 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from bm25_index import BM25InvertedIndex, bm25_inverse_document_frequency, bm25_term_score
+from documents import DocumentBatch, TransformedDocument
+from index import rank_by_score
+from search_api import Query
+from test_index import add_test_documents, random_documents
+
+
+def bm25_ranking(docs, terms, k1=1.2, b=0.75):
+    """
+    Exhaustive BM25 ranking with float scores, the reference for the quantized index.
+    """
+    average_length = sum(len(doc.tokens) for doc in docs) / len(docs)
+    doc_counts = {term: sum(1 for doc in docs if term in doc.tokens) for term in terms}
+    if any(count == 0 for count in doc_counts.values()):
+        return []
+    scores = {doc.doc_id: sum(bm25_term_score(doc.tokens.count(term), len(doc.tokens), average_length,
+                                              bm25_inverse_document_frequency(doc_counts[term], len(docs)),
+                                              k1, b)
+                              for term in terms)
+              for doc in docs if all(term in doc.tokens for term in terms)}
+    return rank_by_score(scores)
+
+
+class BM25InvertedIndexTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_impacts_are_impact_ordered_integers(self):
+        index = add_test_documents(BM25InvertedIndex(self.filename))
+        index.update_impacts()
+        self.assertEqual(255, max(index.max_impacts.values()))
+        for term, doc_id_to_impact in index.term_to_doc_id_and_impacts.items():
+            impacts = list(doc_id_to_impact.values())
+            self.assertEqual(sorted(impacts, reverse=True), impacts)
+            self.assertTrue(all(isinstance(impact, int) for impact in impacts))
+            self.assertEqual(impacts[0], index.max_impacts[term])
+
+    def test_search_matches_float_bm25(self):
+        docs = random_documents(200)
+        index = BM25InvertedIndex(self.filename, impact_bits=16)
+        for doc in docs:
+            index.add_document(doc)
+        for terms in [['a'], ['c', 'a'], ['b', 'e', 'j'], ['a', 'z']]:
+            self.assertEqual(bm25_ranking(docs, terms)[:10], index.search(Query(terms, 10)).result_doc_ids)
+
+    def test_top_k_pruning_matches_exhaustive_search(self):
+        docs = random_documents(300, seed=1)
+        pruned = BM25InvertedIndex(self.filename)
+        exhaustive = BM25InvertedIndex(self.filename, top_k_pruning=False)
+        for doc in docs:
+            pruned.add_document(doc)
+            exhaustive.add_document(doc)
+        queries = [Query(terms, num_results) for terms in [['a'], ['b', 'a'], ['i', 'j'], ['c', 'c']]
+                   for num_results in [1, 5, 50]]
+        for query in queries:
+            self.assertEqual(exhaustive.search(query), pruned.search(query))
+        self.assertEqual([exhaustive.search(query) for query in queries], pruned.search_many(queries))
+
+    def test_write_read(self):
+        expected = add_test_documents(BM25InvertedIndex(self.filename, k1=1.5, b=0.5))
+        expected.write()
+        index = BM25InvertedIndex(self.filename)
+        index.read()
+        self.assertEqual((1.5, 0.5), (index.k1, index.b))
+        self.assertEqual(expected.doc_lengths, index.doc_lengths)
+        self.assertEqual(expected.term_to_doc_id_and_impacts, index.term_to_doc_id_and_impacts)
+        for terms in [['a'], ['c'], ['e', 'b'], ['x']]:
+            self.assertEqual(expected.search(Query(terms, 10)), index.search(Query(terms, 10)))
+
+    def test_adding_documents_updates_impacts(self):
+        index = add_test_documents(BM25InvertedIndex(self.filename))
+        self.assertEqual(['d1', 'd2'], index.search(Query(['a'], 10)).result_doc_ids)
+        index.add_documents(DocumentBatch.from_documents([TransformedDocument('d5', ['a', 'a'])]))
+        self.assertEqual(['d5', 'd1', 'd2'], index.search(Query(['a'], 10)).result_doc_ids)
+
+    def test_merge(self):
+        docs = random_documents(50, seed=2)
+        expected = BM25InvertedIndex(self.filename)
+        index = BM25InvertedIndex(self.filename)
+        other = BM25InvertedIndex(self.filename)
+        for i, doc in enumerate(docs):
+            expected.add_document(doc)
+            (index if i % 2 else other).add_document(doc)
+        index.merge(other)
+        for terms in [['a'], ['b', 'c'], ['j']]:
+            self.assertEqual(expected.search(Query(terms, 10)), index.search(Query(terms, 10)))
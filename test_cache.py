@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from cache import LRUCache
+
+
+class LRUCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_size_of(self):
+        cache = LRUCache(max_size=5, size_of=len)
+        cache.put('a', [1, 2, 3])
+        cache.put('b', [1, 2])
+        cache.put('c', [1])
+        self.assertEqual(['b', 'c'], list(cache.entries))
+        cache.put('d', [1, 2, 3, 4, 5, 6])
+        self.assertNotIn('d', cache)
+        self.assertEqual(3, cache.size)
+
+    def test_stats(self):
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual({'entries': 1, 'size': 1, 'hits': 1, 'misses': 1, 'hit_ratio': 0.5}, cache.stats())
+
+    def test_max_entries(self):
+        cache = LRUCache(max_size=100, size_of=len, max_entries=2)
+        cache.put('a', [1])
+        cache.put('b', [1])
+        cache.put('c', [1])
+        self.assertEqual(['b', 'c'], list(cache.entries))
+
+    def test_ttl(self):
+        now = [0.0]
+        cache = LRUCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.put('a', 1)
+        now[0] = 9.5
+        self.assertEqual(1, cache.get('a'))
+        now[0] = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+    def test_concurrent_access(self):
+        cache = LRUCache(max_size=10)
+
+        def use_cache(thread):
+            for i in range(2000):
+                key = (thread * 7 + i) % 25
+                if cache.get(key) is None:
+                    cache.put(key, i)
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(use_cache, range(8)))
+        self.assertEqual(10, len(cache))
+        self.assertEqual(10, cache.size)
+        self.assertEqual(8 * 2000, cache.hits + cache.misses)
@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from document_source import TrecCovidJsonlDocumentCollection, TrecCovidJsonlSource, WikiJsonDocumentSource, \
+    iter_json_array
+from documents import InputDocument
+
+
+class IterJsonArrayTest(TestCase):
+    def test_small_chunks(self):
+        data = [{'id': 1, 'text': 'a [b], c'}, [1, 2, {'x': 'y'}], 12345, 'str', None, True]
+        for chunk_size in [1, 2, 3, 7, 100]:
+            self.assertEqual(data, list(iter_json_array(io.StringIO(json.dumps(data, indent=1)), chunk_size)))
+
+    def test_empty_array(self):
+        self.assertEqual([], list(iter_json_array(io.StringIO(' [ ] '))))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[1, 2')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{}')))
+
+
+class DocumentSourceStreamTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'corpus')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_wiki_stream(self):
+        with open(self.filename, 'w') as fp:
+            json.dump([{'id': '1', 'init_text': 'text 1', 'title': 'title 1'},
+                       {'id': '2', 'init_text': 'text 2', 'title': 'title 2'}], fp)
+        source = WikiJsonDocumentSource(self.filename)
+        self.assertEqual(list(source.read()), list(source.stream()))
+
+    def test_trec_covid_stream(self):
+        with open(self.filename, 'w') as fp:
+            fp.write(json.dumps({'_id': '1', 'text': 'text 1', 'title': 'title 1'}) + '\n')
+            fp.write(json.dumps({'_id': '2', 'text': 'text 2', 'title': 'title 2'}) + '\n')
+        source = TrecCovidJsonlSource(self.filename)
+        self.assertEqual([InputDocument('1', 'text 1', 'title 1'), InputDocument('2', 'text 2', 'title 2')],
+                         list(source.stream()))
+
+
+class TrecCovidJsonlDocumentCollectionTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'corpus.jsonl')
+        with open(self.filename, 'w') as fp:
+            for i in range(3):
+                fp.write(json.dumps({'_id': f'id{i}', 'title': f'title {i}', 'text': f'text {i}'}) + '\n')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_get_doc(self):
+        collection = TrecCovidJsonlDocumentCollection(self.filename, cache_size=1)
+        self.assertEqual(InputDocument('id1', 'text 1', 'title 1'), collection.get_doc('id1'))
+        self.assertEqual(InputDocument('id2', 'text 2', 'title 2'), collection.get_doc('id2'))
+        self.assertEqual(InputDocument('id2', 'text 2', 'title 2'), collection.get_doc('id2'))
+        self.assertEqual(1, collection.cache.hits)
+        self.assertEqual(['id0', 'id2'], [doc.doc_id for doc in collection.get_docs(['id0', 'id2'])])
+        with self.assertRaises(KeyError):
+            collection.get_doc('missing')
+
+    def test_offsets_are_reused(self):
+        TrecCovidJsonlDocumentCollection(self.filename)
+        with open(self.filename + '.offsets') as fp:
+            offsets = json.load(fp)['offsets']
+        offsets['id0'] = offsets['id1']
+        with open(self.filename + '.offsets', 'w') as fp:
+            json.dump({'corpus_size': os.path.getsize(self.filename), 'offsets': offsets}, fp)
+        self.assertEqual('id1', TrecCovidJsonlDocumentCollection(self.filename).get_doc('id0').doc_id)
+
+    def test_insert(self):
+        collection = TrecCovidJsonlDocumentCollection(self.filename)
+        collection.insert(InputDocument('id3', 'text 3', 'title 3'))
+        self.assertEqual(InputDocument('id3', 'text 3', 'title 3'), collection.get_doc('id3'))
+        reopened = TrecCovidJsonlDocumentCollection(self.filename)
+        self.assertEqual(['id0', 'id1', 'id2', 'id3'], [doc.doc_id for doc in reopened])
+        self.assertEqual(InputDocument('id3', 'text 3', 'title 3'), reopened.get_doc('id3'))
@@ -0,0 +1,32 @@
+from array import array
+from unittest import TestCase
+
+from document_transformer import NaiveSearchDocumentTransformer
+from documents import DocumentBatch, InputDocument, TransformedDocument
+from tokenizer import NaiveTokenizer
+
+
+class DocumentBatchTest(TestCase):
+    def test_from_documents(self):
+        docs = [TransformedDocument('d1', ['a', 'b']), TransformedDocument('d2', []),
+                TransformedDocument('d3', ['c'])]
+        batch = DocumentBatch.from_documents(docs)
+        self.assertEqual(['a', 'b', 'c'], batch.tokens)
+        self.assertEqual(array('Q', [0, 2, 2, 3]), batch.offsets)
+        self.assertEqual(docs, list(batch))
+
+    def test_from_documents_with_term_ids(self):
+        docs = [TransformedDocument('d1', [], array('I', [0, 1])), TransformedDocument('d2', [], array('I', [1]))]
+        batch = DocumentBatch.from_documents(docs)
+        self.assertEqual(array('I', [0, 1, 1]), batch.term_ids)
+        self.assertEqual(docs, list(batch))
+
+    def test_transform_batch(self):
+        transformer = NaiveSearchDocumentTransformer(NaiveTokenizer())
+        docs = [InputDocument('d1', 'A b.', title=''), InputDocument('d2', 'c', title='')]
+        self.assertEqual([transformer.transform_document(doc) for doc in docs],
+                         list(transformer.transform_batch(docs)))
+
+    def test_documents_have_no_dict(self):
+        self.assertFalse(hasattr(TransformedDocument('d1', []), '__dict__'))
+        self.assertFalse(hasattr(InputDocument('d1', '', ''), '__dict__'))
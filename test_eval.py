@@ -0,0 +1,50 @@
+import json
+import math
+import os
+import tempfile
+from unittest import TestCase
+
+import eval
+from eval import EvalEntry
+from index import ListBasedInvertedIndexWithFrequencies
+from query_process import NaiveQueryParser, NaiveResultFormatter, QueryProcess
+from test_index import add_test_documents
+from tokenizer import NaiveTokenizer
+
+
+REFERENCE_VALUES = [
+    EvalEntry(query_id=1, result_doc_id='a', eval_value=2),
+    EvalEntry(query_id=1, result_doc_id='b', eval_value=0),
+    EvalEntry(query_id=1, result_doc_id='c', eval_value=1),
+    EvalEntry(query_id=2, result_doc_id='x', eval_value=1),
+]
+
+
+class EvalTest(TestCase):
+    def test_annotate_results(self):
+        self.assertEqual(
+            [EvalEntry(query_id=1, result_doc_id='b', eval_value=0),
+             EvalEntry(query_id=1, result_doc_id='a', eval_value=2),
+             EvalEntry(query_id=2, result_doc_id='y', eval_value=0)],
+            eval.annotate_results({1: ['b', 'a'], 2: ['y']}, REFERENCE_VALUES))
+
+    def test_compute_metrics(self):
+        metrics = eval.compute_metrics({1: ['b', 'a'], 2: ['y', 'z']}, REFERENCE_VALUES, k=2)
+        self.assertAlmostEqual(0.25, metrics['precision_at_k'])
+        # Query 1 has 2 relevant documents and finds one of them at rank 2.
+        self.assertAlmostEqual(0.125, metrics['map'])
+        ndcg_1 = (3 / math.log2(3)) / (3 + 1 / math.log2(3))
+        self.assertAlmostEqual(ndcg_1 / 2, metrics['ndcg_at_k'])
+
+    def test_run_queries_parallel(self):
+        process = QueryProcess(query_parser=NaiveQueryParser(NaiveTokenizer()),
+                               index=add_test_documents(ListBasedInvertedIndexWithFrequencies('')),
+                               result_formatter=NaiveResultFormatter())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            queries_filename = os.path.join(tmp_dir, 'queries.jsonl')
+            with open(queries_filename, 'w') as fp:
+                for query_id, query in enumerate(['a', 'c', 'b c', 'e', 'x', 'd e']):
+                    fp.write(json.dumps({'_id': str(query_id), 'metadata': {'query': query}}) + '\n')
+            self.assertEqual(eval.run_queries(queries_filename, process),
+                             eval.run_queries_parallel(queries_filename, process, num_workers=2,
+                                                       chunk_size=4))
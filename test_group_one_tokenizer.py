@@ -1,6 +1,8 @@
+import pickle
+import random
 from unittest import TestCase
 import tokenizer
-from tokenizer import GroupOneTokenizer
+from tokenizer import CachedNormalizer, CompiledGroupOneTokenizer, GroupOneTokenizer, create_stemming_normalizer
 
 
 class GroupOneTokenizerTest(TestCase):
@@ -73,3 +75,57 @@ class GroupOneTokenizerTest(TestCase):
         query = ['Cities Mice Playing Languages Dogs']
         tokens = self.tokenizer.tokenize(query)
         self.assertEqual(self.tokenizer.lemm(tokens), ['city', 'mouse', 'playing', 'language', 'dog'])
+
+
+def generate_texts(num_texts: int, seed: int = 0):
+    """
+    Random texts made of fragments that exercise every rule of GroupOneTokenizer.
+    """
+    fragments = ['Dr.', 'Dr', 'Prof.', 'Mr.', 'Mrs.', 'Ms.', 'Mrs', 'Drive', 'word', 'Word', 'isn',
+                 "'", 't', '.', '..', '...', '. . .', '-', '?', '!', ',', '(', ')', '%', '$', '22.5',
+                 'pre-school', 'M.', ' ', '  ', '\n', '\t', '\x1c', '\u00a0', 'café', 'Ünicode', '_', '3.999...']
+    rng = random.Random(seed)
+    return [''.join(rng.choice(fragments) + rng.choice(['', ' ']) for _ in range(rng.randint(0, 30)))
+            for _ in range(num_texts)]
+
+
+class CompiledGroupOneTokenizerTest(TestCase):
+    def test_same_tokens_as_group_one_tokenizer(self):
+        expected_tokenizer = GroupOneTokenizer()
+        tokenizer = CompiledGroupOneTokenizer()
+        texts = generate_texts(5000) + [
+            'Dr. Ross\'s dog jumped over the fence. Dr. Ross was amazed!',
+            'pre-school children (22.5%). It occurred year-round',
+            'He said \'Isn\'t O\'Brian the best?\'',
+            'More...',
+            'Mrs. Smith met Mr. Smith on Drive St.\n',
+            '',
+        ]
+        for text in texts:
+            self.assertEqual(expected_tokenizer.tokenize(text), tokenizer.tokenize(text), repr(text))
+
+
+class CachedNormalizerTest(TestCase):
+    def test_normalize_calls_normalize_word_once_per_distinct_word(self):
+        calls = []
+        normalizer = CachedNormalizer(lambda word: calls.append(word) or word.upper(), max_entries=2)
+        self.assertEqual(['A', 'B', 'A', 'A'], normalizer.normalize(['a', 'b', 'a', 'a']))
+        self.assertEqual(['B', 'C'], normalizer.normalize(['b', 'c']))
+        self.assertEqual(['a', 'b', 'c'], calls)
+        self.assertEqual({'entries': 2, 'size': 2, 'hits': 1, 'misses': 3, 'hit_ratio': 0.25},
+                         normalizer.stats())
+
+    def test_stemming_normalizer(self):
+        normalizer = create_stemming_normalizer()
+        self.assertEqual(['male', 'mode', 'play', 'cat', 'sever', 'cat'],
+                         normalizer.normalize(['males', 'modes', 'playing', 'cats', 'several', 'cats']))
+        copy = pickle.loads(pickle.dumps(normalizer))
+        self.assertEqual(0, len(copy.cache))
+        self.assertEqual(['play'], copy.normalize(['playing']))
+
+    def test_tokenizers_have_their_own_normalizers(self):
+        tokenizer = GroupOneTokenizer()
+        other = GroupOneTokenizer()
+        self.assertEqual(['play', 'cat'], tokenizer.stemm(['playing', 'cats']))
+        self.assertIsNot(tokenizer.stemming_normalizer, other.stemming_normalizer)
+        self.assertEqual(0, len(other.stemming_normalizer.cache))
@@ -0,0 +1,294 @@
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from documents import DocumentBatch, TransformedDocument
+from index import CompressedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies, \
+    LazyDictBasedInvertedIndexWithFrequencies, LazyListBasedInvertedIndexWithFrequencies, \
+    ListBasedInvertedIndexWithFrequencies, PackedListBasedInvertedIndexWithFrequencies, \
+    TermIdInvertedIndexWithFrequencies, convert_to_packed_index
+from search_api import Query
+
+
+TEST_DOCUMENTS = [
+    TransformedDocument('d1', ['a', 'b', 'c', 'a']),
+    TransformedDocument('d2', ['a', 'c', 'd']),
+    TransformedDocument('d3', ['b', 'c', 'e', 'e']),
+    TransformedDocument('d4', ['d', 'e']),
+]
+
+
+def add_test_documents(index):
+    for doc in TEST_DOCUMENTS:
+        index.add_document(doc)
+    return index
+
+
+def random_documents(num_docs, seed=0):
+    rng = random.Random(seed)
+    return [TransformedDocument(f'd{i}', rng.choices('abcdefghij', weights=range(10, 0, -1),
+                                                     k=rng.randint(1, 20)))
+            for i in range(num_docs)]
+
+
+class PackedListBasedInvertedIndexWithFrequenciesTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_write_read(self):
+        add_test_documents(PackedListBasedInvertedIndexWithFrequencies(self.filename)).write()
+        index = PackedListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        self.assertEqual(4, index.number_of_documents)
+        self.assertEqual(3, index.doc_counts['c'])
+        self.assertEqual([('d1', 0.5), ('d2', 0.3333333432674408)],
+                         list(index.term_to_doc_id_and_frequencies['a']))
+
+    def test_read_only_after_read(self):
+        add_test_documents(PackedListBasedInvertedIndexWithFrequencies(self.filename)).write()
+        index = PackedListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        with self.assertRaises(ValueError):
+            index.add_document(TransformedDocument('d5', ['a']))
+        with self.assertRaises(ValueError):
+            index.add_documents(DocumentBatch.from_documents([TransformedDocument('d5', ['a'])]))
+
+    def test_close(self):
+        add_test_documents(PackedListBasedInvertedIndexWithFrequencies(self.filename)).write()
+        index = PackedListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        postings_buffer = index.postings_buffer
+        index.read()
+        self.assertTrue(postings_buffer.closed)
+        postings_buffer = index.postings_buffer
+        index.close()
+        self.assertTrue(postings_buffer.closed)
+        self.assertEqual(0, index.number_of_documents)
+        index.add_document(TransformedDocument('d5', ['a']))
+        self.assertEqual(['d5'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+
+    def test_search_matches_jsonl_index(self):
+        expected = add_test_documents(ListBasedInvertedIndexWithFrequencies(self.filename))
+        expected.write()
+        index = convert_to_packed_index(self.filename, self.filename + '.packed')
+        index.read()
+        for terms in [['a'], ['c'], ['b', 'c'], ['a', 'e'], ['x']]:
+            query = Query(terms=terms, num_results=10)
+            self.assertEqual(expected.search(query), index.search(query))
+
+
+class CompressedInvertedIndexWithFrequenciesTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_search_matches_dict_index(self):
+        expected = add_test_documents(DictBasedInvertedIndexWithFrequencies(self.filename))
+        add_test_documents(CompressedInvertedIndexWithFrequencies(self.filename, skip_interval=2)).write()
+        index = CompressedInvertedIndexWithFrequencies(self.filename, skip_interval=2)
+        index.read()
+        for terms in [['a'], ['c'], ['b', 'c'], ['c', 'a'], ['a', 'e'], ['x']]:
+            query = Query(terms=terms, num_results=10)
+            self.assertEqual(expected.search(query), index.search(query))
+
+    def test_read_uses_skip_interval_of_writer(self):
+        index = CompressedInvertedIndexWithFrequencies(self.filename, skip_interval=4)
+        for i in range(60):
+            index.add_document(TransformedDocument(f'd{i}', ['a', 'z'] if i % 2 == 0 else ['a']))
+        index.write()
+        index = CompressedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        self.assertEqual(4, index.skip_interval)
+        self.assertEqual(30, len(index.search(Query(terms=['a', 'z'], num_results=100)).result_doc_ids))
+
+
+class TopKPruningTest(TestCase):
+    def test_search_matches_exhaustive_search(self):
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies]:
+            exhaustive = add_test_documents(index_class(''))
+            pruned = add_test_documents(index_class('', top_k_pruning=True))
+            for terms in [['a'], ['c'], ['e'], ['b', 'c'], ['c', 'c', 'a'], ['a', 'e'], ['x'], []]:
+                for num_results in [1, 2, 10]:
+                    query = Query(terms=terms, num_results=num_results)
+                    self.assertEqual(exhaustive.search(query), pruned.search(query))
+
+    def test_search_orders_by_decreasing_score(self):
+        index = add_test_documents(ListBasedInvertedIndexWithFrequencies('', top_k_pruning=True))
+        self.assertEqual(['d2', 'd1', 'd3'], index.search(Query(terms=['c'], num_results=3)).result_doc_ids)
+
+
+class LazyInvertedIndexTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_search_matches_eager_index(self):
+        for index_class, lazy_index_class in [
+                (ListBasedInvertedIndexWithFrequencies, LazyListBasedInvertedIndexWithFrequencies),
+                (DictBasedInvertedIndexWithFrequencies, LazyDictBasedInvertedIndexWithFrequencies)]:
+            expected = add_test_documents(index_class(self.filename))
+            expected.write()
+            index = lazy_index_class(self.filename, cache_size=3)
+            index.read()
+            self.assertEqual(expected.doc_counts, index.doc_counts)
+            for terms in [['a'], ['c'], ['b', 'c'], ['a', 'e'], ['x']]:
+                query = Query(terms=terms, num_results=10)
+                self.assertEqual(expected.search(query), index.search(query))
+
+    def test_postings_cache(self):
+        add_test_documents(ListBasedInvertedIndexWithFrequencies(self.filename)).write()
+        index = LazyListBasedInvertedIndexWithFrequencies(self.filename, cache_size=4)
+        index.read()
+        self.assertEqual([('d1', 0.5), ('d2', 1 / 3)], index.term_to_doc_id_and_frequencies['a'])
+        self.assertEqual([('d1', 0.5), ('d2', 1 / 3)], index.term_to_doc_id_and_frequencies['a'])
+        index.term_to_doc_id_and_frequencies['c']
+        self.assertEqual({'entries': 1, 'size': 3, 'hits': 1, 'misses': 2, 'hit_ratio': 1 / 3},
+                         index.postings_cache.stats())
+
+    def test_concurrent_lookups(self):
+        expected = add_test_documents(DictBasedInvertedIndexWithFrequencies(self.filename))
+        expected.write()
+        index = LazyDictBasedInvertedIndexWithFrequencies(self.filename, cache_size=3)
+        index.read()
+        terms = ['a', 'b', 'c', 'd', 'e'] * 200
+        with ThreadPoolExecutor(8) as executor:
+            postings = list(executor.map(index.term_to_doc_id_and_frequencies.__getitem__, terms))
+        self.assertEqual([expected.term_to_doc_id_and_frequencies[term] for term in terms], postings)
+        index.close()
+
+    def test_read_closes_previous_file(self):
+        add_test_documents(ListBasedInvertedIndexWithFrequencies(self.filename)).write()
+        index = LazyListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        postings = index.term_to_doc_id_and_frequencies
+        index.read()
+        self.assertTrue(postings.buffer.closed)
+        self.assertEqual(['d2', 'd1', 'd3'], index.search(Query(terms=['c'], num_results=10)).result_doc_ids)
+        index.close()
+        self.assertTrue(index.term_to_doc_id_and_frequencies.buffer.closed)
+
+    def test_read_without_term_dictionary(self):
+        add_test_documents(ListBasedInvertedIndexWithFrequencies(self.filename)).write()
+        os.remove(self.filename + '.terms')
+        index = LazyListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        self.assertEqual(['d2', 'd1', 'd3'], index.search(Query(terms=['c'], num_results=10)).result_doc_ids)
+
+
+class SearchManyTest(TestCase):
+    def test_search_many_matches_search(self):
+        queries = [Query(terms=terms, num_results=num_results)
+                   for terms in [['a'], ['c'], ['e'], ['b', 'c'], ['c', 'c', 'a'], ['a', 'e'], ['x'], []]
+                   for num_results in [1, 2, 10]]
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies,
+                            CompressedInvertedIndexWithFrequencies]:
+            for kwargs in [{}, {'top_k_pruning': True}]:
+                if index_class is CompressedInvertedIndexWithFrequencies and kwargs:
+                    continue
+                index = add_test_documents(index_class('', **kwargs))
+                self.assertEqual([index.search(query) for query in queries], index.search_many(queries))
+
+
+class BatchCollector(list):
+    def add_document(self, doc):
+        self.append(doc)
+
+
+class AddDocumentsTest(TestCase):
+    def test_add_documents_matches_add_document(self):
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies,
+                            TermIdInvertedIndexWithFrequencies, CompressedInvertedIndexWithFrequencies]:
+            expected = add_test_documents(index_class(''))
+            index = index_class('')
+            index.add_documents(DocumentBatch.from_documents(add_test_documents(BatchCollector())))
+            for terms in [['a'], ['c'], ['b', 'c'], ['a', 'e'], ['x']]:
+                query = Query(terms=terms, num_results=10)
+                self.assertEqual(expected.search(query), index.search(query))
+
+
+class FreezeTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_frozen_index_gives_the_same_results(self):
+        queries = [Query(terms=terms, num_results=num_results) for terms in [['a'], ['c'], ['b', 'c'], ['e', 'd'], ['x']]
+                   for num_results in [1, 10]]
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies,
+                            TermIdInvertedIndexWithFrequencies]:
+            for top_k_pruning in [False, True]:
+                expected = add_test_documents(index_class(self.filename, top_k_pruning=top_k_pruning))
+                index = add_test_documents(index_class(self.filename, top_k_pruning=top_k_pruning))
+                index.freeze()
+                self.assertTrue(index.frozen)
+                for query in queries:
+                    self.assertEqual(expected.search(query), index.search(query))
+                self.assertEqual([expected.search(query) for query in queries], index.search_many(queries))
+
+    def test_frozen_index_is_read_only(self):
+        index = add_test_documents(DictBasedInvertedIndexWithFrequencies(self.filename))
+        index.freeze()
+        with self.assertRaises(ValueError):
+            index.add_document(TransformedDocument('d5', ['a']))
+        with self.assertRaises(ValueError):
+            index.add_documents(DocumentBatch.from_documents([TransformedDocument('d5', ['a'])]))
+        with self.assertRaises(ValueError):
+            index.merge(add_test_documents(DictBasedInvertedIndexWithFrequencies(self.filename)))
+        self.assertEqual(0, index.doc_counts['x'])
+
+    def test_write_and_read_frozen_index(self):
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies]:
+            expected = add_test_documents(index_class(self.filename))
+            frozen = add_test_documents(index_class(self.filename))
+            frozen.freeze()
+            frozen.write()
+            index = index_class(self.filename)
+            index.read()
+            self.assertFalse(index.frozen)
+            for terms in [['a'], ['b', 'c'], ['e']]:
+                self.assertEqual(expected.search(Query(terms, 10)), index.search(Query(terms, 10)))
+
+    def test_memory_report(self):
+        index = add_test_documents(ListBasedInvertedIndexWithFrequencies(self.filename))
+        report = index.memory_report()
+        self.assertEqual(5, report['number_of_terms'])
+        self.assertEqual(11, report['number_of_postings'])
+        self.assertEqual(11 / 5, report['postings_per_term'])
+        self.assertEqual(sum(report['structures'].values()), report['total_bytes'])
+        self.assertIn('term_to_doc_id_and_frequencies', report['structures'])
+        index.freeze()
+        frozen_report = index.memory_report()
+        self.assertEqual(11, frozen_report['number_of_postings'])
+        self.assertEqual(frozen_report['total_bytes'] / 11, frozen_report['bytes_per_posting'])
+
+    def test_snapshot(self):
+        queries = [Query(terms=terms, num_results=10) for terms in [['a'], ['c'], ['b', 'c'], ['e', 'd'], ['x']]]
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies,
+                            TermIdInvertedIndexWithFrequencies, PackedListBasedInvertedIndexWithFrequencies,
+                            LazyListBasedInvertedIndexWithFrequencies, LazyDictBasedInvertedIndexWithFrequencies]:
+            for top_k_pruning in [False, True]:
+                expected = add_test_documents(index_class(self.filename, top_k_pruning=top_k_pruning))
+                expected.write_snapshot()
+                self.assertFalse(expected.frozen)
+                index = index_class(self.filename, top_k_pruning=top_k_pruning)
+                index.read_snapshot()
+                self.assertTrue(index.frozen)
+                self.assertEqual(expected.number_of_documents, index.number_of_documents)
+                for query in queries:
+                    self.assertEqual(expected.search(query), index.search(query))
+                self.assertEqual([expected.search(query) for query in queries], index.search_many(queries))
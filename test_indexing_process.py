@@ -1,12 +1,15 @@
 from documents import InputDocument, TransformedDocument
+from index import DictBasedInvertedIndexWithFrequencies, EmptyIndexIndexer, ListBasedInvertedIndexWithFrequencies, \
+    SingleIndexIndexer
+from indexing_process import DefaultIndexingProcess, ParallelIndexingProcess
 from testing_indexing_process_fakes import *
-from unittest import TestCase
+from unittest import TestCase, mock
 
 
 class TestDefaultIndexingProcess(TestCase):
     def test_run(self):
         source = FakeDocumentSource(FakeDocumentCollection.from_str_list(["d1", "d2"]))
-        self.assertEqual(source.read().get_doc("0"), InputDocument(doc_id="0", text="d1"))
+        self.assertEqual(source.read().get_doc("0"), InputDocument(doc_id="0", text="d1", title=""))
         indexing_process = DefaultIndexingProcess(FakeDocumentTransformer(), NaiveIndexer(""))
         index = indexing_process.run(source)
         self.assertEqual(index.docs, [
@@ -15,3 +18,40 @@ class TestDefaultIndexingProcess(TestCase):
         ])
 
 
+class TestParallelIndexingProcess(TestCase):
+    def test_run_matches_serial_run(self):
+        source = FakeDocumentSource(FakeDocumentCollection.from_str_list(
+            ["a b c a", "a c d", "b c e e", "d e", "a c e"]))
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies]:
+            expected = DefaultIndexingProcess(
+                FakeDocumentTransformer(), SingleIndexIndexer(index_class(""))).run(source)
+            index = ParallelIndexingProcess(
+                FakeDocumentTransformer(), SingleIndexIndexer(index_class("")), EmptyIndexIndexer(index_class, ""),
+                num_workers=2, shard_size=2).run(source)
+            self.assertEqual(expected.number_of_documents, index.number_of_documents)
+            self.assertEqual(expected.term_to_doc_id_and_frequencies, index.term_to_doc_id_and_frequencies)
+            self.assertEqual(expected.doc_counts, index.doc_counts)
+            self.assertEqual(expected.max_tfs, index.max_tfs)
+
+    def test_run_with_more_shards_than_pending(self):
+        # One worker allows two pending shards, so most shards are submitted after merges.
+        source = FakeDocumentSource(FakeDocumentCollection.from_str_list(
+            ["a b c a", "a c d", "b c e e", "d e", "a c e", "b d", "e a"]))
+        for index_class in [ListBasedInvertedIndexWithFrequencies, DictBasedInvertedIndexWithFrequencies]:
+            expected = DefaultIndexingProcess(
+                FakeDocumentTransformer(), SingleIndexIndexer(index_class(""))).run(source)
+            index = ParallelIndexingProcess(
+                FakeDocumentTransformer(), SingleIndexIndexer(index_class("")), EmptyIndexIndexer(index_class, ""),
+                num_workers=1, shard_size=1).run(source)
+            self.assertEqual(7, index.number_of_documents)
+            self.assertEqual(expected.term_to_doc_id_and_frequencies, index.term_to_doc_id_and_frequencies)
+            self.assertEqual(expected.doc_counts, index.doc_counts)
+            self.assertEqual(expected.max_tfs, index.max_tfs)
+
+    def test_run_without_cpu_count(self):
+        source = FakeDocumentSource(FakeDocumentCollection.from_str_list(["a b", "b c", "c d"]))
+        with mock.patch('os.cpu_count', return_value=None):
+            index = ParallelIndexingProcess(
+                FakeDocumentTransformer(), SingleIndexIndexer(DictBasedInvertedIndexWithFrequencies("")),
+                EmptyIndexIndexer(DictBasedInvertedIndexWithFrequencies, ""), shard_size=1).run(source)
+        self.assertEqual(3, index.number_of_documents)
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from index import DictBasedInvertedIndexWithFrequencies, SingleIndexIndexer
+from indexing_process import DefaultIndexingProcess
+from instrumentation import MetricsObserver, NULL_OBSERVER, deep_size_of
+from query_process import NaiveQueryParser, NaiveResultFormatter, QueryProcess
+from testing_indexing_process_fakes import FakeDocumentCollection, FakeDocumentSource, FakeDocumentTransformer
+from tokenizer import NaiveTokenizer
+
+
+class MetricsObserverTest(TestCase):
+    def test_stage_and_count(self):
+        observer = MetricsObserver()
+        with observer.stage('a', items=3):
+            pass
+        with observer.stage('a'):
+            pass
+        observer.count('c', 2)
+        self.assertEqual(['a', 'c'], list(observer.iterate('b', ['a', 'c'])))
+        dump = observer.dump()
+        self.assertEqual((2, 4), (dump['stages']['a']['calls'], dump['stages']['a']['items']))
+        # One more call for the end of the iteration.
+        self.assertEqual((3, 2), (dump['stages']['b']['calls'], dump['stages']['b']['items']))
+        self.assertEqual({'c': 2}, dump['counters'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'metrics.json')
+            observer.write(filename)
+            with open(filename) as fp:
+                self.assertEqual(dump, json.load(fp))
+
+    def test_null_observer(self):
+        with NULL_OBSERVER.stage('a'):
+            NULL_OBSERVER.count('c')
+        self.assertEqual([1, 2], list(NULL_OBSERVER.iterate('b', [1, 2])))
+
+
+class DeepSizeOfTest(TestCase):
+    def test_shared_objects_are_counted_once(self):
+        value = 'x' * 1000
+        self.assertGreater(deep_size_of([value]), 1000)
+        seen = set()
+        deep_size_of({'a': value}, seen)
+        self.assertLess(deep_size_of([value], seen), 1000)
+        self.assertGreater(deep_size_of(MetricsObserver()), deep_size_of({}))
+
+
+class PipelineInstrumentationTest(TestCase):
+    def test_indexing_and_query_processes(self):
+        observer = MetricsObserver()
+        source = FakeDocumentSource(FakeDocumentCollection.from_str_list(['a b c a', 'a c d', 'b c e e']))
+        index = DefaultIndexingProcess(FakeDocumentTransformer(),
+                                       SingleIndexIndexer(DictBasedInvertedIndexWithFrequencies('')),
+                                       observer).run(source)
+        process = QueryProcess(NaiveQueryParser(NaiveTokenizer()), index, NaiveResultFormatter(),
+                               observer=observer)
+        process.run('a c')
+        process.run('b')
+        dump = observer.dump()
+        for stage in ['acquisition', 'transformation', 'indexing']:
+            self.assertEqual(3, dump['stages'][stage]['items'])
+        for stage in ['parsing', 'search', 'formatting']:
+            self.assertEqual(2, dump['stages'][stage]['calls'])
+        self.assertEqual(4, dump['stages']['formatting']['items'])
+        self.assertEqual({'queries': 2, 'search.postings_touched': 7, 'search.candidates_scored': 4},
+                         dump['counters'])
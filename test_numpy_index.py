@@ -0,0 +1,52 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from documents import TransformedDocument
+from index import ListBasedInvertedIndexWithFrequencies
+from numpy_index import NumpyInvertedIndexWithFrequencies
+from search_api import Query
+
+
+class NumpyInvertedIndexWithFrequenciesTest(TestCase):
+    def test_search_matches_list_based_index(self):
+        rng = random.Random(0)
+        vocabulary = [f'term{i}' for i in range(50)]
+        weights = [1 / (i + 1) for i in range(len(vocabulary))]
+        expected = ListBasedInvertedIndexWithFrequencies('')
+        index = NumpyInvertedIndexWithFrequencies('')
+        for i in range(500):
+            doc = TransformedDocument(f'd{i}', rng.choices(vocabulary, weights, k=rng.randint(1, 20)))
+            expected.add_document(doc)
+            index.add_document(doc)
+        for _ in range(200):
+            terms = rng.choices(vocabulary[:15], k=rng.randint(1, 3))
+            for num_results in [1, 10, 1000]:
+                query = Query(terms=terms, num_results=num_results)
+                self.assertEqual(expected.search(query), index.search(query))
+        self.assertEqual([], index.search(Query(terms=['term0', 'missing'], num_results=10)).result_doc_ids)
+
+    def test_add_document_after_search(self):
+        index = NumpyInvertedIndexWithFrequencies('')
+        index.add_document(TransformedDocument('d1', ['a', 'b']))
+        self.assertEqual(['d1'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+        index.add_document(TransformedDocument('d2', ['a']))
+        index.add_document(TransformedDocument('d3', ['c']))
+        self.assertEqual(['d2', 'd1'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'index')
+            expected = NumpyInvertedIndexWithFrequencies(filename)
+            expected.add_document(TransformedDocument('d1', ['a', 'b']))
+            expected.add_document(TransformedDocument('d2', ['a']))
+            expected.write_snapshot()
+            index = NumpyInvertedIndexWithFrequencies(filename)
+            index.add_document(TransformedDocument('d3', ['a', 'c']))
+            # Builds the arrays of the index before the snapshot is read.
+            self.assertEqual(['d3'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+            index.read_snapshot()
+            for terms in [['a'], ['b'], ['c']]:
+                query = Query(terms=terms, num_results=10)
+                self.assertEqual(expected.search(query), index.search(query))
@@ -0,0 +1,133 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from documents import DocumentBatch, TransformedDocument
+from index import DictBasedInvertedIndexWithFrequencies
+from positional_index import PositionalInvertedIndexWithFrequencies, decode_positions, encode_positions, \
+    match_near, match_ordered
+from search_api import PositionalClause, Query
+
+
+def add_test_documents(index):
+    index.add_document(TransformedDocument('d1', ['new', 'york', 'city', 'is', 'big']))
+    index.add_document(TransformedDocument('d2', ['york', 'is', 'new', 'and', 'old', 'city']))
+    index.add_document(TransformedDocument('d3', ['a', 'new', 'new', 'york', 'york']))
+    index.add_document(TransformedDocument('d4', ['city', 'of', 'new', 'york']))
+    return index
+
+
+class PositionsTest(TestCase):
+    def test_encode_decode(self):
+        positions = [0, 3, 4, 200, 100000]
+        self.assertEqual(positions, decode_positions(encode_positions(positions)))
+        self.assertEqual(b'\x00\x03\x01', encode_positions([0, 3, 4]))
+
+    def test_match_ordered(self):
+        self.assertTrue(match_ordered([[1, 5], [6], [7]], 1))
+        self.assertFalse(match_ordered([[1, 5], [6], [8]], 1))
+        self.assertTrue(match_ordered([[1, 5], [6], [8]], 2))
+        # The second term has to come after the first one.
+        self.assertFalse(match_ordered([[4], [3]], 5))
+        # Repeated terms need distinct positions.
+        self.assertFalse(match_ordered([[2], [2]], 1))
+        self.assertTrue(match_ordered([[2, 3], [2, 3]], 1))
+
+    def test_match_near(self):
+        self.assertTrue(match_near([10], [7], 3))
+        self.assertFalse(match_near([10], [6], 3))
+        self.assertTrue(match_near([1, 20, 40], [5, 37], 3))
+        self.assertFalse(match_near([], [1], 3))
+        self.assertFalse(match_near([4], [4], 3))
+        self.assertTrue(match_near([4, 7], [4, 7], 3))
+        self.assertFalse(match_near([4, 8], [4, 8], 3))
+
+
+class PositionalInvertedIndexWithFrequenciesTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_positions(self):
+        index = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        self.assertEqual([1, 2], index.positions('new', 'd3'))
+        self.assertEqual([3, 4], index.positions('york', 'd3'))
+
+    def test_phrase(self):
+        index = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        query = Query(['new', 'york'], 10, clauses=[PositionalClause(['new', 'york'])])
+        self.assertEqual(['d1', 'd3', 'd4'], sorted(index.search(query).result_doc_ids))
+        query = Query(['new', 'york', 'city'], 10, clauses=[PositionalClause(['new', 'york', 'city'])])
+        self.assertEqual(['d1'], index.search(query).result_doc_ids)
+
+    def test_near(self):
+        index = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        query = Query(['new', 'city'], 10, clauses=[PositionalClause(['new', 'city'], 2, ordered=False)])
+        self.assertEqual(['d1', 'd4'], sorted(index.search(query).result_doc_ids))
+        query = Query(['new', 'city'], 10, clauses=[PositionalClause(['new', 'city'], 3, ordered=False)])
+        self.assertEqual(['d1', 'd2', 'd4'], sorted(index.search(query).result_doc_ids))
+
+    def test_near_same_term(self):
+        index = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        query = Query(['new'], 10, clauses=[PositionalClause(['new', 'new'], 3, ordered=False)])
+        self.assertEqual(['d3'], index.search(query).result_doc_ids)
+
+    def test_search_without_clauses_matches_dict_based_index(self):
+        index = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        expected = add_test_documents(DictBasedInvertedIndexWithFrequencies(self.filename))
+        for terms in [['new'], ['new', 'york'], ['city', 'is'], ['missing']]:
+            query = Query(terms, 10)
+            self.assertEqual(expected.search(query), index.search(query))
+        self.assertEqual([expected.search(Query(['york'], 2))],
+                         index.search_many([Query(['york'], 2)]))
+
+    def test_add_documents(self):
+        documents = [TransformedDocument('d1', ['new', 'york', 'city']),
+                     TransformedDocument('d2', ['york', 'new'])]
+        index = PositionalInvertedIndexWithFrequencies(self.filename)
+        index.add_documents(DocumentBatch.from_documents(documents))
+        self.assertEqual([1], index.positions('new', 'd2'))
+        query = Query(['new', 'york'], 10, clauses=[PositionalClause(['new', 'york'])])
+        self.assertEqual(['d1'], index.search(query).result_doc_ids)
+
+    def test_merge(self):
+        index = PositionalInvertedIndexWithFrequencies(self.filename)
+        index.add_document(TransformedDocument('d1', ['new', 'york']))
+        other = PositionalInvertedIndexWithFrequencies(self.filename)
+        other.add_document(TransformedDocument('d2', ['old', 'new', 'york']))
+        index.merge(other)
+        self.assertEqual(2, index.number_of_documents)
+        self.assertEqual([1, 2], [index.positions('new', 'd2')[0], index.positions('york', 'd2')[0]])
+
+    def test_write_read(self):
+        expected = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        expected.write()
+        index = PositionalInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        self.assertEqual(expected.number_of_documents, index.number_of_documents)
+        self.assertEqual(expected.term_to_doc_id_and_positions, index.term_to_doc_id_and_positions)
+        self.assertEqual(expected.term_to_doc_id_and_frequencies, index.term_to_doc_id_and_frequencies)
+        # The file can also be read without the positions.
+        dict_based = DictBasedInvertedIndexWithFrequencies(self.filename)
+        dict_based.read()
+        self.assertEqual(expected.term_to_doc_id_and_frequencies, dict_based.term_to_doc_id_and_frequencies)
+
+    def test_snapshot(self):
+        expected = add_test_documents(PositionalInvertedIndexWithFrequencies(self.filename))
+        expected.write_snapshot()
+        index = PositionalInvertedIndexWithFrequencies(self.filename)
+        index.read_snapshot()
+        self.assertTrue(index.frozen)
+        self.assertEqual(expected.term_to_doc_id_and_positions, index.term_to_doc_id_and_positions)
+        for query in [Query(['new', 'york'], 10, clauses=[PositionalClause(['new', 'york'])]),
+                      Query(['new', 'city'], 10, clauses=[PositionalClause(['new', 'city'], 3, ordered=False)]),
+                      Query(['york'], 10)]:
+            self.assertEqual(expected.search(query), index.search(query))
+
+    def test_positions_size_in_bytes(self):
+        index = PositionalInvertedIndexWithFrequencies(self.filename)
+        index.add_document(TransformedDocument('d1', ['a', 'b', 'a']))
+        self.assertEqual(3, index.positions_size_in_bytes())
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from postings import CompressedPostingList, PostingCursor, decode_varint, encode_varint, freeze_postings
+
+
+class VarintTest(TestCase):
+    def test_round_trip(self):
+        data = bytearray()
+        values = [0, 1, 127, 128, 300, 2 ** 31]
+        for value in values:
+            encode_varint(value, data)
+        pos = 0
+        for value in values:
+            decoded, pos = decode_varint(data, pos)
+            self.assertEqual(value, decoded)
+        self.assertEqual(len(data), pos)
+
+
+class CompressedPostingListTest(TestCase):
+    def setUp(self) -> None:
+        self.postings = CompressedPostingList(skip_interval=4)
+        for doc_id in range(0, 300, 3):
+            self.postings.append(doc_id, 0.5)
+
+    def test_iter(self):
+        self.assertEqual([(doc_id, 0.5) for doc_id in range(0, 300, 3)],
+                         [(doc_id, round(tf, 4)) for doc_id, tf in self.postings])
+
+    def test_append_out_of_order(self):
+        with self.assertRaises(ValueError):
+            self.postings.append(3, 0.5)
+
+    def test_advance(self):
+        cursor = PostingCursor(self.postings)
+        self.assertEqual(0, cursor.advance(0))
+        self.assertEqual(51, cursor.advance(50))
+        self.assertEqual(51, cursor.advance(51))
+        self.assertEqual(150, cursor.advance(150))
+        self.assertEqual(297, cursor.advance(296))
+        self.assertIsNone(cursor.advance(298))
+
+
+class FrozenPostingsTest(TestCase):
+    def test_lists(self):
+        postings = freeze_postings({'b': [('d2', 0.5), ('d1', 0.25)], 'a': [('d3', 1.0)], 'c': []},
+                                   as_mapping=False)
+        self.assertEqual(['a', 'b'], list(postings))
+        self.assertEqual([('d1', 0.25), ('d2', 0.5)], list(postings['b']))
+        self.assertEqual(('d3', 1.0), postings['a'][0])
+        self.assertNotIn('c', postings)
+        with self.assertRaises(KeyError):
+            postings['x']
+
+    def test_mappings(self):
+        postings = freeze_postings({'a': {'d3': 1.0, 'd1': 0.5}, 'b': {'d2': 0.25}}, as_mapping=True)
+        self.assertEqual(3, postings.number_of_postings)
+        self.assertEqual({'d1': 0.5, 'd3': 1.0}, dict(postings['a']))
+        self.assertEqual(1.0, postings['a']['d3'])
+        self.assertIn('d1', postings['a'])
+        self.assertNotIn('d2', postings['a'])
+        self.assertNotIn('d9', postings['a'])
+        self.assertEqual({'d1'}, postings['a'].keys() & {'d1', 'd2'})
+        with self.assertRaises(KeyError):
+            postings['b']['d1']
@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+from documents import TransformedDocument
+from index import DictBasedInvertedIndexWithFrequencies
+from query_process import NaiveQueryParser, NaiveResultFormatter, PhraseQueryParser, QueryProcess, \
+    QueryResultCache
+from search_api import PositionalClause, Query
+from tokenizer import NaiveTokenizer, create_stemming_normalizer
+
+
+class CountingIndex(DictBasedInvertedIndexWithFrequencies):
+    def __init__(self):
+        super().__init__('')
+        self.searches = 0
+
+    def search(self, query):
+        self.searches += 1
+        return super().search(query)
+
+
+class QueryResultCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.index = CountingIndex()
+        self.index.add_document(TransformedDocument('d1', ['a', 'b']))
+        self.index.add_document(TransformedDocument('d2', ['b', 'c']))
+        self.cache = QueryResultCache(max_entries=10)
+        self.query_process = QueryProcess(
+            NaiveQueryParser(NaiveTokenizer()), self.index, NaiveResultFormatter(), self.cache)
+
+    def test_repeated_queries_are_cached(self):
+        output = self.query_process.run('b a')
+        self.assertEqual(output, self.query_process.run('A B'))
+        self.query_process.run('A B', num_results=1)
+        self.assertEqual(2, self.index.searches)
+        stats = self.cache.stats()
+        self.assertEqual((1, 2), (stats['hits'], stats['misses']))
+        self.assertGreater(stats['seconds_saved'], 0)
+
+    def test_index_change_invalidates_cache(self):
+        self.assertEqual("SearchResults(result_doc_ids=['d1'])", self.query_process.run('a'))
+        self.index.add_document(TransformedDocument('d3', ['a']))
+        self.assertEqual("SearchResults(result_doc_ids=['d3', 'd1'])", self.query_process.run('a'))
+        self.assertEqual(2, self.index.searches)
+
+
+class NaiveQueryParserTest(TestCase):
+    def test_parse_query_with_normalizer(self):
+        parser = NaiveQueryParser(NaiveTokenizer(), create_stemming_normalizer())
+        self.assertEqual(['cat', 'play'], parser.parse_query('Cats playing', 5).terms)
+
+
+class PhraseQueryParserTest(TestCase):
+    def test_parse_query(self):
+        parser = PhraseQueryParser(NaiveTokenizer())
+        query = parser.parse_query('"New York" city NEAR/3 hospitals covid', 5)
+        self.assertEqual(['new', 'york', 'city', 'hospitals', 'covid'], query.terms)
+        self.assertEqual([PositionalClause(['new', 'york']),
+                          PositionalClause(['city', 'hospitals'], 3, ordered=False)], query.clauses)
+
+    def test_near_between_phrases(self):
+        parser = PhraseQueryParser(NaiveTokenizer())
+        query = parser.parse_query('"a b" NEAR/2 "c d"', 5)
+        self.assertEqual([PositionalClause(['a', 'b']), PositionalClause(['b', 'c'], 2, ordered=False),
+                          PositionalClause(['c', 'd'])], query.clauses)
+
+    def test_plain_query(self):
+        parser = PhraseQueryParser(NaiveTokenizer())
+        self.assertEqual(Query(['a', 'near', 'b'], 5), parser.parse_query('a near b', 5))
+
+    def test_cache_key_includes_clauses(self):
+        parser = PhraseQueryParser(NaiveTokenizer())
+        self.assertNotEqual(QueryResultCache.key(parser.parse_query('a b', 5)),
+                            QueryResultCache.key(parser.parse_query('"a b"', 5)))
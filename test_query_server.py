@@ -0,0 +1,83 @@
+import asyncio
+import json
+import time
+from unittest import IsolatedAsyncioTestCase
+
+from documents import DictDocumentCollection, InputDocument
+from index import DictBasedInvertedIndexWithFrequencies
+from query_process import NaiveQueryParser, NaiveResultFormatter, QueryProcess
+from query_server import QueryServer
+from test_index import add_test_documents
+from tokenizer import NaiveTokenizer
+
+
+class SlowIndex(DictBasedInvertedIndexWithFrequencies):
+    def search(self, query):
+        time.sleep(0.5)
+        return super().search(query)
+
+
+class FailingIndex(DictBasedInvertedIndexWithFrequencies):
+    def search(self, query):
+        raise ValueError('broken index')
+
+
+async def get(address, target):
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    return int(head.split()[1]), json.loads(body)
+
+
+def create_query_process(index):
+    return QueryProcess(NaiveQueryParser(NaiveTokenizer()), add_test_documents(index), NaiveResultFormatter())
+
+
+class QueryServerTest(IsolatedAsyncioTestCase):
+    async def start(self, server: QueryServer):
+        self.server = server
+        self.addAsyncCleanup(server.close)
+        return await server.start(port=0)
+
+    async def test_search(self):
+        collection = DictDocumentCollection({f'd{i}': InputDocument(f'd{i}', '', f'title {i}') for i in range(1, 5)})
+        address = await self.start(QueryServer(create_query_process(DictBasedInvertedIndexWithFrequencies('')),
+                                               collection, num_workers=2))
+        self.assertEqual(
+            (200, {'query': 'c', 'results': [{'doc_id': 'd2', 'title': 'title 2'},
+                                             {'doc_id': 'd1', 'title': 'title 1'}]}),
+            await get(address, '/search?q=c&n=2'))
+        self.assertEqual(200, (await get(address, '/health'))[0])
+        self.assertEqual(404, (await get(address, '/other'))[0])
+        self.assertEqual(400, (await get(address, '/search?q=c&n=x'))[0])
+
+    async def test_timeout(self):
+        address = await self.start(QueryServer(create_query_process(SlowIndex('')), use_processes=False,
+                                               timeout=0.1))
+        self.assertEqual(504, (await get(address, '/search?q=c'))[0])
+
+    async def test_search_error(self):
+        address = await self.start(QueryServer(create_query_process(FailingIndex('')), use_processes=False))
+        self.assertEqual((500, {'error': 'search failed with ValueError'}), await get(address, '/search?q=c'))
+        self.assertEqual(0, (await get(address, '/health'))[1]['pending'])
+
+    async def test_backpressure(self):
+        address = await self.start(QueryServer(create_query_process(SlowIndex('')), use_processes=False,
+                                               max_pending=1))
+        statuses = sorted(status for status, _ in await asyncio.gather(
+            get(address, '/search?q=c'), get(address, '/search?q=a')))
+        self.assertEqual([200, 503], statuses)
+
+    async def test_timed_out_searches_count_as_pending(self):
+        address = await self.start(QueryServer(create_query_process(SlowIndex('')), use_processes=False,
+                                               timeout=0.1, max_pending=2))
+        statuses = [status for status, _ in await asyncio.gather(
+            get(address, '/search?q=c'), get(address, '/search?q=a'))]
+        self.assertEqual([504, 504], statuses)
+        # Both searches still run in the pool after their timeout.
+        self.assertEqual(2, (await get(address, '/health'))[1]['pending'])
+        self.assertEqual(503, (await get(address, '/search?q=c'))[0])
+        await asyncio.sleep(1)
+        self.assertEqual(0, (await get(address, '/health'))[1]['pending'])
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from documents import TransformedDocument
+from index import DictBasedInvertedIndexWithFrequencies
+from search_api import Query
+from segmented_index import SegmentedIndex
+from test_index import TEST_DOCUMENTS
+
+DOCS = TEST_DOCUMENTS + [TransformedDocument('d5', ['a', 'c', 'e'])]
+
+QUERIES = [['a'], ['c'], ['b', 'c'], ['a', 'e'], ['c', 'e'], ['x']]
+
+
+class SegmentedIndexTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def create_index(self, **kwargs) -> SegmentedIndex:
+        index = SegmentedIndex(self.filename, max_buffered_documents=1, merge_factor=2, **kwargs)
+        for doc in DOCS:
+            index.add_document(doc)
+        return index
+
+    def assert_same_results(self, expected, index):
+        for terms in QUERIES:
+            query = Query(terms=terms, num_results=10)
+            self.assertEqual(expected.search(query), index.search(query))
+
+    def test_search_matches_single_index(self):
+        expected = DictBasedInvertedIndexWithFrequencies('')
+        for doc in DOCS:
+            expected.add_document(doc)
+        index = self.create_index(background_merges=False)
+        # 5 one document segments with merge_factor 2 end up as segments of 4 and 1 documents.
+        self.assertEqual([4, 1], [segment.number_of_live_documents for segment in index.segments])
+        self.assert_same_results(expected, index)
+        background_index = self.create_index()
+        background_index.wait_for_merges()
+        self.assert_same_results(expected, background_index)
+
+    def test_search_buffered_documents(self):
+        expected = DictBasedInvertedIndexWithFrequencies('')
+        index = SegmentedIndex(self.filename, max_buffered_documents=100)
+        for doc in DOCS:
+            expected.add_document(doc)
+            index.add_document(doc)
+            self.assert_same_results(expected, index)
+        # Searching does not flush.
+        self.assertEqual([], index.segments)
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+        index.delete_document('d2')
+        self.assertEqual(['d1', 'd5'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+
+    def test_concurrent_flushes(self):
+        index = SegmentedIndex(self.filename, max_buffered_documents=100, background_merges=False)
+        for doc in DOCS:
+            index.add_document(doc)
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: index.flush(), range(8)))
+        self.assertEqual([5], [segment.number_of_live_documents for segment in index.segments])
+        self.assertEqual(5, index.segments[0].index.number_of_documents)
+
+    def test_delete_document(self):
+        index = self.create_index(background_merges=False)
+        index.delete_document('d2')
+        self.assertEqual(['d1', 'd5'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+        index.merge_segments(index.segments)
+        self.assertEqual(4, index.segments[0].index.number_of_documents)
+        self.assertEqual(['d1', 'd5'], index.search(Query(terms=['a'], num_results=10)).result_doc_ids)
+
+    def test_write_read(self):
+        index = self.create_index(background_merges=False)
+        index.delete_document('d5')
+        index.write()
+        read_index = SegmentedIndex(self.filename)
+        read_index.read()
+        self.assert_same_results(index, read_index)
+        self.assertEqual({'index', 'index.segment6', 'index.segment6.docs', 'index.segment6.terms',
+                          'index.segment7', 'index.segment7.docs', 'index.segment7.terms'},
+                         set(os.listdir(self.tmp_dir.name)))
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, skipUnless
+
+from documents import TransformedDocument
+from index import DictBasedInvertedIndexWithFrequencies
+from search_api import Query
+from sharded_index import ShardedIndex, shard_of
+from test_index import random_documents
+
+
+QUERIES = [Query(terms, num_results) for terms in [['a'], ['b', 'a'], ['c', 'j'], ['e', 'e'], ['x'], []]
+           for num_results in [1, 3, 100]]
+
+
+_forked_index = None
+
+
+def search_forked_index(query):
+    return _forked_index.search(query)
+
+
+class ShardedIndexTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+        self.docs = random_documents(200)
+        self.expected = DictBasedInvertedIndexWithFrequencies(self.filename)
+        for doc in self.docs:
+            self.expected.add_document(doc)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def create_index(self, **kwargs) -> ShardedIndex:
+        index = ShardedIndex(self.filename, number_of_shards=3, **kwargs)
+        for doc in self.docs:
+            index.add_document(doc)
+        return index
+
+    def assert_same_results(self, index):
+        for query in QUERIES:
+            self.assertEqual(self.expected.search(query), index.search(query))
+        self.assertEqual([self.expected.search(query) for query in QUERIES], index.search_many(QUERIES))
+
+    def test_shard_of(self):
+        self.assertEqual(shard_of('d1', 3), shard_of('d1', 3))
+        self.assertEqual({0, 1, 2}, {shard_of(doc.doc_id, 3) for doc in self.docs})
+
+    def test_search_matches_single_index(self):
+        index = self.create_index()
+        self.assertEqual(200, sum(shard.number_of_documents for shard in index.shards))
+        self.assert_same_results(index)
+        self.assert_same_results(self.create_index(top_k_pruning=True))
+
+    def test_search_in_worker_processes(self):
+        self.create_index().write()
+        index = ShardedIndex(self.filename)
+        index.read()
+        try:
+            self.assertEqual(3, len(index.workers))
+            self.assertEqual([], index.shards)
+            self.assertEqual(self.expected.number_of_documents, index.number_of_documents)
+            self.assertEqual(self.expected.doc_counts, index.doc_counts)
+            self.assert_same_results(index)
+            with self.assertRaises(ValueError):
+                index.add_document(TransformedDocument('d', ['a']))
+        finally:
+            index.close()
+        self.assertEqual([], index.workers)
+
+    def test_concurrent_searches_in_worker_processes(self):
+        self.create_index().write()
+        index = ShardedIndex(self.filename)
+        index.read()
+        try:
+            expected = [self.expected.search(query) for query in QUERIES]
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(index.search, QUERIES * 20))
+            self.assertEqual(expected * 20, results)
+        finally:
+            index.close()
+
+    @skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork')
+    def test_search_in_forked_process(self):
+        self.create_index().write()
+        index = ShardedIndex(self.filename)
+        index.read()
+        try:
+            global _forked_index
+            # Forked workers share the index through a global, like the workers of the query server.
+            _forked_index = index
+            with multiprocessing.get_context('fork').Pool(2) as pool:
+                results = pool.map(search_forked_index, QUERIES)
+            self.assertEqual([self.expected.search(query) for query in QUERIES], results)
+            # The workers of this process still answer after the forked copies are gone.
+            self.assert_same_results(index)
+        finally:
+            index.close()
+
+    def test_pickle(self):
+        index = pickle.loads(pickle.dumps(self.create_index()))
+        self.assert_same_results(index)
+
+    def test_read_in_process(self):
+        self.create_index(top_k_pruning=True).write()
+        index = ShardedIndex(self.filename, use_processes=False, top_k_pruning=True)
+        index.read()
+        self.assertEqual([], index.workers)
+        self.assert_same_results(index)
+
+    def test_merge(self):
+        index = ShardedIndex(self.filename, number_of_shards=3)
+        other = ShardedIndex(self.filename, number_of_shards=3)
+        for i, doc in enumerate(self.docs):
+            (index if i % 2 else other).add_document(doc)
+        index.merge(other)
+        self.assert_same_results(index)
+        with self.assertRaises(ValueError):
+            index.merge(ShardedIndex(self.filename, number_of_shards=2))
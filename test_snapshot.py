@@ -0,0 +1,52 @@
+import os
+import pickle
+import tempfile
+from array import array
+from unittest import TestCase
+
+from postings import freeze_postings
+from snapshot import read_snapshot, write_snapshot
+
+
+class SnapshotTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'snapshot')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        postings = freeze_postings({'a': {'d3': 1.0, 'd1': 0.5}, 'b': {'d2': 0.25}, 'c': {}}, as_mapping=True)
+        write_snapshot(self.filename, {'postings': postings, 'other': [1, 'x']})
+        state, buffer = read_snapshot(self.filename)
+        self.assertEqual([1, 'x'], state['other'])
+        loaded = state['postings']
+        self.assertEqual(['a', 'b'], loaded.terms)
+        self.assertEqual({'d1': 0.5, 'd3': 1.0}, dict(loaded['a']))
+        self.assertEqual(0.25, loaded['b']['d2'])
+        # The arrays are not copied, they point into the mapped file.
+        self.assertIsInstance(loaded.tfs, memoryview)
+        self.assertIs(buffer, loaded.tfs.obj)
+
+    def test_buffers_are_aligned(self):
+        postings = freeze_postings({'a': [('d1', 1.5)]}, as_mapping=False)
+        for padding in ['', 'x', 'xyz']:
+            write_snapshot(self.filename, [padding, postings])
+            with open(self.filename, 'rb') as fp:
+                self.assertEqual(0, fp.read().find(array('d', [1.5]).tobytes()) % 8)
+            (_, loaded), _ = read_snapshot(self.filename)
+            self.assertEqual([('d1', 1.5)], list(loaded['a']))
+
+    def test_pickle_without_out_of_band_buffers(self):
+        postings = freeze_postings({'a': [('d1', 0.5), ('d2', 0.25)]}, as_mapping=False)
+        for protocol in [4, 5]:
+            loaded = pickle.loads(pickle.dumps(postings, protocol=protocol))
+            self.assertEqual(list(postings['a']), list(loaded['a']))
+        self.assertEqual(array('d', [0.5, 0.25]), array('d', loaded.tfs))
+
+    def test_not_a_snapshot(self):
+        with open(self.filename, 'wb') as fp:
+            fp.write(b'{"number_of_documents": 1}\n')
+        with self.assertRaises(ValueError):
+            read_snapshot(self.filename)
@@ -0,0 +1,68 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from documents import TransformedDocument
+from index import ListBasedInvertedIndexWithFrequencies
+from search_api import Query
+from spimi_index import SpimiInvertedIndexWriter
+from test_index import TEST_DOCUMENTS
+
+DOCS = TEST_DOCUMENTS + [TransformedDocument('d5', ['a', 'c', 'e'])]
+
+
+class SpimiInvertedIndexWriterTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'index')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_write_matches_in_memory_index(self):
+        expected = ListBasedInvertedIndexWithFrequencies('')
+        writer = SpimiInvertedIndexWriter(self.filename, memory_budget=1500)
+        for doc in DOCS:
+            expected.add_document(doc)
+            writer.add_document(doc)
+        self.assertEqual(2, len(writer.run_filenames))
+        writer.write()
+        self.assertEqual({'index', 'index.terms'}, set(os.listdir(self.tmp_dir.name)))
+
+        index = ListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        self.assertEqual(expected.number_of_documents, index.number_of_documents)
+        self.assertEqual(dict(expected.term_to_doc_id_and_frequencies), dict(index.term_to_doc_id_and_frequencies))
+        self.assertEqual(expected.doc_counts, index.doc_counts)
+        self.assertEqual(expected.max_tfs, index.max_tfs)
+        self.assertEqual(['a', 'b', 'c', 'd', 'e'], list(index.doc_counts))
+        for terms in [['a'], ['c'], ['b', 'c'], ['a', 'e']]:
+            query = Query(terms=terms, num_results=10)
+            self.assertEqual(expected.search(query), index.search(query))
+
+    def test_write_twice(self):
+        expected = ListBasedInvertedIndexWithFrequencies('')
+        writer = SpimiInvertedIndexWriter(self.filename, memory_budget=1500)
+        for doc in DOCS[:3]:
+            expected.add_document(doc)
+            writer.add_document(doc)
+        writer.write()
+        writer.write()
+        for doc in DOCS[3:]:
+            expected.add_document(doc)
+            writer.add_document(doc)
+        writer.write()
+        self.assertEqual({'index', 'index.terms'}, set(os.listdir(self.tmp_dir.name)))
+        index = ListBasedInvertedIndexWithFrequencies(self.filename)
+        index.read()
+        self.assertEqual(expected.number_of_documents, index.number_of_documents)
+        self.assertEqual(dict(expected.term_to_doc_id_and_frequencies), dict(index.term_to_doc_id_and_frequencies))
+        self.assertEqual(expected.doc_counts, index.doc_counts)
+        self.assertEqual(expected.max_tfs, index.max_tfs)
+
+    def test_snapshot_is_not_supported(self):
+        writer = SpimiInvertedIndexWriter(self.filename, memory_budget=1500)
+        for doc in DOCS:
+            writer.add_document(doc)
+        with self.assertRaises(NotImplementedError):
+            writer.write_snapshot()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from array import array
+from unittest import TestCase
+
+from document_transformer import NaiveSearchDocumentTransformer, TermIdDocumentTransformer
+from documents import InputDocument, TransformedDocument
+from index import DictBasedInvertedIndexWithFrequencies, TermIdInvertedIndexWithFrequencies
+from query_process import NaiveQueryParser
+from search_api import Query
+from test_index import TEST_DOCUMENTS, add_test_documents
+from tokenizer import NaiveTokenizer
+from vocabulary import Vocabulary
+
+QUERY_TERMS = [['a'], ['c'], ['b', 'c'], ['c', 'c', 'a'], ['a', 'e'], ['x'], []]
+
+
+class VocabularyTest(TestCase):
+    def test_encode(self):
+        vocabulary = Vocabulary()
+        self.assertEqual(array('I', [0, 1, 0, 2]), vocabulary.encode(['a', 'b', 'a', 'c']))
+        self.assertEqual([1, None], vocabulary.lookup(['b', 'x']))
+        self.assertEqual('c', vocabulary.term(2))
+        self.assertEqual(3, len(vocabulary))
+
+    def test_write_read(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'vocabulary')
+            Vocabulary(['b', 'a']).write(filename)
+            self.assertEqual({'b': 0, 'a': 1}, Vocabulary.read(filename).term_to_id)
+
+
+class TermIdInvertedIndexWithFrequenciesTest(TestCase):
+    def test_search_matches_dict_index(self):
+        expected = add_test_documents(DictBasedInvertedIndexWithFrequencies(''))
+        index = add_test_documents(TermIdInvertedIndexWithFrequencies(''))
+        parser = NaiveQueryParser(NaiveTokenizer(), vocabulary=index.vocabulary)
+        for terms in QUERY_TERMS:
+            query = Query(terms=terms, num_results=10)
+            self.assertEqual(expected.search(query), index.search(query))
+            self.assertEqual(expected.search(query), index.search(parser.parse_query(' '.join(terms), 10)))
+        queries = [Query(terms=terms, num_results=10) for terms in QUERY_TERMS]
+        self.assertEqual(expected.search_many(queries), index.search_many(queries))
+
+    def test_term_id_documents(self):
+        vocabulary = Vocabulary()
+        transformer = TermIdDocumentTransformer(NaiveSearchDocumentTransformer(NaiveTokenizer()), vocabulary)
+        doc = transformer.transform_document(InputDocument('d1', 'b a b', title=''))
+        self.assertEqual(TransformedDocument('d1', tokens=[], term_ids=array('I', [0, 1, 0])), doc)
+        index = TermIdInvertedIndexWithFrequencies('', vocabulary)
+        index.add_document(doc)
+        self.assertEqual(['d1'], index.search(Query(terms=['a', 'b'], num_results=10)).result_doc_ids)
+
+    def test_write_read_merge(self):
+        expected = add_test_documents(DictBasedInvertedIndexWithFrequencies(''))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'index')
+            first = TermIdInvertedIndexWithFrequencies(filename)
+            second = TermIdInvertedIndexWithFrequencies('')
+            for doc in TEST_DOCUMENTS[:2]:
+                first.add_document(doc)
+            for doc in TEST_DOCUMENTS[2:]:
+                second.add_document(doc)
+            first.merge(second)
+            first.write()
+            index = TermIdInvertedIndexWithFrequencies(filename)
+            index.read()
+        self.assertEqual(first.vocabulary.terms, index.vocabulary.terms)
+        for terms in QUERY_TERMS:
+            query = Query(terms=terms, num_results=10)
+            self.assertEqual(expected.search(query), index.search(query))
@@ -1,3 +1,9 @@
+from typing import Iterable, List
+
+from document_source import DocumentSource
+from document_transformer import DocumentTransformer
+from documents import DocumentCollection, InputDocument, TransformedDocument
+
 from indexing_process import *
 
 class FakeDocumentCollection(DocumentCollection):
@@ -6,7 +12,7 @@ class FakeDocumentCollection(DocumentCollection):
 
     @classmethod
     def from_str_list(cls, docs: List[str]):
-        return cls([InputDocument(doc_id=str(i), text=doc) for i, doc in enumerate(docs)])
+        return cls([InputDocument(doc_id=str(i), text=doc, title='') for i, doc in enumerate(docs)])
 
     def __iter__(self):
         return self.docs.__iter__()
@@ -17,6 +23,9 @@ class FakeDocumentCollection(DocumentCollection):
     def get_docs(self, doc_ids: Iterable[str]):
         return FakeDocumentCollection([d for d in self.docs if d.doc_id in doc_ids])
 
+    def insert(self, doc: InputDocument) -> None:
+        self.docs.append(doc)
+
 
 class FakeDocumentSource(DocumentSource):
     def __init__(self, doc_collection: DocumentCollection):
@@ -2,10 +2,12 @@ import abc
 import re
 import nltk
 from abc import ABC
-from typing import List
+from typing import Callable, Dict, List
 from nltk.stem import PorterStemmer
 from nltk.stem import WordNetLemmatizer
 
+from cache import LRUCache
+
 
 class Tokenizer(ABC):
     """
@@ -19,6 +21,67 @@ class Tokenizer(ABC):
         pass
 
 
+class Normalizer(ABC):
+    """
+    Maps tokens to their normalized form, e.g. their stem.
+    """
+    @abc.abstractmethod
+    def normalize(self, tokens: List[str]) -> List[str]:
+        pass
+
+
+class CachedNormalizer(Normalizer):
+    """
+    Normalizer that remembers the normalized form of the most recently seen words.
+
+    Vocabularies are small compared to the number of tokens, so with a warm cache normalize_word
+    runs about once per distinct word. normalize() looks up every distinct word of the batch only
+    once. The cache is not pickled, a copy sent to another process starts with an empty cache.
+    """
+    def __init__(self, normalize_word: Callable[[str], str], max_entries: int = 100000):
+        """
+        :param normalize_word: Function computing the normalized form of a single word.
+        :param max_entries: Maximum number of cached words.
+        """
+        self.normalize_word = normalize_word
+        self.max_entries = max_entries
+        self.cache = LRUCache(max_entries)
+
+    def normalize(self, tokens: List[str]) -> List[str]:
+        word_to_normalized = dict.fromkeys(tokens)
+        for word in word_to_normalized:
+            normalized = self.cache.get(word)
+            if normalized is None:
+                normalized = self.normalize_word(word)
+                self.cache.put(word, normalized)
+            word_to_normalized[word] = normalized
+        return [word_to_normalized[token] for token in tokens]
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
+
+    def __getstate__(self):
+        return {'normalize_word': self.normalize_word, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def create_stemming_normalizer(max_entries: int = 100000) -> CachedNormalizer:
+    return CachedNormalizer(PorterStemmer().stem, max_entries)
+
+
+_LEMMATIZER = WordNetLemmatizer()
+
+
+def lemmatize(word: str) -> str:
+    return _LEMMATIZER.lemmatize(word.lower())
+
+
+def create_lemmatizing_normalizer(max_entries: int = 100000) -> CachedNormalizer:
+    return CachedNormalizer(lemmatize, max_entries)
+
+
 class NaiveTokenizer(Tokenizer):
     """
     Tokenizer implementation from HW1.
@@ -40,6 +103,9 @@ class GroupOneTokenizer(Tokenizer):     # Iquoc T.
         self.urls = {'http', 'https', 'www', 'd2l'}
         self.domain = {'com', 'net', 'org', 'edu'}
         self.list = []
+        # Every tokenizer has its own normalizers, like it has its own state above.
+        self.stemming_normalizer = create_stemming_normalizer()
+        self.lemmatizing_normalizer = create_lemmatizing_normalizer()
 
     # "abbr. word1 . Word2
     # (). 123,456
@@ -115,16 +181,46 @@ class GroupOneTokenizer(Tokenizer):     # Iquoc T.
         return url_tokenized.split()
 
     def stemm(self, tokenized: List[str]) -> List[str]:     # Carlos Q.
-        stem = PorterStemmer()
-        stemmed = []
-        for word in tokenized:
-            stemmed.append(stem.stem(word))
-        return stemmed
+        return self.stemming_normalizer.normalize(tokenized)
 
     def lemm(self, tokenized: List[str]) -> List[str]:      # Carlos Q.
-        lem = WordNetLemmatizer()
-        lemmed = []
-        for word in tokenized:
-            lemmed.append(lem.lemmatize(word.lower()))
-        # print(lemmed)
-        return lemmed
+        return self.lemmatizing_normalizer.normalize(tokenized)
+
+
+# Patterns of GroupOneTokenizer, compiled once. (\W) followed by (\s)([\.\-])(\s) is fused into a
+# single pass: every non-word character except . and - gets surrounded by spaces. Whitespace is
+# left alone, since the number of spaces around a character never changes what the later patterns
+# match or how the text is split.
+_NON_WORD = re.compile(r'([^\w\s.\-])')
+_SENTENCE_BOUNDARY = re.compile(r'([.?!])\s+([A-Z?]\w+)')
+_APOSTROPHE = re.compile(r'(\w) \' (\w)')
+_ELLIPSIS = re.compile(r'\.(\s+)?\.(\s+?)\.')
+
+
+class CompiledGroupOneTokenizer(Tokenizer):
+    """
+    Faster GroupOneTokenizer that produces exactly the same tokens.
+
+    All patterns are compiled once, the literal title patterns are replaced with str.replace, the
+    two non-word passes run as one, and no state is kept between calls.
+    """
+    def __init__(self):
+        # Titles are replaced one after the other, so they have to be iterated in the same order
+        # as GroupOneTokenizer.titles, which is built from the same set literal.
+        self.titles = {'Dr', 'Prof', 'Mr', 'Mrs', 'Ms'}
+
+    def tokenize(self, text: str) -> List[str]:
+        adjusted = text
+        for title in self.titles:
+            adjusted = adjusted.replace(title + '.', title)
+        adjusted = _NON_WORD.sub(r' \1 ', adjusted)
+        adjusted = _SENTENCE_BOUNDARY.sub(r' \1 \2', adjusted)
+        # GroupOneTokenizer puts a space after a trailing newline, so r'(\.)$' only matches the
+        # very last character.
+        if adjusted.endswith('.'):
+            adjusted = adjusted[:-1] + ' . '
+        for title in self.titles:
+            adjusted = adjusted.replace(title, title + '.')
+        adjusted = _APOSTROPHE.sub(r"\1'\2", adjusted)
+        adjusted = _ELLIPSIS.sub(' ... ', adjusted)
+        return adjusted.lower().split()
@@ -0,0 +1,69 @@
+import json
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+
+class Vocabulary:
+    """
+    Interns terms to dense integer term ids, assigned in the order the terms are first added.
+
+    Every term string is stored once here, everything else can refer to it by its id, e.g.
+    TransformedDocument.term_ids or the keys of TermIdInvertedIndexWithFrequencies.
+    """
+    def __init__(self, terms: Iterable[str] = ()):
+        """
+        :param terms: Initial terms, getting the ids 0, 1, 2...
+        """
+        # The id of a term is its position in this list.
+        self.terms: List[str] = []
+        self.term_to_id: Dict[str, int] = dict()
+        for term in terms:
+            self.add(term)
+
+    def add(self, term: str) -> int:
+        """
+        :return: The id of the term, assigning a new id if the term is not in the vocabulary yet.
+        """
+        term_id = self.term_to_id.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.term_to_id[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def encode(self, tokens: Iterable[str]) -> array:
+        """
+        Adds all tokens to the vocabulary.
+        :return: The term ids of the tokens as a compact array of unsigned ints.
+        """
+        return array('I', map(self.add, tokens))
+
+    def get(self, term: str) -> Optional[int]:
+        """
+        :return: The id of the term, or None if the term is not in the vocabulary.
+        """
+        return self.term_to_id.get(term)
+
+    def lookup(self, terms: Iterable[str]) -> List[Optional[int]]:
+        """
+        Same as get() for every term, without adding unknown terms.
+        """
+        return [self.term_to_id.get(term) for term in terms]
+
+    def term(self, term_id: int) -> str:
+        return self.terms[term_id]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.term_to_id
+
+    def write(self, filename: str) -> None:
+        with open(filename, 'w') as fp:
+            json.dump(self.terms, fp)
+
+    @staticmethod
+    def read(filename: str) -> 'Vocabulary':
+        with open(filename) as fp:
+            return Vocabulary(json.load(fp))